@@ -1,6 +1,9 @@
-from typing import Generator
-from sqlalchemy.orm import Session
-from app.core.database import SessionLocal
+from typing import AsyncGenerator, Generator
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.services.model_registry import ModelRegistry, model_registry
+from app.services.rag_service import RAGService
+from app.services.vector_store import VectorStoreService
 
 
 def get_db() -> Generator:
@@ -10,3 +13,24 @@ def get_db() -> Generator:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Async database dependency."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_model_registry() -> ModelRegistry:
+    """Shared model registry dependency."""
+    return model_registry
+
+
+def get_vector_store() -> VectorStoreService:
+    """Vector store dependency backed by the shared model registry."""
+    return VectorStoreService(model_registry)
+
+
+def get_rag_service() -> RAGService:
+    """RAG service dependency backed by the shared model registry."""
+    return RAGService(model_registry)
@@ -1,81 +1,412 @@
+import json
+from typing import AsyncIterator, Dict, List, Tuple
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.api.deps import get_db
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.deps import get_async_db, get_rag_service
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.metrics import query_timer
+from app.models.collection import Collection
 from app.models.document import Document, DocumentStatus
 from app.models.chat import ChatSession, ChatMessage
-from app.schemas.chat import ChatRequest, ChatResponse, ChatHistoryResponse, ChatMessageSchema
+from app.schemas.chat import (
+    ChatRequest,
+    ChatResponse,
+    ChatHistoryResponse,
+    ChatMessageSchema,
+    BatchChatRequest,
+    BatchChatResponse,
+    BatchAnswer
+)
 from app.services.rag_service import RAGService
 
 router = APIRouter()
 
 
-@router.post("/ask", response_model=ChatResponse)
-async def ask_question(request: ChatRequest, db: Session = Depends(get_db)) -> ChatResponse:
-    """Ask a question about a document."""
-    document = db.query(Document).filter(Document.id == request.document_id).first()
-    if not document:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
-    if document.status != DocumentStatus.COMPLETED:
+async def _resolve_documents(
+    request: ChatRequest, db: AsyncSession
+) -> Tuple[List[Document], List[int]]:
+    """Load the documents a question is scoped to and check they are ready.
+
+    Returns the documents and, for a collection, the ids of members skipped
+    because they have not finished processing.
+    """
+    skipped = []
+    if request.collection_id is not None:
+        if not await db.get(Collection, request.collection_id):
+            raise HTTPException(status_code=404, detail="Collection not found")
+        members = (await db.execute(
+            select(Document.id, Document.status)
+            .where(Document.collection_id == request.collection_id)
+            .order_by(Document.id)
+        )).all()
+        if not members:
+            raise HTTPException(status_code=400, detail="Collection has no documents")
+        skipped = [
+            doc_id for doc_id, status in members if status != DocumentStatus.COMPLETED
+        ]
+        if len(skipped) == len(members):
+            raise HTTPException(
+                status_code=400, detail="No documents in the collection are ready"
+            )
+        documents = (await db.execute(
+            select(Document)
+            .where(
+                Document.collection_id == request.collection_id,
+                Document.status == DocumentStatus.COMPLETED
+            )
+            .order_by(Document.id)
+        )).scalars().all()
+    else:
+        document_ids = list(
+            dict.fromkeys(request.document_ids or [request.document_id])
+        )
+        documents = (await db.execute(
+            select(Document).where(Document.id.in_(document_ids))
+        )).scalars().all()
+        if len(documents) != len(document_ids):
+            raise HTTPException(status_code=404, detail="Document not found")
+        order = {doc_id: i for i, doc_id in enumerate(document_ids)}
+        documents = sorted(documents, key=lambda doc: order[doc.id])
+
+    if len(documents) > settings.MAX_DOCUMENTS_PER_QUESTION:
         raise HTTPException(
             status_code=400,
-            detail=f"Document is not ready. Current status: {document.status}"
+            detail=(
+                "Too many documents. Maximum per question: "
+                f"{settings.MAX_DOCUMENTS_PER_QUESTION}"
+            ),
         )
-    
+
+    _check_ready(documents)
+    return documents, skipped
+
+
+def _check_ready(documents: List[Document]) -> None:
+    """Reject documents that have not finished processing."""
+    for document in documents:
+        if document.status != DocumentStatus.COMPLETED:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Document is not ready. Current status: {document.status}"
+            )
+
+
+async def _start_exchange(
+    request: ChatRequest, db: AsyncSession
+) -> Tuple[ChatSession, List[Document], List[int]]:
+    """Validate the documents, resolve the session and save the user message."""
+    documents, skipped = await _resolve_documents(request, db)
+
     if request.session_id:
-        session = db.query(ChatSession).filter(ChatSession.id == request.session_id).first()
+        session = await db.get(ChatSession, request.session_id)
         if not session:
             raise HTTPException(status_code=404, detail="Chat session not found")
     else:
-        session = ChatSession(document_id=request.document_id)
+        session = ChatSession(
+            document_id=documents[0].id,
+            document_ids=(
+                ",".join(str(doc.id) for doc in documents)
+                if len(documents) > 1
+                else None
+            ),
+            collection_id=request.collection_id,
+        )
         db.add(session)
-        db.commit()
-        db.refresh(session)
-    
+        await db.flush()
+
     user_message = ChatMessage(
         session_id=session.id,
         role="user",
         content=request.question
     )
     db.add(user_message)
-    db.commit()
-    
-    try:
-        rag_service = RAGService()
-        result = rag_service.answer_question(
-            document_id=request.document_id,
-            question=request.question
+    with query_timer("persist"):
+        await db.commit()
+
+    return session, documents, skipped
+
+
+async def _start_batch(
+    request: BatchChatRequest, db: AsyncSession
+) -> Tuple[ChatSession, Document]:
+    """Validate a batch request and resolve its session; messages are saved later."""
+    if len(request.questions) > settings.MAX_BATCH_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Too many questions. Maximum per batch: {settings.MAX_BATCH_QUESTIONS}"
+            ),
         )
-        
+
+    document = await db.get(Document, request.document_id)
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    _check_ready([document])
+
+    if request.session_id:
+        session = await db.get(ChatSession, request.session_id)
+        if not session:
+            raise HTTPException(status_code=404, detail="Chat session not found")
+    else:
+        session = ChatSession(document_id=document.id)
+        db.add(session)
+        with query_timer("persist"):
+            await db.commit()
+
+    return session, document
+
+
+def _batch_answer(item: Dict, document: Document) -> BatchAnswer:
+    """Convert a batch result from the RAG service into its response schema."""
+    return BatchAnswer(
+        **item, source_document_ids=[document.id] * len(item.get('sources', []))
+    )
+
+
+def _batch_messages(session_id: int, answers: List[BatchAnswer]) -> List[ChatMessage]:
+    """User and assistant messages for a batch, in question order."""
+    messages = []
+    for answer in sorted(answers, key=lambda answer: answer.index):
+        messages.append(
+            ChatMessage(session_id=session_id, role="user", content=answer.question)
+        )
+        if answer.error is None:
+            messages.append(
+                ChatMessage(
+                    session_id=session_id, role="assistant", content=answer.answer
+                )
+            )
+    return messages
+
+
+def _document_scope(documents: List[Document]) -> Tuple[Dict[int, str], Dict[int, int]]:
+    """Map vector ids to labels for the prompt and back to document ids."""
+    labels, document_for_vector = {}, {}
+    for document in documents:
+        labels.setdefault(document.vector_id, document.filename)
+        document_for_vector.setdefault(document.vector_id, document.id)
+    return labels, document_for_vector
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format a Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _save_assistant_message(session_id: int, content: str) -> None:
+    """Persist an assistant message outside the request-scoped session."""
+    await _save_messages(
+        [ChatMessage(session_id=session_id, role="assistant", content=content)]
+    )
+
+
+async def _save_messages(messages: List[ChatMessage]) -> None:
+    """Persist messages in one transaction outside the request-scoped session."""
+    async with AsyncSessionLocal() as db:
+        db.add_all(messages)
+        with query_timer("persist"):
+            await db.commit()
+
+
+@router.post("/ask", response_model=ChatResponse)
+async def ask_question(
+    request: ChatRequest,
+    db: AsyncSession = Depends(get_async_db),
+    rag_service: RAGService = Depends(get_rag_service)
+) -> ChatResponse:
+    """Ask a question about a document."""
+    session, documents, skipped = await _start_exchange(request, db)
+
+    try:
+        if len(documents) == 1:
+            document = documents[0]
+            result = await rag_service.aanswer_question(
+                document_id=document.vector_id,
+                question=request.question,
+                cache_version=document.ingest_fingerprint
+            )
+            result['source_document_ids'] = [document.id] * len(result['sources'])
+        else:
+            labels, document_for_vector = _document_scope(documents)
+            result = await rag_service.aanswer_across(labels, request.question)
+            result['source_document_ids'] = [
+                document_for_vector.get(vector_id, vector_id)
+                for vector_id in result['source_document_ids']
+            ]
+
         assistant_message = ChatMessage(
             session_id=session.id,
             role="assistant",
             content=result['answer']
         )
         db.add(assistant_message)
-        db.commit()
-        
+        with query_timer("persist"):
+            await db.commit()
+
         return ChatResponse(
             answer=result['answer'],
             session_id=session.id,
-            sources=result['sources']
+            sources=result['sources'],
+            source_document_ids=result['source_document_ids'],
+            cached=result['cached'],
+            prompt_tokens=result['prompt_tokens'],
+            skipped_document_ids=skipped
         )
-    
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to generate answer: {str(e)}"
+        ) from e
+
+
+@router.post("/ask/stream")
+async def ask_question_stream(
+    request: ChatRequest,
+    db: AsyncSession = Depends(get_async_db),
+    rag_service: RAGService = Depends(get_rag_service)
+) -> StreamingResponse:
+    """Ask a question and stream the answer as Server-Sent Events.
+
+    Emits ``session`` (with ``skipped_document_ids`` when collection members
+    were not ready), then ``sources`` right after retrieval, then one
+    ``token`` event per generated chunk and a final ``done`` event. The
+    assistant message is saved once the stream finishes.
+    """
+    session, documents, skipped = await _start_exchange(request, db)
+    session_id = session.id
+    labels, document_for_vector = _document_scope(documents)
+    if len(documents) == 1:
+        stream = rag_service.astream_answer(
+            document_id=documents[0].vector_id,
+            question=request.question,
+            cache_version=documents[0].ingest_fingerprint
+        )
+    else:
+        stream = rag_service.astream_answer_across(labels, request.question)
+
+    async def event_stream() -> AsyncIterator[str]:
+        session_event = {"session_id": session_id}
+        if skipped:
+            session_event["skipped_document_ids"] = skipped
+        yield _sse("session", session_event)
+        try:
+            async for item in stream:
+                event = item.pop('event')
+                if event == 'sources' and len(documents) == 1:
+                    item['source_document_ids'] = [documents[0].id] * len(
+                        item['sources']
+                    )
+                elif event == 'sources':
+                    item['source_document_ids'] = [
+                        document_for_vector.get(vector_id, vector_id)
+                        for vector_id in item['source_document_ids']
+                    ]
+                if event == 'done':
+                    await _save_assistant_message(session_id, item['answer'])
+                    item['session_id'] = session_id
+                yield _sse(event, item)
+        except Exception as e:
+            yield _sse("error", {"detail": f"Failed to generate answer: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/ask/batch", response_model=BatchChatResponse)
+async def ask_batch(
+    request: BatchChatRequest,
+    db: AsyncSession = Depends(get_async_db),
+    rag_service: RAGService = Depends(get_rag_service)
+) -> BatchChatResponse:
+    """Ask several questions about one document.
+
+    Questions are embedded and retrieved together and answered with
+    concurrent LLM calls. All messages are saved in one transaction.
+    """
+    session, document = await _start_batch(request, db)
+
+    try:
+        answers = [
+            _batch_answer(item, document)
+            async for item in rag_service.aanswer_batch(
+                document.vector_id, request.questions, document.ingest_fingerprint
+            )
+        ]
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate answer: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to generate answers: {str(e)}"
+        ) from e
+
+    db.add_all(_batch_messages(session.id, answers))
+    with query_timer("persist"):
+        await db.commit()
+
+    return BatchChatResponse(
+        session_id=session.id,
+        results=sorted(answers, key=lambda answer: answer.index)
+    )
+
+
+@router.post("/ask/batch/stream")
+async def ask_batch_stream(
+    request: BatchChatRequest,
+    db: AsyncSession = Depends(get_async_db),
+    rag_service: RAGService = Depends(get_rag_service)
+) -> StreamingResponse:
+    """Ask several questions about one document, streaming answers as SSE events.
+
+    Emits ``session``, then one ``answer`` event per question in completion
+    order (each carries its ``index``), and a final ``done`` event once all
+    messages have been saved in one transaction.
+    """
+    session, document = await _start_batch(request, db)
+    session_id = session.id
+    stream = rag_service.aanswer_batch(
+        document.vector_id, request.questions, document.ingest_fingerprint
+    )
+
+    async def event_stream() -> AsyncIterator[str]:
+        yield _sse("session", {"session_id": session_id})
+        answers = []
+        try:
+            async for item in stream:
+                answer = _batch_answer(item, document)
+                answers.append(answer)
+                yield _sse("answer", answer.model_dump())
+            await _save_messages(_batch_messages(session_id, answers))
+            yield _sse("done", {"session_id": session_id, "answered": len(answers)})
+        except Exception as e:
+            yield _sse("error", {"detail": f"Failed to generate answers: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.get("/history/{session_id}", response_model=ChatHistoryResponse)
-async def get_chat_history(session_id: int, db: Session = Depends(get_db)) -> ChatHistoryResponse:
+async def get_chat_history(
+    session_id: int,
+    db: AsyncSession = Depends(get_async_db)
+) -> ChatHistoryResponse:
     """Get chat history for a session."""
-    session = db.query(ChatSession).filter(ChatSession.id == session_id).first()
+    session = await db.get(ChatSession, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Chat session not found")
-    
-    messages = db.query(ChatMessage).filter(
-        ChatMessage.session_id == session_id
-    ).order_by(ChatMessage.created_at).all()
-    
+
+    messages = (await db.execute(
+        select(ChatMessage)
+        .where(ChatMessage.session_id == session_id)
+        .order_by(ChatMessage.created_at)
+    )).scalars().all()
+
     return ChatHistoryResponse(
         session_id=session.id,
         document_id=session.document_id,
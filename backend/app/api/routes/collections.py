@@ -0,0 +1,66 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.api.deps import get_db
+from app.models.collection import Collection
+from app.models.document import Document
+from app.schemas.collection import CollectionCreate, CollectionResponse
+
+router = APIRouter()
+
+
+def _to_response(db: Session, collection: Collection) -> CollectionResponse:
+    """Build a collection response including its document ids."""
+    document_ids = [
+        row.id
+        for row in db.query(Document.id).filter(Document.collection_id == collection.id)
+    ]
+    response = CollectionResponse.model_validate(collection)
+    response.document_ids = document_ids
+    return response
+
+
+@router.post("/", response_model=CollectionResponse)
+async def create_collection(
+    request: CollectionCreate, db: Session = Depends(get_db)
+) -> CollectionResponse:
+    """Create a document collection."""
+    if db.query(Collection).filter(Collection.name == request.name).first():
+        raise HTTPException(status_code=409, detail="Collection already exists")
+
+    collection = Collection(name=request.name)
+    db.add(collection)
+    db.commit()
+    db.refresh(collection)
+
+    return _to_response(db, collection)
+
+
+@router.get("/", response_model=List[CollectionResponse])
+async def list_collections(db: Session = Depends(get_db)) -> List[CollectionResponse]:
+    """List all collections."""
+    collections = db.query(Collection).order_by(Collection.name).all()
+    return [_to_response(db, collection) for collection in collections]
+
+
+@router.put(
+    "/{collection_id}/documents/{document_id}", response_model=CollectionResponse
+)
+async def add_document_to_collection(
+    collection_id: int,
+    document_id: int,
+    db: Session = Depends(get_db)
+) -> CollectionResponse:
+    """Move a document into a collection."""
+    collection = db.query(Collection).filter(Collection.id == collection_id).first()
+    if not collection:
+        raise HTTPException(status_code=404, detail="Collection not found")
+
+    document = db.query(Document).filter(Document.id == document_id).first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    document.collection_id = collection.id
+    db.commit()
+
+    return _to_response(db, collection)
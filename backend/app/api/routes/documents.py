@@ -1,110 +1,199 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
-from typing import List
 from datetime import datetime
 import os
-from app.api.deps import get_db
+from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.api.deps import get_db, get_vector_store
+from app.models.collection import Collection
 from app.models.document import Document, DocumentStatus
 from app.schemas.document import (
     DocumentUploadResponse,
     DocumentProcessingStatus,
     DocumentListResponse
 )
-from app.services.document_processor import DocumentProcessor, _SUPPORTED_EXTENSIONS
+from app.services.document_processor import (
+    DocumentProcessor,
+    SavedUpload,
+    _SUPPORTED_EXTENSIONS,
+)
+from app.services.ingestion import (
+    count_vector_references,
+    find_reusable_vectors,
+    ingest_fingerprint,
+)
+from app.services.ingestion_queue import IngestionQueue
 from app.services.vector_store import VectorStoreService
+from app.core.concurrency import run_blocking
 from app.core.config import settings
+from app.core.exceptions import UploadTooLargeError
 
 router = APIRouter()
 
 
-def _process_document_background(document_id: int, file_path: str) -> None:
-    """Background task to process document."""
-    db = next(get_db())
-    try:
-        document = db.query(Document).filter(Document.id == document_id).first()
-        if not document:
-            return
-        
-        document.status = DocumentStatus.PROCESSING
-        db.commit()
-        
-        text = DocumentProcessor.extract_text(file_path)
-        
-        vector_store = VectorStoreService()
-        vector_store.add_document(
-            document_id=document_id,
-            text=text,
-            metadata={
-                'filename': document.filename,
-                'file_type': document.file_type
-            }
-        )
-        
-        document.status = DocumentStatus.COMPLETED
-        document.processed_at = datetime.utcnow()
-        db.commit()
-        
-    except Exception as e:
-        document.status = DocumentStatus.FAILED
-        document.error_message = str(e)
-        db.commit()
-    finally:
-        db.close()
-
-
-@router.post("/upload", response_model=DocumentUploadResponse)
-async def upload_document(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db)
-) -> DocumentUploadResponse:
-    """Upload and process a document."""
+def _save_validated_upload(file: UploadFile) -> SavedUpload:
+    """Check type and size, then stream the upload to disk."""
     if not DocumentProcessor.is_supported(file.filename):
         raise HTTPException(
             status_code=400,
-            detail=f"File type not supported. Supported types: {', '.join(_SUPPORTED_EXTENSIONS)}"
+            detail=(
+                "File type not supported. Supported types: "
+                f"{', '.join(_SUPPORTED_EXTENSIONS)}"
+            ),
         )
-    
+
     if file.size and file.size > settings.MAX_UPLOAD_SIZE:
         raise HTTPException(
-            status_code=400,
+            status_code=413,
             detail=f"File too large. Maximum size: {settings.MAX_UPLOAD_SIZE} bytes"
         )
-    
+
     try:
-        file_path = DocumentProcessor.save_upload(file.file, file.filename)
+        return DocumentProcessor.save_upload(file.file, file.filename)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
-    
+
+
+def _remove_file(file_path: str) -> None:
+    """Delete a stored upload, ignoring missing files."""
+    if os.path.exists(file_path):
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+
+
+@router.post("/upload", response_model=DocumentUploadResponse)
+async def upload_document(
+    file: UploadFile = File(...),
+    collection_id: Optional[int] = Form(None),
+    db: Session = Depends(get_db)
+) -> DocumentUploadResponse:
+    """Upload and process a document."""
+    if (
+        collection_id is not None
+        and not db.query(Collection).filter(Collection.id == collection_id).first()
+    ):
+        raise HTTPException(status_code=404, detail="Collection not found")
+
+    saved = await run_blocking(_save_validated_upload, file)
+
+    fingerprint = ingest_fingerprint(saved.sha256)
+    reusable_vector_id = find_reusable_vectors(db, fingerprint)
+
     document = Document(
         filename=file.filename,
-        file_path=file_path,
+        file_path=saved.path,
         file_type=file.content_type or "application/octet-stream",
-        file_size=file.size or 0,
+        file_size=saved.size,
+        content_hash=saved.sha256,
+        ingest_fingerprint=fingerprint,
+        collection_id=collection_id,
         status=DocumentStatus.UPLOADING
     )
-    
+
+    if reusable_vector_id is not None:
+        # Same bytes and pipeline config already indexed: share those vectors
+        document.vectors_document_id = reusable_vector_id
+        document.status = DocumentStatus.COMPLETED
+        document.processed_at = datetime.utcnow()
+
     db.add(document)
     db.commit()
     db.refresh(document)
-    
-    background_tasks.add_task(
-        _process_document_background,
-        document.id,
-        file_path
-    )
-    
+
+    if reusable_vector_id is None:
+        IngestionQueue.enqueue(db, document.id, saved.path)
+
+    return document
+
+
+@router.post("/{document_id}/reindex", response_model=DocumentUploadResponse)
+async def reindex_document(
+    document_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    vector_store: VectorStoreService = Depends(get_vector_store)
+) -> DocumentUploadResponse:
+    """Replace a document with a revised version, re-embedding only changed chunks."""
+    document = db.query(Document).filter(Document.id == document_id).first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    if document.status in (DocumentStatus.UPLOADING, DocumentStatus.PROCESSING):
+        raise HTTPException(status_code=409, detail="Document is still being processed")
+
+    owns_vectors = document.vectors_document_id is None
+    if (
+        owns_vectors
+        and count_vector_references(db, document.id, exclude_document_id=document.id)
+        > 0
+    ):
+        raise HTTPException(
+            status_code=409,
+            detail=(
+                "Document vectors are shared with identical uploads; "
+                "upload the revision as a new document"
+            ),
+        )
+
+    saved = await run_blocking(_save_validated_upload, file)
+    _remove_file(document.file_path)
+
+    fingerprint = ingest_fingerprint(saved.sha256)
+    reusable_vector_id = find_reusable_vectors(db, fingerprint)
+    old_vector_id = document.vector_id
+
+    document.filename = file.filename
+    document.file_path = saved.path
+    document.file_type = file.content_type or "application/octet-stream"
+    document.file_size = saved.size
+    document.content_hash = saved.sha256
+    document.ingest_fingerprint = fingerprint
+    document.error_message = None
+
+    if reusable_vector_id is not None:
+        document.vectors_document_id = (
+            None if reusable_vector_id == document.id else reusable_vector_id
+        )
+        document.status = DocumentStatus.COMPLETED
+        document.processed_at = datetime.utcnow()
+        db.commit()
+    else:
+        document.vectors_document_id = None
+        document.status = DocumentStatus.UPLOADING
+        db.commit()
+        IngestionQueue.enqueue(db, document.id, saved.path, incremental=owns_vectors)
+
+    # The revision may have been the last reference to its old vectors.
+    if (
+        old_vector_id != document.vector_id
+        and count_vector_references(db, old_vector_id) == 0
+    ):
+        vector_store.delete_document(old_vector_id)
+
+    db.refresh(document)
     return document
 
 
 @router.get("/status/{document_id}", response_model=DocumentProcessingStatus)
-async def get_document_status(document_id: int, db: Session = Depends(get_db)) -> DocumentProcessingStatus:
+async def get_document_status(
+    document_id: int, db: Session = Depends(get_db)
+) -> DocumentProcessingStatus:
     """Get document processing status."""
     document = db.query(Document).filter(Document.id == document_id).first()
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
-    
-    return document
+
+    job = IngestionQueue.latest_for_document(db, document_id)
+    status = DocumentProcessingStatus.model_validate(document)
+    if job:
+        status.stage = job.stage
+        status.progress = job.progress
+        status.attempts = job.attempts
+        status.chunks_written = job.checkpoint
+    return status
 
 
 @router.get("/", response_model=List[DocumentListResponse])
@@ -115,22 +204,26 @@ async def list_documents(db: Session = Depends(get_db)) -> List[DocumentListResp
 
 
 @router.delete("/{document_id}")
-async def delete_document(document_id: int, db: Session = Depends(get_db)) -> dict:
+async def delete_document(
+    document_id: int,
+    db: Session = Depends(get_db),
+    vector_store: VectorStoreService = Depends(get_vector_store)
+) -> dict:
     """Delete a document."""
     document = db.query(Document).filter(Document.id == document_id).first()
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
-    
-    vector_store = VectorStoreService()
-    vector_store.delete_document(document_id)
-    
-    if os.path.exists(document.file_path):
-        try:
-            os.remove(document.file_path)
-        except OSError:
-            pass
-    
+
+    if (
+        count_vector_references(db, document.vector_id, exclude_document_id=document.id)
+        == 0
+    ):
+        vector_store.delete_document(document.vector_id)
+
+    _remove_file(document.file_path)
+
+    IngestionQueue.delete_for_document(db, document_id)
     db.delete(document)
     db.commit()
-    
+
     return {"message": "Document deleted successfully"}
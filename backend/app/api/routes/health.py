@@ -1,31 +1,19 @@
-from fastapi import APIRouter
-import os
-import json
-from datetime import datetime
+from fastapi import APIRouter, Response
+from app.core.config import settings
+from app.services.model_registry import model_registry
+from app.services.request_counter import request_counter
 
 router = APIRouter()
 
 
 def get_rate_limit_status():
     """Get current rate limit status."""
-    counter_file = "/tmp/request_counter.json"
-    try:
-        if os.path.exists(counter_file):
-            with open(counter_file, 'r') as f:
-                data = json.load(f)
-                return {
-                    "month": data.get("month"),
-                    "requests_used": data.get("count", 0),
-                    "requests_limit": 2_000_000,
-                    "requests_remaining": max(0, 2_000_000 - data.get("count", 0))
-                }
-    except Exception:
-        pass
+    used = request_counter.count()
     return {
-        "month": datetime.utcnow().strftime("%Y-%m"),
-        "requests_used": 0,
-        "requests_limit": 2_000_000,
-        "requests_remaining": 2_000_000
+        "month": request_counter.month,
+        "requests_used": used,
+        "requests_limit": settings.MONTHLY_REQUEST_LIMIT,
+        "requests_remaining": max(0, settings.MONTHLY_REQUEST_LIMIT - used)
     }
 
 
@@ -37,3 +25,25 @@ async def health_check():
         "rate_limit": get_rate_limit_status(),
         "free_tier_protection": "enabled"
     }
+
+
+@router.get("/health/ready")
+async def readiness_check(response: Response):
+    """Readiness probe reporting whether models have finished warming up."""
+    if not model_registry.is_ready:
+        response.status_code = 503
+    return {
+        "status": "ready" if model_registry.is_ready else "warming_up",
+        "models": model_registry.status()
+    }
+
+
+@router.get("/health/caches")
+async def cache_stats():
+    """Hit/miss/eviction counters for the in-process caches and coalesced LLM calls."""
+    return {
+        "query_embeddings": model_registry.query_embedding_cache.stats(),
+        "answers": model_registry.answer_cache.stats(),
+        "vector_tables": model_registry.table_cache.stats(),
+        "llm_requests": model_registry.llm.stats()
+    }
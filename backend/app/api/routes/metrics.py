@@ -0,0 +1,26 @@
+import hmac
+from fastapi import APIRouter, Header, HTTPException, Response
+from app.core.config import settings
+from app.core.metrics import render_metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics(authorization: str = Header("")) -> Response:
+    """Prometheus scrape endpoint for stage latencies, caches and the ingestion queue.
+
+    Scrapers authenticate with ``Authorization: Bearer <METRICS_TOKEN>``;
+    without a configured token the endpoint is disabled.
+    """
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    expected = f"Bearer {settings.METRICS_TOKEN}".encode("utf-8")
+    if not hmac.compare_digest(authorization.encode("utf-8"), expected):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
@@ -0,0 +1,55 @@
+"""Bounded thread pool for blocking work on the async request path."""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, TypeVar
+from app.core.config import settings
+from app.core.profiling import current_profiler
+
+T = TypeVar("T")
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.BLOCKING_POOL_SIZE, thread_name_prefix="docuchat-blocking"
+)
+# Separate pool for fan_out, so blocking-pool threads never wait on their own pool
+_fan_out_executor = ThreadPoolExecutor(
+    max_workers=settings.BLOCKING_POOL_SIZE, thread_name_prefix="docuchat-fan-out"
+)
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking or CPU-heavy call without stalling the event loop.
+
+    The call keeps the caller's context, so request stage timings and an
+    active request profiler follow it onto the pool thread.
+    """
+    loop = asyncio.get_running_loop()
+    call = _bind_context(functools.partial(func, *args, **kwargs))
+    return await loop.run_in_executor(_executor, call)
+
+
+def _bind_context(call: Callable[[], T]) -> Callable[[], T]:
+    """Run ``call`` in a copy of the caller's context, under its profiler if any."""
+    profiler = current_profiler()
+    if profiler is not None:
+        call = profiler.wrap(call)
+    return functools.partial(contextvars.copy_context().run, call)
+
+
+def fan_out(func: Callable[..., T], items: Iterable[Any]) -> List[T]:
+    """Call ``func`` on each item concurrently from blocking code, keeping item order.
+
+    Safe to use from a :func:`run_blocking` call.
+    """
+    calls = [_bind_context(functools.partial(func, item)) for item in items]
+    if len(calls) < 2:
+        return [call() for call in calls]
+    futures = [_fan_out_executor.submit(call) for call in calls]
+    return [future.result() for future in futures]
+
+
+def shutdown_executor() -> None:
+    """Stop the blocking pools, waiting for in-flight calls."""
+    _executor.shutdown(wait=True)
+    _fan_out_executor.shutdown(wait=True)
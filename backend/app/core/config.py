@@ -12,12 +12,12 @@ class _Settings(BaseSettings):
 
     PROJECT_NAME: str = "DocuChat AI"
     API_V1_STR: str = "/api/v1"
-    
+
     DATABASE_URL: str
     SECRET_KEY: str
-    
+
     BACKEND_CORS_ORIGINS: Union[List[str], str] = ["http://localhost:5173"]
-    
+
     @field_validator("BACKEND_CORS_ORIGINS", mode="before")
     @classmethod
     def parse_cors_origins(cls, v):
@@ -26,17 +26,98 @@ class _Settings(BaseSettings):
             # Support comma-separated string for environment variables
             return [origin.strip() for origin in v.split(",")]
         return v
-    
+
     UPLOAD_DIR: str = "./uploads"
     MAX_UPLOAD_SIZE: int = 10485760
-    
+    UPLOAD_CHUNK_SIZE: int = 1048576
+
     CHROMA_PERSIST_DIRECTORY: str = "./chroma_data"
     COLLECTION_NAME: str = "documents"
-    
+    VECTOR_STORE_LAYOUT: str = "per_document"  # or "consolidated"
+    VECTOR_COMPACTION_THRESHOLD: int = 10000
+    VECTOR_TABLE_CACHE_SIZE: int = 256
+    VECTOR_TABLE_CACHE_TTL: float = 5.0
+    VECTOR_INDEX_MIN_ROWS: int = 5000  # 0 disables automatic index builds
+    VECTOR_INDEX_NUM_PARTITIONS: int = 0  # 0 = derive from row count
+    VECTOR_INDEX_NUM_SUB_VECTORS: int = 0  # 0 = derive from vector dimension
+    VECTOR_INDEX_REBUILD_GROWTH: float = 2.0  # retrain at this row growth; 0 disables
+    VECTOR_INDEX_REBUILD_UNINDEXED_RATIO: float = 0.5  # retrain above this unindexed
+    VECTOR_SEARCH_NPROBES: int = 20
+    VECTOR_SEARCH_REFINE_FACTOR: int = 0
+    VECTOR_SEARCH_FLAT_MAX_ROWS: int = 2000  # smaller filtered searches are exact
+    LEXICAL_INDEX_ENABLED: bool = True
+    # Defaults to lexical_index.sqlite3 in CHROMA_PERSIST_DIRECTORY
+    LEXICAL_INDEX_PATH: str = ""
+    HYBRID_RRF_K: int = 60
+    LEXICAL_ONLY_IDENTIFIER_QUERIES: bool = True
+    EMBEDDING_MODEL_NAME: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_PROCESSES: int = 0  # 0 or 1 disables the multi-process encode pool
+    EMBEDDING_POOL_MIN_CHUNKS: int = 1000
+    INGEST_WRITE_BATCH_SIZE: int = 256
+    EXTRACTION_FAST_PATH: bool = True
+    EXTRACTION_MIN_CHARS_PER_PAGE: int = 200
+    EXTRACTION_MAX_GARBAGE_RATIO: float = 0.05
+    EXTRACTION_SAMPLE_PAGES: int = 10  # Leading PDF pages the quality checks look at
+    EXTRACTION_SAMPLE_CHARS: int = 50000  # Leading text-file characters checked
+    PDF_EXTRACTION_WORKERS: int = 0  # 0 or 1 partitions each PDF in one call
+    PDF_PARALLEL_MIN_PAGES: int = 20
+    CHUNK_SIZE: int = 1000
+    CHUNK_OVERLAP: int = 200
+    RETRIEVAL_TOP_K: int = 4
+    MAX_DOCUMENTS_PER_QUESTION: int = 50
+    MAX_BATCH_QUESTIONS: int = 50
+    BATCH_LLM_CONCURRENCY: int = 8
+    CONTEXT_TOKEN_BUDGET: int = 2048  # 0 = no limit
+    # Hugging Face tokenizer for prompt token counts; defaults to the embedding model's
+    PROMPT_TOKENIZER: str = ""
+    # "lexical", or "semantic" to rank source sentences by embedding similarity
+    EXCERPT_SCORING: str = "lexical"
+
+    QUERY_EMBEDDING_CACHE_SIZE: int = 1024
+    QUERY_EMBEDDING_CACHE_TTL: int = 86400
+    QUERY_EMBEDDING_CACHE_DIR: str = ""
+    QUERY_EMBEDDING_CACHE_DISK_MAX_ROWS: int = 100_000  # 0 = unbounded
+
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    ANSWER_CACHE_MAX_ENTRIES: int = 256
+    ANSWER_CACHE_TTL: int = 86400
+
     GROQ_API_KEY: str
     MODEL_NAME: str = "llama-3.3-70b-versatile"
     TEMPERATURE: float = 0.7
     MAX_TOKENS: int = 1024
+    LLM_BACKEND: str = "groq"  # or "fake" for a deterministic offline model
+    LLM_FAKE_LATENCY: float = 0.5
+    LLM_FAKE_TOKEN_LATENCY: float = 0.02
+    LLM_MAX_ATTEMPTS: int = 3
+    LLM_RETRY_BACKOFF: float = 0.5
+    LLM_RETRY_MAX_WAIT: float = 8.0
+    LLM_COALESCE_REQUESTS: bool = True
+
+    BLOCKING_POOL_SIZE: int = 8
+
+    MONTHLY_REQUEST_LIMIT: int = 2_000_000  # Google Cloud Run free tier
+    RATE_LIMIT_FLUSH_INTERVAL: float = 1.0
+    RATE_LIMIT_PER_CLIENT_RPS: float = 0.0  # 0 disables per-client token buckets
+    RATE_LIMIT_PER_CLIENT_BURST: int = 20
+    TRUSTED_PROXY_HOPS: int = 1  # Proxies appending X-Forwarded-For; 0 = peer address
+
+    INGESTION_WORKER_PROCESSES: int = 2
+    # Dev/single-container only; each API process spawns its own
+    INGESTION_EMBEDDED_WORKERS: int = 0
+    INGESTION_POLL_INTERVAL: float = 1.0
+    INGESTION_MAX_ATTEMPTS: int = 3
+    INGESTION_RETRY_BACKOFF: float = 5.0
+    INGESTION_JOB_TIMEOUT: int = 900
+
+    METRICS_TOKEN: str = ""  # Bearer token scrapers send to /metrics; empty disables it
+    SERVER_TIMING_ENABLED: bool = True
+    PROFILE_DIR: str = "./profiles"
+    PROFILE_EVERY_N: int = 0  # Profile one in N asks and ingest jobs; 0 disables
+    PROFILE_TOKEN: str = ""  # Requests sending this in X-Profile-Token are profiled
+    PROFILE_INTERVAL: float = 0.005
 
 
 settings = _Settings()
@@ -6,6 +6,11 @@ class DocumentProcessingError(Exception):
     pass
 
 
+class UploadTooLargeError(DocumentProcessingError):
+    """Raised when an upload exceeds the configured size limit."""
+    pass
+
+
 class VectorStoreError(Exception):
     """Raised when vector store operations fail."""
     pass
@@ -0,0 +1,223 @@
+"""Prometheus metrics for ingestion and query stages.
+
+Stage histograms are observed where the work happens. Cache counters,
+ingestion queue depth and model warm state are read from the live
+objects at scrape time, so they cost nothing on the request path.
+
+When ``PROMETHEUS_MULTIPROC_DIR`` is set (before the app starts), stage
+metrics from every uvicorn worker and ingestion worker process are
+aggregated through that directory.
+
+Query stages are also summed per request for the ``Server-Timing`` header
+while :func:`request_stages` is active.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+INGEST_STAGES = ("extract", "split", "embed", "write")
+QUERY_STAGES = (
+    "embed",
+    "lexical_search",
+    "vector_search",
+    "prompt",
+    "llm",
+    "excerpt",
+    "persist",
+)
+
+_INGEST_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+_QUERY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+INGEST_STAGE_SECONDS = Histogram(
+    "docuchat_ingest_stage_seconds",
+    "Seconds spent per document in each ingestion stage",
+    ["stage"],
+    buckets=_INGEST_BUCKETS,
+)
+QUERY_STAGE_SECONDS = Histogram(
+    "docuchat_query_stage_seconds",
+    "Seconds spent in each query stage; repeated stages are observed per call",
+    ["stage"],
+    buckets=_QUERY_BUCKETS,
+)
+EXTRACTIONS = Counter(
+    "docuchat_extractions_total",
+    "Documents extracted, by extraction strategy",
+    ["strategy"],
+)
+INGESTED_CHUNKS = Counter(
+    "docuchat_ingested_chunks_total",
+    "Chunks embedded and written by ingestion",
+)
+
+# Bound children, so observing a stage skips the label lookup
+ingest_stage = {stage: INGEST_STAGE_SECONDS.labels(stage) for stage in INGEST_STAGES}
+query_stage = {stage: QUERY_STAGE_SECONDS.labels(stage) for stage in QUERY_STAGES}
+
+_request_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "request_stages", default=None
+)
+_request_stages_lock = threading.Lock()
+
+
+@contextmanager
+def request_stages() -> Iterator[Dict[str, float]]:
+    """Sum the query stage seconds spent on behalf of the current request.
+
+    Work handed to :func:`app.core.concurrency.run_blocking` keeps the
+    request's context, so stages run concurrently are summed.
+    """
+    stages: Dict[str, float] = {}
+    token = _request_stages.set(stages)
+    try:
+        yield stages
+    finally:
+        _request_stages.reset(token)
+
+
+@contextmanager
+def query_timer(stage: str) -> Iterator[None]:
+    """Observe the time spent in the block (or decorated call) under a query stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        query_stage[stage].observe(elapsed)
+        stages = _request_stages.get()
+        if stages is not None:
+            with _request_stages_lock:
+                stages[stage] = stages.get(stage, 0.0) + elapsed
+
+
+def observe_ingestion(strategy: str, timings: Dict[str, float], chunks: int) -> None:
+    """Record an ingested document's extraction strategy, timings and new chunks."""
+    EXTRACTIONS.labels(strategy).inc()
+    for stage, seconds in timings.items():
+        ingest_stage[stage].observe(seconds)
+    INGESTED_CHUNKS.inc(chunks)
+
+
+class RuntimeCollector:
+    """Scrape-time view of caches, the ingestion queue and model warm state."""
+
+    def describe(self):
+        """Nothing up front, so registering does not run a collection."""
+        return []
+
+    def collect(self):
+        """Yield metric families read from the current process."""
+        # Imported lazily so app.core does not depend on the services at import time
+        from app.core.database import SessionLocal
+        from app.services.ingestion_queue import IngestionQueue
+        from app.services.model_registry import model_registry
+
+        status = model_registry.status()
+        ready = GaugeMetricFamily(
+            "docuchat_model_ready", "Whether model warm-up has finished"
+        )
+        ready.add_metric([], float(status.pop("ready")))
+        yield ready
+        loaded = GaugeMetricFamily(
+            "docuchat_model_loaded",
+            "Whether a shared resource is loaded",
+            labels=["resource"],
+        )
+        for resource, is_loaded in status.items():
+            loaded.add_metric([resource], float(is_loaded))
+        yield loaded
+
+        caches = {
+            "query_embeddings": model_registry.query_embedding_cache.stats(),
+            "answers": model_registry.answer_cache.stats(),
+            "vector_tables": model_registry.table_cache.stats(),
+        }
+        hits = CounterMetricFamily(
+            "docuchat_cache_hits", "Cache hits", labels=["cache"]
+        )
+        misses = CounterMetricFamily(
+            "docuchat_cache_misses", "Cache misses", labels=["cache"]
+        )
+        entries = GaugeMetricFamily(
+            "docuchat_cache_entries", "Entries held by a cache", labels=["cache"]
+        )
+        for name, stats in caches.items():
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            entries.add_metric([name], stats["size"])
+        yield hits
+        yield misses
+        yield entries
+
+        if model_registry.status()["llm_initialized"]:
+            llm = model_registry.llm.stats()
+            calls = CounterMetricFamily(
+                "docuchat_llm_calls", "LLM backend calls", labels=["backend"]
+            )
+            calls.add_metric([llm["backend"]], llm["calls"])
+            yield calls
+            retries = CounterMetricFamily(
+                "docuchat_llm_retries", "LLM calls retried after transient errors"
+            )
+            retries.add_metric([], llm["retries"])
+            yield retries
+            coalesced = CounterMetricFamily(
+                "docuchat_llm_coalesced",
+                "LLM requests served by an identical in-flight call",
+            )
+            coalesced.add_metric([], llm["coalesced"])
+            yield coalesced
+
+        db = SessionLocal()
+        try:
+            depth = IngestionQueue.depth(db)
+        finally:
+            db.close()
+        queue = GaugeMetricFamily(
+            "docuchat_ingestion_queue_depth", "Ingestion jobs waiting to run"
+        )
+        queue.add_metric([], depth)
+        yield queue
+
+
+_runtime_collector = RuntimeCollector()
+if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    REGISTRY.register(_runtime_collector)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, with their content type."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        registry.register(_runtime_collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,49 @@
+"""Schema migrations: run at startup, plus helpers for the revisions themselves.
+
+Databases created before migrations existed were built with
+``Base.metadata.create_all`` and may already contain any of the tables and
+columns the revisions add, so revisions check before creating anything.
+"""
+import logging
+import os
+import sqlalchemy as sa
+from alembic import command, op
+from alembic.config import Config
+from app.core.database import engine
+
+logger = logging.getLogger(__name__)
+
+_SCRIPT_LOCATION = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "migrations"
+)
+# Serialises processes migrating the same Postgres database
+_ADVISORY_LOCK_KEY = 0x72616731
+
+
+def has_table(table: str) -> bool:
+    """Whether ``table`` exists in the database being migrated."""
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def has_column(table: str, column: str) -> bool:
+    """Whether ``table`` exists and has ``column``."""
+    inspector = sa.inspect(op.get_bind())
+    return inspector.has_table(table) and column in {
+        c["name"] for c in inspector.get_columns(table)
+    }
+
+
+def upgrade_database() -> None:
+    """Bring the database schema up to the latest revision."""
+    config = Config()
+    config.set_main_option("script_location", _SCRIPT_LOCATION)
+    with engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            # Every API and worker process migrates on start; let one of them do it
+            connection.execute(
+                sa.text("SELECT pg_advisory_xact_lock(:key)"),
+                {"key": _ADVISORY_LOCK_KEY},
+            )
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+    logger.info("Database schema is up to date")
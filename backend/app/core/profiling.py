@@ -0,0 +1,243 @@
+"""Opt-in sampling profiler for individual ask requests and ingest jobs.
+
+A profiled unit of work gets its own sampler thread, which records the
+stacks of the threads working for it every ``PROFILE_INTERVAL`` seconds:
+
+- threads that attached themselves (the ingestion worker, and blocking
+  pool threads running :func:`app.core.concurrency.run_blocking` calls for
+  a profiled request), labelled ``[thread <name>]``;
+- for a watched asyncio task, the event loop thread while the task runs,
+  or the task's chain of awaiting coroutines while it is suspended,
+  labelled ``[task]``. Time spent waiting on the LLM shows up here.
+
+Profiles are written as folded stacks (``frame;frame;frame count``), the
+input format of ``flamegraph.pl`` and speedscope.
+"""
+import asyncio
+import hmac
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Counter, Dict, Iterator, List, Optional, TypeVar
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_current_profiler: ContextVar[Optional["SamplingProfiler"]] = ContextVar(
+    "current_profiler", default=None
+)
+_sampled_calls = itertools.count(1)
+_labels: Dict[object, str] = {}
+
+
+def _label(code) -> str:
+    """``qualname (path:line)`` for a code object, with package-relative paths."""
+    label = _labels.get(code)
+    if label is None:
+        path = code.co_filename
+        if "site-packages" + os.sep in path:
+            path = path.rsplit("site-packages" + os.sep, 1)[1]
+        elif path.startswith(os.getcwd() + os.sep):
+            path = os.path.relpath(path)
+        name = getattr(code, "co_qualname", code.co_name)
+        label = _labels[code] = f"{name} ({path}:{code.co_firstlineno})"
+    return label
+
+
+def _thread_stack(frame) -> List[str]:
+    """Labels of a thread's frames, outermost first."""
+    stack = []
+    while frame is not None:
+        stack.append(_label(frame.f_code))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _await_stack(coro) -> List[str]:
+    """Labels of a suspended coroutine and everything it awaits, outermost first."""
+    stack = []
+    while coro is not None:
+        frame = (
+            getattr(coro, "cr_frame", None)
+            or getattr(coro, "gi_frame", None)
+            or getattr(coro, "ag_frame", None)
+        )
+        if frame is None:
+            if not hasattr(coro, "cr_frame") and not hasattr(coro, "gi_frame"):
+                # A future, task or other awaitable the chain is blocked on
+                stack.append(f"<awaiting {type(coro).__name__}>")
+            break
+        stack.append(_label(frame.f_code))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return stack
+
+
+class SamplingProfiler:
+    """Wall-clock sampler for the threads and task doing one unit of work."""
+
+    def __init__(self, name: str, interval: Optional[float] = None):
+        """Prepare a profile called ``name``; nothing is sampled until :meth:`start`."""
+        self.name = name
+        self.interval = interval or settings.PROFILE_INTERVAL
+        self.profile_id = (
+            f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        )
+        self.samples: Counter[str] = Counter()
+        self._threads: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._loop_thread: Optional[int] = None
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._started = 0.0
+        self.duration = 0.0
+
+    def watch_task(self, task: asyncio.Task) -> None:
+        """Sample ``task`` on the calling (event loop) thread."""
+        self._task = task
+        self._loop_thread = threading.get_ident()
+
+    @contextmanager
+    def attached(self) -> Iterator[None]:
+        """Sample the calling thread for the duration of the block."""
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._threads[ident] -= 1
+                if not self._threads[ident]:
+                    del self._threads[ident]
+
+    def wrap(self, func: Callable[[], T]) -> Callable[[], T]:
+        """Wrap a call so the thread that runs it is sampled while it does."""
+        def call() -> T:
+            with self.attached():
+                return func()
+        return call
+
+    def _sample(self) -> None:
+        frames = sys._current_frames()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        with self._lock:
+            threads = list(self._threads)
+        for ident in threads:
+            frame = frames.get(ident)
+            if frame is not None:
+                stack = [f"[thread {names.get(ident, ident)}]"] + _thread_stack(frame)
+                self.samples[";".join(stack)] += 1
+
+        task = self._task
+        if task is None or task.done():
+            return
+        coro = task.get_coro()
+        if getattr(coro, "cr_running", False):
+            stack = _thread_stack(frames.get(self._loop_thread))
+            root = _label(coro.cr_code)
+            if root in stack:
+                stack = stack[stack.index(root):]
+        else:
+            stack = _await_stack(coro)
+        if stack:
+            self.samples[";".join(["[task]"] + stack)] += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self._sample()
+            except Exception:
+                # Frames can change under the sampler; drop the sample
+                logger.debug("Profile sample failed", exc_info=True)
+
+    def start(self) -> None:
+        """Start sampling."""
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(
+            target=self._run, name=f"profiler-{self.name}", daemon=True
+        )
+        self._sampler.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampler thread."""
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self.duration = time.perf_counter() - self._started
+
+    def write(self, directory: Optional[str] = None) -> str:
+        """Write the folded stacks to ``<directory>/<profile_id>.folded``."""
+        directory = directory or settings.PROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.profile_id}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.info(
+            "Wrote profile %s: %d samples over %.3fs",
+            path,
+            sum(self.samples.values()),
+            self.duration,
+        )
+        return path
+
+
+def should_profile(token: Optional[str] = None) -> bool:
+    """Whether to profile the next unit of work.
+
+    True for a matching ``PROFILE_TOKEN`` or one in every ``PROFILE_EVERY_N``.
+    """
+    if (
+        settings.PROFILE_TOKEN
+        and token
+        and hmac.compare_digest(token, settings.PROFILE_TOKEN)
+    ):
+        return True
+    return (
+        settings.PROFILE_EVERY_N > 0
+        and next(_sampled_calls) % settings.PROFILE_EVERY_N == 0
+    )
+
+
+def current_profiler() -> Optional[SamplingProfiler]:
+    """The profiler sampling the current request, if any."""
+    return _current_profiler.get()
+
+
+@contextmanager
+def profiling(profiler: SamplingProfiler) -> Iterator[SamplingProfiler]:
+    """Run ``profiler`` for the block and make it the current profiler."""
+    token = _current_profiler.set(profiler)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _current_profiler.reset(token)
+
+
+@contextmanager
+def profile_thread(name: str) -> Iterator[Optional[SamplingProfiler]]:
+    """Profile the calling thread for the block if :func:`should_profile` says so."""
+    if not should_profile():
+        yield None
+        return
+    profiler = SamplingProfiler(name)
+    try:
+        with profiling(profiler), profiler.attached():
+            yield profiler
+    finally:
+        try:
+            profiler.write()
+        except OSError:
+            logger.exception("Failed to write profile %s", profiler.profile_id)
@@ -1,15 +1,57 @@
 """RAG Application main module."""
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api.routes import chat, documents, health
+from app.api.routes import chat, collections, documents, health, metrics
 from app.core.config import settings
-from app.core.database import Base, engine
+from app.core.concurrency import shutdown_executor
+from app.core.database import async_engine
+from app.core.migrations import upgrade_database
+from app.middleware.profiling import ProfilingMiddleware
 from app.middleware.rate_limit import MonthlyRequestLimiter
+from app.middleware.server_timing import ServerTimingMiddleware
+from app.middleware.upload_limit import UploadSizeLimiter
+from app.services.model_registry import model_registry
+from app.services.request_counter import request_counter
+from app.worker import start_workers, stop_workers
 
-Base.metadata.create_all(bind=engine)
+upgrade_database()
 
-app = FastAPI(title=settings.PROJECT_NAME, version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """Load and warm shared models once per process and start embedded workers."""
+    workers, stop = [], None
+    if settings.INGESTION_EMBEDDED_WORKERS > 0:
+        workers, stop = start_workers(
+            settings.INGESTION_EMBEDDED_WORKERS, settings.INGESTION_POLL_INTERVAL
+        )
+    await asyncio.to_thread(request_counter.flush)
+    await asyncio.to_thread(model_registry.warm_up)
+    yield
+    if workers:
+        await asyncio.to_thread(stop_workers, workers, stop)
+    await asyncio.to_thread(request_counter.flush)
+    shutdown_executor()
+    model_registry.shutdown()
+    await async_engine.dispose()
+
+
+app = FastAPI(title=settings.PROJECT_NAME, version="1.0.0", lifespan=lifespan)
+
+# Sampled profiling and stage timings run inside the rate limiter, so rejected
+# requests skip them
+if settings.PROFILE_EVERY_N > 0 or settings.PROFILE_TOKEN:
+    app.add_middleware(ProfilingMiddleware)
+
+if settings.SERVER_TIMING_ENABLED:
+    app.add_middleware(ServerTimingMiddleware)
+
+# Cut off oversized uploads while they are received, before multipart parsing
+# spools them
+app.add_middleware(UploadSizeLimiter, path_prefix=f"{settings.API_V1_STR}/documents")
 
 # Add rate limiting middleware to enforce free tier limits
 app.add_middleware(MonthlyRequestLimiter)
@@ -23,8 +65,16 @@ app.add_middleware(
 )
 
 app.include_router(health.router, prefix=settings.API_V1_STR, tags=["health"])
-app.include_router(documents.router, prefix=f"{settings.API_V1_STR}/documents", tags=["documents"])
+app.include_router(
+    documents.router, prefix=f"{settings.API_V1_STR}/documents", tags=["documents"]
+)
+app.include_router(
+    collections.router,
+    prefix=f"{settings.API_V1_STR}/collections",
+    tags=["collections"],
+)
 app.include_router(chat.router, prefix=f"{settings.API_V1_STR}/chat", tags=["chat"])
+app.include_router(metrics.router, tags=["metrics"])
 
 
 @app.get("/")
@@ -0,0 +1,58 @@
+"""Sampling profiler for ask requests."""
+import asyncio
+import logging
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.concurrency import run_blocking
+from app.core.config import settings
+from app.core.profiling import SamplingProfiler, profiling, should_profile
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling sampled ``/chat/ask`` requests.
+
+    One in ``PROFILE_EVERY_N`` ask requests is profiled, as is any request
+    sending ``PROFILE_TOKEN`` in ``X-Profile-Token``. The profile is
+    written to ``PROFILE_DIR`` once the response completes and named in
+    the ``X-Profile-Id`` response header.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.path_prefix = f"{settings.API_V1_STR}/chat/ask"
+
+    @staticmethod
+    def _token(scope: Scope) -> str:
+        for name, value in scope["headers"]:
+            if name == b"x-profile-token":
+                return value.decode("latin-1")
+        return ""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Profile the request if it is sampled."""
+        if (
+            scope["type"] != "http"
+            or not scope["path"].startswith(self.path_prefix)
+            or not should_profile(self._token(scope))
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = SamplingProfiler("ask")
+        profiler.watch_task(asyncio.current_task())
+
+        async def send_with_profile_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Profile-Id"] = profiler.profile_id
+            await send(message)
+
+        try:
+            with profiling(profiler):
+                await self.app(scope, receive, send_with_profile_id)
+        finally:
+            try:
+                await run_blocking(profiler.write)
+            except OSError:
+                logger.exception("Failed to write profile %s", profiler.profile_id)
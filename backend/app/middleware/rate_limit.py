@@ -1,106 +1,149 @@
 """Monthly request rate limiter to stay within free tier."""
-import os
-import json
-from datetime import datetime
-from pathlib import Path
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+import asyncio
+import math
+from datetime import datetime, timezone
+from typing import Optional
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.concurrency import run_blocking
+from app.core.config import settings
+from app.services.request_counter import RequestCounter, TokenBuckets, request_counter
 
 
-class MonthlyRequestLimiter(BaseHTTPMiddleware):
-    """Middleware to enforce monthly request limits."""
-    
-    # Google Cloud Run free tier limit
-    FREE_TIER_LIMIT = 2_000_000
-    COUNTER_FILE = "/tmp/request_counter.json"
-    
-    def __init__(self, app, max_requests: int = FREE_TIER_LIMIT):
-        super().__init__(app)
-        self.max_requests = max_requests
-        self._ensure_counter_file()
-    
-    def _ensure_counter_file(self):
-        """Ensure counter file exists."""
-        if not os.path.exists(self.COUNTER_FILE):
-            self._reset_counter()
-    
-    def _get_current_month(self) -> str:
-        """Get current month as YYYY-MM string."""
-        return datetime.utcnow().strftime("%Y-%m")
-    
-    def _read_counter(self) -> dict:
-        """Read request counter from file."""
-        try:
-            with open(self.COUNTER_FILE, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return self._reset_counter()
-    
-    def _reset_counter(self) -> dict:
-        """Reset counter for new month."""
-        data = {
-            "month": self._get_current_month(),
-            "count": 0
-        }
-        self._write_counter(data)
-        return data
-    
-    def _write_counter(self, data: dict):
-        """Write counter to file."""
-        os.makedirs(os.path.dirname(self.COUNTER_FILE), exist_ok=True)
-        with open(self.COUNTER_FILE, 'w') as f:
-            json.dump(data, f)
-    
-    def _increment_counter(self) -> int:
-        """Increment and return current request count."""
-        data = self._read_counter()
-        current_month = self._get_current_month()
-        
-        # Reset if new month
-        if data.get("month") != current_month:
-            data = self._reset_counter()
-        
-        data["count"] += 1
-        self._write_counter(data)
-        return data["count"]
-    
-    async def dispatch(self, request: Request, call_next):
+class MonthlyRequestLimiter:
+    """ASGI middleware enforcing the monthly request limit.
+
+    Requests are counted in memory by a shared :class:`RequestCounter`,
+    which is flushed to the database off the event loop. When
+    ``RATE_LIMIT_PER_CLIENT_RPS`` is set, each client (by its trusted
+    ``X-Forwarded-For`` hop or peer address) also gets a token bucket.
+    """
+
+    EXEMPT_PATHS = frozenset(
+        [
+            "/",
+            "/health",
+            "/metrics",
+            "/api/v1/health",
+            "/api/v1/health/ready",
+            "/api/v1/health/caches",
+        ]
+    )
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_requests: Optional[int] = None,
+        counter: Optional[RequestCounter] = None
+    ):
+        self.app = app
+        self.max_requests = max_requests or settings.MONTHLY_REQUEST_LIMIT
+        self.counter = counter or request_counter
+        self.buckets = (
+            TokenBuckets(
+                settings.RATE_LIMIT_PER_CLIENT_RPS, settings.RATE_LIMIT_PER_CLIENT_BURST
+            )
+            if settings.RATE_LIMIT_PER_CLIENT_RPS > 0
+            else None
+        )
+        self._flushes = set()
+
+    @staticmethod
+    def _client(scope: Scope) -> str:
+        """Identify the client by the ``X-Forwarded-For`` hop our proxy added.
+
+        Each of the ``TRUSTED_PROXY_HOPS`` proxies in front of the app appends
+        the address it received the request from, so the client is that many
+        hops from the end; anything before it was sent by the client and can
+        be forged. Falls back to the peer address.
+        """
+        hops = settings.TRUSTED_PROXY_HOPS
+        if hops > 0:
+            forwarded = b",".join(
+                value for name, value in scope["headers"] if name == b"x-forwarded-for"
+            )
+            addresses = [
+                hop.strip()
+                for hop in forwarded.decode("latin-1").split(",")
+                if hop.strip()
+            ]
+            if len(addresses) >= hops:
+                return addresses[-hops]
+        client = scope.get("client")
+        return client[0] if client else ""
+
+    def _schedule_flush(self) -> None:
+        """Flush the counter on the blocking pool if one is due."""
+        if self.counter.claim_flush():
+            task = asyncio.ensure_future(run_blocking(self.counter.flush))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    def _reset_date(self) -> str:
+        return datetime.fromtimestamp(
+            self.counter.month_ends, tz=timezone.utc
+        ).strftime("%Y-%m-%d")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Process request and enforce rate limit."""
-        # Skip rate limiting for health checks
-        if request.url.path in ["/", "/health", "/api/v1/health"]:
-            return await call_next(request)
-        
-        # Check and increment counter
-        current_count = self._increment_counter()
-        
-        # Calculate remaining requests
+        # Skip rate limiting for health checks and metrics scrapes
+        if scope["type"] != "http" or scope["path"] in self.EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        if self.buckets is not None:
+            wait = self.buckets.take(self._client(scope))
+            if wait:
+                response = JSONResponse(
+                    {
+                        "detail": (
+                            "Too many requests from this client. Slow down and retry."
+                        )
+                    },
+                    status_code=429,
+                    headers={"Retry-After": str(math.ceil(wait))},
+                )
+                await response(scope, receive, send)
+                return
+
+        current_count = self.counter.increment()
+        self._schedule_flush()
         remaining = self.max_requests - current_count
-        
-        # Add rate limit headers
-        response = None
+
         if current_count > self.max_requests:
             # Exceeded free tier limit
-            raise HTTPException(
+            response = JSONResponse(
+                {
+                    "detail": {
+                        "error": "Monthly request limit exceeded",
+                        "message": (
+                            f"Free tier limit of {self.max_requests:,} requests "
+                            "per month "
+                            "has been reached. Please try again next month."
+                        ),
+                        "limit": self.max_requests,
+                        "current": current_count,
+                        "reset_date": self._reset_date(),
+                    }
+                },
                 status_code=429,
-                detail={
-                    "error": "Monthly request limit exceeded",
-                    "message": f"Free tier limit of {self.max_requests:,} requests per month has been reached. Please try again next month.",
-                    "limit": self.max_requests,
-                    "current": current_count,
-                    "reset_date": f"{self._get_current_month()}-01"
-                }
             )
-        
-        # Process request
-        response = await call_next(request)
-        
-        # Add rate limit info to response headers
-        response.headers["X-RateLimit-Limit"] = str(self.max_requests)
-        response.headers["X-RateLimit-Remaining"] = str(max(0, remaining))
-        response.headers["X-RateLimit-Used"] = str(current_count)
-        
-        # Warning when approaching limit
-        if remaining < 100000:  # Less than 100k requests remaining
-            response.headers["X-RateLimit-Warning"] = f"Approaching monthly limit. {remaining:,} requests remaining."
-        
-        return response
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # Add rate limit info to response headers
+                headers = MutableHeaders(scope=message)
+                headers["X-RateLimit-Limit"] = str(self.max_requests)
+                headers["X-RateLimit-Remaining"] = str(max(0, remaining))
+                headers["X-RateLimit-Used"] = str(current_count)
+                # Warning when approaching limit
+                if remaining < 100000:  # Less than 100k requests remaining
+                    headers["X-RateLimit-Warning"] = (
+                        f"Approaching monthly limit. {remaining:,} requests remaining."
+                    )
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,42 @@
+"""Server-Timing header with each request's stage breakdown."""
+import time
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.metrics import request_stages
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware adding a ``Server-Timing`` header to every response.
+
+    Lists the seconds (as milliseconds) each query stage took for the
+    request, summed across concurrent calls, and ``total`` up to the start
+    of the response. Streamed responses only report the stages finished
+    before their first byte.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Collect stage timings and report them in the response headers."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        with request_stages() as stages:
+            async def send_with_timing(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    metrics = [
+                        f"{stage};dur={seconds * 1000:.1f}"
+                        for stage, seconds in stages.items()
+                    ]
+                    metrics.append(
+                        f"total;dur={(time.perf_counter() - started) * 1000:.1f}"
+                    )
+                    MutableHeaders(scope=message).append(
+                        "Server-Timing", ", ".join(metrics)
+                    )
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
@@ -0,0 +1,75 @@
+"""Request body size limit enforced while the body is received."""
+from typing import Optional
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+from app.core.exceptions import UploadTooLargeError
+
+# Allowance for multipart boundaries, part headers and form fields around the file
+_MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadSizeLimiter:
+    """ASGI middleware rejecting upload bodies larger than ``MAX_UPLOAD_SIZE``.
+
+    A declared ``Content-Length`` over the limit is rejected before any of
+    the body is read. Otherwise the bytes actually received are counted, and
+    the request is cut off with a 413 as soon as they pass the limit, rather
+    than after the multipart parser has spooled the whole body to disk.
+    """
+
+    def __init__(
+        self, app: ASGIApp, max_size: Optional[int] = None, path_prefix: str = ""
+    ):
+        self.app = app
+        self.max_size = settings.MAX_UPLOAD_SIZE if max_size is None else max_size
+        self.max_body = self.max_size + _MULTIPART_OVERHEAD
+        self.path_prefix = path_prefix
+
+    def _too_large(self) -> JSONResponse:
+        return JSONResponse(
+            {"detail": f"File too large. Maximum size: {self.max_size} bytes"},
+            status_code=413,
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if (
+                name == b"content-length"
+                and value.isdigit()
+                and int(value) > self.max_body
+            ):
+                await self._too_large()(scope, receive, send)
+                return
+
+        received = 0
+        exceeded = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body:
+                    exceeded = True
+                    raise UploadTooLargeError(
+                        f"File too large. Maximum size: {self.max_size} bytes"
+                    )
+            return message
+
+        async def guarded_send(message: Message) -> None:
+            # Once the limit is hit the app's error response is replaced by the 413
+            if not exceeded:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded:
+            await self._too_large()(scope, receive, send)
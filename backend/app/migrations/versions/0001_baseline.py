@@ -0,0 +1,66 @@
+"""Baseline schema: documents and chat history.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.migrations import has_table
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if not has_table("documents"):
+        op.create_table(
+            "documents",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("filename", sa.String(), nullable=False),
+            sa.Column("file_path", sa.String(), nullable=False),
+            sa.Column("file_type", sa.String(), nullable=False),
+            sa.Column("file_size", sa.Integer(), nullable=False),
+            sa.Column(
+                "status",
+                sa.Enum("UPLOADING", "PROCESSING", "COMPLETED", "FAILED", name="documentstatus"),
+                nullable=True,
+            ),
+            sa.Column("uploaded_at", sa.DateTime(), nullable=True),
+            sa.Column("processed_at", sa.DateTime(), nullable=True),
+            sa.Column("error_message", sa.String(), nullable=True),
+        )
+        op.create_index(op.f("ix_documents_id"), "documents", ["id"])
+
+    if not has_table("chat_sessions"):
+        op.create_table(
+            "chat_sessions",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("document_id", sa.Integer(), sa.ForeignKey("documents.id"), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index(op.f("ix_chat_sessions_id"), "chat_sessions", ["id"])
+
+    if not has_table("chat_messages"):
+        op.create_table(
+            "chat_messages",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("session_id", sa.Integer(), sa.ForeignKey("chat_sessions.id"), nullable=False),
+            sa.Column("role", sa.String(), nullable=False),
+            sa.Column("content", sa.Text(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index(op.f("ix_chat_messages_id"), "chat_messages", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_chat_messages_id"), table_name="chat_messages")
+    op.drop_table("chat_messages")
+    op.drop_index(op.f("ix_chat_sessions_id"), table_name="chat_sessions")
+    op.drop_table("chat_sessions")
+    op.drop_index(op.f("ix_documents_id"), table_name="documents")
+    op.drop_table("documents")
+    sa.Enum(name="documentstatus").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,52 @@
+"""Durable ingestion job queue.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.migrations import has_table
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if has_table("ingestion_jobs"):
+        return
+    op.create_table(
+        "ingestion_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("document_id", sa.Integer(), sa.ForeignKey("documents.id"), nullable=False),
+        sa.Column("file_path", sa.String(), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("QUEUED", "RUNNING", "SUCCEEDED", "FAILED", name="ingestionjobstatus"),
+            nullable=False,
+        ),
+        sa.Column("stage", sa.String(), nullable=True),
+        sa.Column("progress", sa.Integer(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("max_attempts", sa.Integer(), nullable=False),
+        sa.Column("next_run_at", sa.DateTime(), nullable=False),
+        sa.Column("locked_by", sa.String(), nullable=True),
+        sa.Column("locked_at", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index(op.f("ix_ingestion_jobs_id"), "ingestion_jobs", ["id"])
+    op.create_index(op.f("ix_ingestion_jobs_document_id"), "ingestion_jobs", ["document_id"])
+    op.create_index("ix_ingestion_jobs_claim", "ingestion_jobs", ["status", "next_run_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ingestion_jobs_claim", table_name="ingestion_jobs")
+    op.drop_index(op.f("ix_ingestion_jobs_document_id"), table_name="ingestion_jobs")
+    op.drop_index(op.f("ix_ingestion_jobs_id"), table_name="ingestion_jobs")
+    op.drop_table("ingestion_jobs")
+    sa.Enum(name="ingestionjobstatus").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,28 @@
+"""Content hash for duplicate upload detection.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.migrations import has_column
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if not has_column("documents", "content_hash"):
+        with op.batch_alter_table("documents") as batch_op:
+            batch_op.add_column(sa.Column("content_hash", sa.String(length=64), nullable=True))
+            batch_op.create_index(batch_op.f("ix_documents_content_hash"), ["content_hash"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.drop_index(batch_op.f("ix_documents_content_hash"))
+        batch_op.drop_column("content_hash")
@@ -0,0 +1,33 @@
+"""Ingest fingerprint and shared vectors owner.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.migrations import has_column
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("documents") as batch_op:
+        if not has_column("documents", "ingest_fingerprint"):
+            batch_op.add_column(sa.Column("ingest_fingerprint", sa.String(length=64), nullable=True))
+            batch_op.create_index(batch_op.f("ix_documents_ingest_fingerprint"), ["ingest_fingerprint"])
+        if not has_column("documents", "vectors_document_id"):
+            batch_op.add_column(sa.Column("vectors_document_id", sa.Integer(), nullable=True))
+            batch_op.create_index(batch_op.f("ix_documents_vectors_document_id"), ["vectors_document_id"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.drop_index(batch_op.f("ix_documents_vectors_document_id"))
+        batch_op.drop_column("vectors_document_id")
+        batch_op.drop_index(batch_op.f("ix_documents_ingest_fingerprint"))
+        batch_op.drop_column("ingest_fingerprint")
@@ -0,0 +1,28 @@
+"""Incremental re-ingestion flag on jobs.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.migrations import has_column
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if not has_column("ingestion_jobs", "incremental"):
+        with op.batch_alter_table("ingestion_jobs") as batch_op:
+            batch_op.add_column(
+                sa.Column("incremental", sa.Boolean(), nullable=False, server_default=sa.false())
+            )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("ingestion_jobs") as batch_op:
+        batch_op.drop_column("incremental")
@@ -0,0 +1,57 @@
+"""Document collections and multi-document chat sessions.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.migrations import has_column, has_table
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if not has_table("collections"):
+        op.create_table(
+            "collections",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.UniqueConstraint("name"),
+        )
+        op.create_index(op.f("ix_collections_id"), "collections", ["id"])
+
+    if not has_column("documents", "collection_id"):
+        with op.batch_alter_table("documents") as batch_op:
+            batch_op.add_column(sa.Column("collection_id", sa.Integer(), nullable=True))
+            batch_op.create_index(batch_op.f("ix_documents_collection_id"), ["collection_id"])
+            batch_op.create_foreign_key(
+                "fk_documents_collection_id_collections", "collections", ["collection_id"], ["id"]
+            )
+
+    with op.batch_alter_table("chat_sessions") as batch_op:
+        if not has_column("chat_sessions", "document_ids"):
+            batch_op.add_column(sa.Column("document_ids", sa.String(), nullable=True))
+        if not has_column("chat_sessions", "collection_id"):
+            batch_op.add_column(sa.Column("collection_id", sa.Integer(), nullable=True))
+            batch_op.create_foreign_key(
+                "fk_chat_sessions_collection_id_collections", "collections", ["collection_id"], ["id"]
+            )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("chat_sessions") as batch_op:
+        batch_op.drop_constraint("fk_chat_sessions_collection_id_collections", type_="foreignkey")
+        batch_op.drop_column("collection_id")
+        batch_op.drop_column("document_ids")
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.drop_constraint("fk_documents_collection_id_collections", type_="foreignkey")
+        batch_op.drop_index(batch_op.f("ix_documents_collection_id"))
+        batch_op.drop_column("collection_id")
+    op.drop_index(op.f("ix_collections_id"), table_name="collections")
+    op.drop_table("collections")
@@ -0,0 +1,28 @@
+"""Resume checkpoint on ingestion jobs.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.migrations import has_column
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if not has_column("ingestion_jobs", "checkpoint"):
+        with op.batch_alter_table("ingestion_jobs") as batch_op:
+            batch_op.add_column(
+                sa.Column("checkpoint", sa.Integer(), nullable=False, server_default=sa.text("0"))
+            )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("ingestion_jobs") as batch_op:
+        batch_op.drop_column("checkpoint")
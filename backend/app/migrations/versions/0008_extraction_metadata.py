@@ -0,0 +1,29 @@
+"""Extraction strategy and per-stage ingestion timings.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.migrations import has_column
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("documents") as batch_op:
+        if not has_column("documents", "extraction_strategy"):
+            batch_op.add_column(sa.Column("extraction_strategy", sa.String(), nullable=True))
+        if not has_column("documents", "stage_timings"):
+            batch_op.add_column(sa.Column("stage_timings", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.drop_column("stage_timings")
+        batch_op.drop_column("extraction_strategy")
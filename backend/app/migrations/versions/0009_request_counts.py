@@ -0,0 +1,28 @@
+"""Monthly request counts shared by API processes.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.migrations import has_table
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if not has_table("request_counts"):
+        op.create_table(
+            "request_counts",
+            sa.Column("month", sa.String(length=7), primary_key=True),
+            sa.Column("count", sa.BigInteger(), nullable=False),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("request_counts")
@@ -5,17 +5,23 @@ from app.core.database import Base
 
 class ChatSession(Base):
     """Chat session model."""
-    
+
     __tablename__ = "chat_sessions"
 
     id = Column(Integer, primary_key=True, index=True)
-    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
+    document_id = Column(
+        Integer, ForeignKey("documents.id"), nullable=False
+    )  # first document in scope
+    document_ids = Column(
+        String, nullable=True
+    )  # comma-separated ids for multi-document sessions
+    collection_id = Column(Integer, ForeignKey("collections.id"), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
 class ChatMessage(Base):
     """Chat message model."""
-    
+
     __tablename__ = "chat_messages"
 
     id = Column(Integer, primary_key=True, index=True)
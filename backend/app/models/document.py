@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, JSON
 from datetime import datetime
 import enum
 from app.core.database import Base
@@ -14,7 +14,7 @@ class DocumentStatus(str, enum.Enum):
 
 class Document(Base):
     """Document model."""
-    
+
     __tablename__ = "documents"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -22,7 +22,24 @@ class Document(Base):
     file_path = Column(String, nullable=False)
     file_type = Column(String, nullable=False)
     file_size = Column(Integer, nullable=False)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 hex digest
+    ingest_fingerprint = Column(String(64), nullable=True, index=True)
+    vectors_document_id = Column(
+        Integer, nullable=True, index=True
+    )  # shared vectors owner
+    collection_id = Column(
+        Integer, ForeignKey("collections.id"), nullable=True, index=True
+    )
     status = Column(Enum(DocumentStatus), default=DocumentStatus.UPLOADING)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
     processed_at = Column(DateTime, nullable=True)
     error_message = Column(String, nullable=True)
+    extraction_strategy = Column(
+        String, nullable=True
+    )  # e.g. 'pypdf', 'plain_text', 'unstructured'
+    stage_timings = Column(JSON, nullable=True)  # seconds per ingestion stage
+
+    @property
+    def vector_id(self) -> int:
+        """Id under which this document's vectors are stored."""
+        return self.vectors_document_id or self.id
@@ -0,0 +1,55 @@
+from datetime import datetime
+import enum
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Integer,
+    String,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+)
+from app.core.database import Base
+
+
+class IngestionJobStatus(str, enum.Enum):
+    """Ingestion job status enum."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class IngestionJob(Base):
+    """Durable document ingestion job claimed by worker processes."""
+
+    __tablename__ = "ingestion_jobs"
+    __table_args__ = (
+        Index("ix_ingestion_jobs_claim", "status", "next_run_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(
+        Integer, ForeignKey("documents.id"), nullable=False, index=True
+    )
+    file_path = Column(String, nullable=False)
+    incremental = Column(
+        Boolean, default=False, nullable=False
+    )  # diff against stored chunks
+    status = Column(
+        Enum(IngestionJobStatus), default=IngestionJobStatus.QUEUED, nullable=False
+    )
+    stage = Column(String, nullable=True)  # 'extract', 'split', 'embed' or 'write'
+    progress = Column(Integer, default=0, nullable=False)  # percent
+    attempts = Column(Integer, default=0, nullable=False)
+    checkpoint = Column(
+        Integer, default=0, nullable=False
+    )  # chunks written; retries resume here
+    max_attempts = Column(Integer, nullable=False)
+    next_run_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    locked_by = Column(String, nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
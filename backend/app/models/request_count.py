@@ -0,0 +1,11 @@
+from sqlalchemy import BigInteger, Column, String
+from app.core.database import Base
+
+
+class RequestCount(Base):
+    """Requests served in a calendar month, shared by every API process."""
+
+    __tablename__ = "request_counts"
+
+    month = Column(String(7), primary_key=True)  # YYYY-MM
+    count = Column(BigInteger, default=0, nullable=False)
@@ -1,27 +1,85 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator, model_validator
 from datetime import datetime
 from typing import List
 
 
 class ChatRequest(BaseModel):
-    """Chat request schema."""
-    
-    document_id: int
+    """Chat request schema.
+
+    Exactly one of ``document_id``, ``document_ids`` or ``collection_id``
+    selects the documents to answer from.
+    """
+
+    document_id: int | None = None
+    document_ids: List[int] | None = None
+    collection_id: int | None = None
     question: str
     session_id: int | None = None
 
+    @model_validator(mode="after")
+    def check_scope(self):
+        """Require exactly one document scope."""
+        scopes = [self.document_id, self.document_ids, self.collection_id]
+        if sum(scope is not None for scope in scopes) != 1:
+            raise ValueError(
+                "Provide exactly one of document_id, document_ids or collection_id"
+            )
+        if self.document_ids is not None and not self.document_ids:
+            raise ValueError("document_ids must not be empty")
+        return self
+
 
 class ChatResponse(BaseModel):
     """Chat response schema."""
-    
+
     answer: str
     session_id: int
     sources: List[str] = []
+    source_document_ids: List[int] = []
+    cached: bool = False
+    prompt_tokens: int = 0
+    skipped_document_ids: List[int] = []  # collection members not ready yet
+
+
+class BatchChatRequest(BaseModel):
+    """Batch chat request schema: several questions about one document."""
+
+    document_id: int
+    questions: List[str]
+    session_id: int | None = None
+
+    @field_validator("questions")
+    @classmethod
+    def check_questions(cls, questions: List[str]) -> List[str]:
+        """Require at least one question."""
+        if not questions:
+            raise ValueError("questions must not be empty")
+        return questions
+
+
+class BatchAnswer(BaseModel):
+    """Answer to one question of a batch."""
+
+    index: int
+    question: str
+    answer: str = ""
+    sources: List[str] = []
+    source_document_ids: List[int] = []
+    cached: bool = False
+    prompt_tokens: int = 0
+    error: str | None = None
+
+
+class BatchChatResponse(BaseModel):
+    """Batch chat response schema; results are in question order."""
+
+    session_id: int
+    results: List[BatchAnswer]
 
 
 class ChatMessageSchema(BaseModel):
     """Chat message schema."""
-    
+
     role: str
     content: str
     created_at: datetime
@@ -29,7 +87,7 @@ class ChatMessageSchema(BaseModel):
 
 class ChatHistoryResponse(BaseModel):
     """Chat history response schema."""
-    
+
     session_id: int
     document_id: int
     messages: List[ChatMessageSchema]
@@ -0,0 +1,20 @@
+from datetime import datetime
+from typing import List
+from pydantic import BaseModel, ConfigDict
+
+
+class CollectionCreate(BaseModel):
+    """Collection creation schema."""
+
+    name: str
+
+
+class CollectionResponse(BaseModel):
+    """Collection response schema."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: str
+    created_at: datetime
+    document_ids: List[int] = []
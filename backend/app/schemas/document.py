@@ -1,43 +1,52 @@
-from pydantic import BaseModel, ConfigDict
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
+from pydantic import BaseModel, ConfigDict
 from app.models.document import DocumentStatus
 
 
 class DocumentUploadResponse(BaseModel):
     """Document upload response schema."""
-    
+
     model_config = ConfigDict(from_attributes=True)
-    
+
     id: int
     filename: str
     file_type: str
     file_size: int
+    content_hash: Optional[str] = None
+    collection_id: Optional[int] = None
     status: DocumentStatus
     uploaded_at: datetime
 
 
 class DocumentProcessingStatus(BaseModel):
     """Document processing status schema."""
-    
+
     model_config = ConfigDict(from_attributes=True)
-    
+
     id: int
     filename: str
     status: DocumentStatus
     uploaded_at: datetime
     processed_at: Optional[datetime] = None
     error_message: Optional[str] = None
+    stage: Optional[str] = None
+    progress: Optional[int] = None
+    attempts: Optional[int] = None
+    chunks_written: Optional[int] = None
+    extraction_strategy: Optional[str] = None
+    stage_timings: Optional[Dict[str, float]] = None
 
 
 class DocumentListResponse(BaseModel):
     """Document list response schema."""
-    
+
     model_config = ConfigDict(from_attributes=True)
-    
+
     id: int
     filename: str
     file_type: str
     file_size: int
+    collection_id: Optional[int] = None
     status: DocumentStatus
     uploaded_at: datetime
@@ -0,0 +1,116 @@
+"""Semantic cache of generated answers."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """Per-document cache of answers keyed by question embedding.
+
+    A lookup returns a cached answer when the new question's embedding has
+    cosine similarity of at least ``similarity_threshold`` with a stored one.
+    Each document holds at most ``max_entries_per_document`` entries, evicted
+    least-recently-used first. Passing a ``version`` (for example the
+    document's ingest fingerprint) drops entries cached under any other
+    version, so re-ingests in another process still invalidate the cache.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        max_entries_per_document: int = 256,
+        ttl_seconds: float = 86400.0,
+    ):
+        """Initialize the cache."""
+        self.similarity_threshold = similarity_threshold
+        self.max_entries_per_document = max_entries_per_document
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[int, "OrderedDict[str, dict]"] = {}
+        self._versions: Dict[int, Optional[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        arr = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(arr)
+        return arr / norm if norm else arr
+
+    def _is_expired(self, entry: dict, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry["created_at"] > self.ttl_seconds
+
+    def _check_version(self, document_id: int, version: Optional[str]) -> None:
+        if version is not None and self._versions.get(document_id) != version:
+            self._entries.pop(document_id, None)
+            self._versions[document_id] = version
+
+    def lookup(
+        self,
+        document_id: int,
+        query_embedding: List[float],
+        version: Optional[str] = None,
+    ) -> Optional[Dict]:
+        """Return the cached result for the most similar question, if close enough."""
+        query = self._normalize(query_embedding)
+        now = time.time()
+        with self._lock:
+            self._check_version(document_id, version)
+            entries = self._entries.get(document_id)
+            if entries:
+                for key in [k for k, e in entries.items() if self._is_expired(e, now)]:
+                    del entries[key]
+            if not entries:
+                self.misses += 1
+                return None
+            keys = list(entries.keys())
+            matrix = np.stack([entries[k]["embedding"] for k in keys])
+            scores = matrix @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+            entries.move_to_end(keys[best])
+            self.hits += 1
+            return entries[keys[best]]["result"]
+
+    def store(
+        self,
+        document_id: int,
+        question: str,
+        query_embedding: List[float],
+        result: Dict,
+        version: Optional[str] = None
+    ) -> None:
+        """Cache the result generated for a question."""
+        with self._lock:
+            self._check_version(document_id, version)
+            entries = self._entries.setdefault(document_id, OrderedDict())
+            entries[question] = {
+                "embedding": self._normalize(query_embedding),
+                "result": result,
+                "created_at": time.time(),
+            }
+            entries.move_to_end(question)
+            while len(entries) > self.max_entries_per_document:
+                entries.popitem(last=False)
+
+    def invalidate(self, document_id: int) -> None:
+        """Drop every cached answer for a document."""
+        with self._lock:
+            self._entries.pop(document_id, None)
+            self._versions.pop(document_id, None)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "documents": len(self._entries),
+                "size": sum(len(e) for e in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,184 @@
+"""Token-budgeted packing of retrieved chunks into LLM prompt context."""
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+_PARAGRAPH_PATTERN = re.compile(r"\n\s*\n")
+# Shorter suffix/prefix matches between neighbouring chunks are treated as chance
+_MIN_OVERLAP_CHARS = 20
+# Paragraphs at least this long are emitted once even if several chunks repeat them
+_MIN_DUPLICATE_CHARS = 40
+# A span is cut to fit the remaining budget only if that leaves room for this
+# many tokens
+_MIN_TRUNCATED_TOKENS = 64
+_BLOCK_SEPARATOR = "\n\n"
+
+
+class PackedContext(NamedTuple):
+    """Prompt context and what it cost."""
+    text: str
+    tokens: int
+    spans: int
+    merged_chunks: int
+    dropped_chunks: int
+
+
+def overlap_length(left: str, right: str) -> int:
+    """Length of the longest suffix of ``left`` that is also a prefix of ``right``."""
+    limit = min(len(left), len(right))
+    if not limit:
+        return 0
+    # KMP failure function over "right-prefix \0 left-suffix"
+    probe = right[:limit] + "\0" + left[-limit:]
+    failure = [0] * len(probe)
+    for i in range(1, len(probe)):
+        k = failure[i - 1]
+        while k and probe[i] != probe[k]:
+            k = failure[k - 1]
+        if probe[i] == probe[k]:
+            k += 1
+        failure[i] = k
+    return failure[-1]
+
+
+def _merge_text(left: str, right: str) -> str:
+    """Join consecutive chunks, emitting text they share only once."""
+    overlap = overlap_length(left, right)
+    if overlap >= _MIN_OVERLAP_CHARS or overlap == len(right):
+        return left + right[overlap:]
+    return left + "\n" + right
+
+
+def _chunk_key(chunk: Dict):
+    """Identity of a retrieved chunk: its row id, or its text when it has none."""
+    return chunk.get('chunk_id') or (chunk.get('document_id'), chunk['content'])
+
+
+def _spans(chunks: List[Dict]) -> List[Dict]:
+    """Group chunks of one document with consecutive indices into spans.
+
+    Spans keep the relevance order of their best-ranked chunk; chunks
+    inside a span are in document order. A chunk retrieved more than once
+    is used once; distinct chunks that share an index are kept apart.
+    """
+    ranked, copies = [], {}
+    for rank, chunk in enumerate(chunks):
+        key = _chunk_key(chunk)
+        if key not in copies:
+            ranked.append((rank, chunk))
+        copies[key] = copies.get(key, 0) + 1
+    ordered = sorted(
+        (item for item in ranked if item[1].get('chunk_index') is not None),
+        key=lambda item: (
+            str(item[1].get('document_id')),
+            item[1]['chunk_index'],
+            item[0],
+        ),
+    )
+    spans: List[Dict] = []
+    previous = None
+    for rank, chunk in ordered:
+        if (
+            previous is not None
+            and previous.get('document_id') == chunk.get('document_id')
+            and chunk['chunk_index'] - previous['chunk_index'] == 1
+        ):
+            span = spans[-1]
+            span['text'] = _merge_text(span['text'], chunk['content'])
+            span['rank'] = min(span['rank'], rank)
+            span['chunks'] += copies[_chunk_key(chunk)]
+        else:
+            spans.append({
+                'document_id': chunk.get('document_id'),
+                'text': chunk['content'],
+                'rank': rank,
+                'chunks': copies[_chunk_key(chunk)],
+            })
+        previous = chunk
+
+    spans.extend(
+        {
+            'document_id': chunk.get('document_id'),
+            'text': chunk['content'],
+            'rank': rank,
+            'chunks': copies[_chunk_key(chunk)],
+        }
+        for rank, chunk in ranked if chunk.get('chunk_index') is None
+    )
+    return sorted(spans, key=lambda span: span['rank'])
+
+
+def _without_duplicates(text: str, seen: set) -> Tuple[str, set]:
+    """Drop paragraphs of ``text`` in ``seen``; returns the rest and their keys."""
+    kept, keys = [], set()
+    for paragraph in _PARAGRAPH_PATTERN.split(text):
+        key = " ".join(paragraph.split())
+        if len(key) >= _MIN_DUPLICATE_CHARS:
+            if key in seen or key in keys:
+                continue
+            keys.add(key)
+        kept.append(paragraph)
+    return "\n\n".join(kept).strip(), keys
+
+
+def _truncate_to_budget(
+    block: str, budget: int, count_tokens: Callable[[str], int]
+) -> str:
+    """Longest word-boundary prefix of ``block`` plus ellipsis within ``budget``."""
+    low, high = 0, len(block)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(block[:middle] + " ..." + _BLOCK_SEPARATOR) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    cut = block.rfind(" ", 0, low + 1)
+    return block[:cut if cut > 0 else low].rstrip() + " ..."
+
+
+def pack_context(
+    chunks: List[Dict],
+    count_tokens: Callable[[str], int],
+    budget: int,
+    labels: Optional[Dict[int, str]] = None
+) -> PackedContext:
+    """Build prompt context from ranked chunks within a token budget.
+
+    Neighbouring chunks of the same document are merged so the text their
+    split overlap repeats is sent once, exact and contained duplicates are
+    dropped, and spans are added in relevance order until ``budget`` tokens
+    are used. When ``labels`` maps document ids to names, each span is
+    prefixed with its source. A budget of 0 disables the limit.
+    """
+    blocks: List[str] = []
+    seen_paragraphs: set = set()
+    used = 0
+    packed_chunks = 0
+    spans = _spans(chunks)
+    for span in spans:
+        text, paragraphs = _without_duplicates(span['text'], seen_paragraphs)
+        if not text or any(text in block for block in blocks):
+            packed_chunks += span['chunks']
+            continue
+        if labels:
+            label = labels.get(span['document_id'], span['document_id'])
+            text = f"[Source: {label}]\n{text}"
+
+        cost = count_tokens(text + _BLOCK_SEPARATOR)
+        if budget and used + cost > budget:
+            remaining = budget - used
+            if remaining < _MIN_TRUNCATED_TOKENS:
+                continue
+            text = _truncate_to_budget(text, remaining, count_tokens)
+            cost = count_tokens(text + _BLOCK_SEPARATOR)
+        blocks.append(text)
+        seen_paragraphs |= paragraphs
+        used += cost
+        packed_chunks += span['chunks']
+
+    return PackedContext(
+        text=_BLOCK_SEPARATOR.join(blocks),
+        tokens=used,
+        spans=len(blocks),
+        merged_chunks=len(chunks) - len(spans),
+        dropped_chunks=len(chunks) - packed_chunks,
+    )
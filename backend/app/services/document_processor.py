@@ -1,13 +1,142 @@
-from typing import BinaryIO
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional, Tuple
 from pathlib import Path
+import codecs
+import hashlib
+import logging
+import math
+import multiprocessing
+import os
+import re
+import tempfile
+from pypdf import PdfReader, PdfWriter
 from unstructured.partition.auto import partition
 from unstructured.partition.pdf import partition_pdf
 from unstructured.partition.docx import partition_docx
 from unstructured.partition.text import partition_text
 from app.core.config import settings
+from app.core.exceptions import UploadTooLargeError
 
 
+logger = logging.getLogger(__name__)
+
 _SUPPORTED_EXTENSIONS = {'.pdf', '.doc', '.docx', '.txt'}
+_EXTRACTION_VERSION = "tiered-4"
+_CID_PATTERN = re.compile(r"\(cid:\d+\)")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+# Page ranges per extraction worker, so uneven pages still balance
+_PDF_RANGES_PER_WORKER = 4
+# Pages partitioned per call once the fast strategy's sample has passed
+_PDF_FAST_WINDOW_PAGES = 50
+
+
+class ExtractedElement(NamedTuple):
+    """Text of one document element and the page it came from."""
+    text: str
+    page_number: Optional[int] = None
+
+
+class Extraction(NamedTuple):
+    """Elements of a document and the extraction strategy that produced them."""
+    strategy: str
+    elements: Iterator[ExtractedElement]
+
+
+def _garbage_ratio(texts: List[str]) -> float:
+    """Share of characters that are unprintable, replacement glyphs or ``(cid:N)``."""
+    total = sum(len(text) for text in texts)
+    if not total:
+        return 1.0
+    bad = 0
+    for text in texts:
+        bad += sum(len(match) for match in _CID_PATTERN.findall(text))
+        bad += sum(
+            1 for ch in text if ch == "\ufffd" or not (ch.isprintable() or ch.isspace())
+        )
+    return bad / total
+
+
+def _is_usable_text(texts: List[str], pages: Optional[int] = None) -> bool:
+    """Whether cheaply extracted text is dense and clean enough to keep.
+
+    Scanned PDFs yield almost no characters per page, and PDFs with broken
+    font encodings yield mostly unprintable or unmapped glyphs.
+    """
+    if not any(text.strip() for text in texts):
+        return False
+    if pages:
+        visible = sum(
+            len(text) - sum(1 for ch in text if ch.isspace()) for text in texts
+        )
+        if visible / pages < settings.EXTRACTION_MIN_CHARS_PER_PAGE:
+            return False
+    return _garbage_ratio(texts) <= settings.EXTRACTION_MAX_GARBAGE_RATIO
+
+
+def _page_number(element) -> Optional[int]:
+    """Page number unstructured recorded for an element, if any."""
+    return getattr(getattr(element, "metadata", None), "page_number", None)
+
+
+def _iter_paragraphs(file_path: str, strict_chars: int) -> Iterator[str]:
+    """Yield the paragraphs of a UTF-8 text file, reading it line by line.
+
+    The first ``strict_chars`` characters must decode cleanly; invalid bytes
+    after them are replaced rather than failing an accepted extraction.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    lines: List[str] = []
+    read = 0
+    with open(file_path, "rb") as f:
+        for raw in f:
+            line = decoder.decode(raw).replace("\r\n", "\n")
+            read += len(line)
+            if read >= strict_chars:
+                decoder.errors = "replace"
+            if line.strip():
+                lines.append(line)
+            elif lines:
+                yield "".join(lines).strip()
+                lines = []
+        lines.append(decoder.decode(b"", final=True))
+    paragraph = "".join(lines).strip()
+    if paragraph:
+        yield paragraph
+
+
+def _partition_pdf_pages(
+    file_path: str, first_page: int, last_page: int, strategy: str = "auto"
+) -> List[Tuple[str, Optional[int]]]:
+    """Partition pages ``first_page``..``last_page`` (1-based) of a PDF.
+
+    Runs in an extraction worker process. Returns plain ``(text, page)``
+    tuples with page numbers relative to the whole document.
+    """
+    reader = PdfReader(file_path)
+    writer = PdfWriter()
+    for index in range(first_page - 1, last_page):
+        writer.add_page(reader.pages[index])
+    fd, range_path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            writer.write(f)
+        elements = partition_pdf(filename=range_path, strategy=strategy)
+    finally:
+        os.remove(range_path)
+
+    results = []
+    for element in elements:
+        page = _page_number(element)
+        results.append((str(element), first_page + page - 1 if page else first_page))
+    return results
+
+
+class SavedUpload(NamedTuple):
+    """Result of writing an upload to disk."""
+    path: str
+    size: int
+    sha256: str
 
 
 class DocumentProcessor:
@@ -20,12 +149,135 @@ class DocumentProcessor:
         return ext in _SUPPORTED_EXTENSIONS
 
     @classmethod
-    def extract_text(cls, file_path: str) -> str:
-        """Extract text from document."""
+    def config_signature(cls) -> str:
+        """Identify the extraction configuration text was produced with."""
+        fast_path = "fast" if settings.EXTRACTION_FAST_PATH else "full"
+        return f"{_EXTRACTION_VERSION}|{fast_path}"
+
+    @classmethod
+    def _page_ranges(cls, file_path: str) -> Optional[List[Tuple[int, int]]]:
+        """Page ranges to extract in parallel, or None to partition in one call."""
+        workers = settings.PDF_EXTRACTION_WORKERS
+        if workers < 2:
+            return None
+        try:
+            page_count = len(PdfReader(file_path).pages)
+        except Exception:
+            return None
+        if page_count < max(2, settings.PDF_PARALLEL_MIN_PAGES):
+            return None
+
+        size = max(1, math.ceil(page_count / (workers * _PDF_RANGES_PER_WORKER)))
+        return [
+            (first, min(first + size - 1, page_count))
+            for first in range(1, page_count + 1, size)
+        ]
+
+    @classmethod
+    def _iter_pdf_parallel(
+        cls, file_path: str, ranges: List[Tuple[int, int]]
+    ) -> Iterator[ExtractedElement]:
+        """Partition page ranges across a process pool, yielding in page order."""
+        with ProcessPoolExecutor(
+            max_workers=min(settings.PDF_EXTRACTION_WORKERS, len(ranges)),
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+            results = pool.map(
+                _partition_pdf_pages,
+                [file_path] * len(ranges),
+                [first for first, _ in ranges],
+                [last for _, last in ranges],
+            )
+            for elements in results:
+                for text, page in elements:
+                    yield ExtractedElement(text, page)
+
+    @classmethod
+    def _read_plain_text(cls, file_path: str) -> Optional[Iterator[ExtractedElement]]:
+        """Stream a UTF-8 text file, one element per paragraph.
+
+        Quality is judged on the first ``EXTRACTION_SAMPLE_CHARS`` characters.
+        """
+        paragraphs = _iter_paragraphs(file_path, settings.EXTRACTION_SAMPLE_CHARS)
+        sample: List[str] = []
+        chars = 0
+        for paragraph in paragraphs:
+            sample.append(paragraph)
+            chars += len(paragraph)
+            if chars >= settings.EXTRACTION_SAMPLE_CHARS:
+                break
+        if not _is_usable_text(sample):
+            paragraphs.close()
+            return None
+        return (ExtractedElement(p) for p in chain(sample, paragraphs))
+
+    @classmethod
+    def _read_pdf_text_layer(
+        cls, file_path: str
+    ) -> Optional[Iterator[ExtractedElement]]:
+        """Read a born-digital PDF's text layer with pypdf, one element per page.
+
+        Pages are extracted as they are consumed; quality is judged on the
+        first ``EXTRACTION_SAMPLE_PAGES``.
+        """
+        pages = (
+            ExtractedElement(page.extract_text() or "", number)
+            for number, page in enumerate(PdfReader(file_path).pages, 1)
+        )
+        sample = list(islice(pages, settings.EXTRACTION_SAMPLE_PAGES))
+        if not _is_usable_text([e.text for e in sample], len(sample)):
+            return None
+        return (e for e in chain(sample, pages) if e.text.strip())
+
+    @classmethod
+    def _partition_pdf_fast(
+        cls, file_path: str
+    ) -> Optional[Iterator[ExtractedElement]]:
+        """Partition a PDF with unstructured's ``fast`` strategy (no layout model/OCR).
+
+        The first ``EXTRACTION_SAMPLE_PAGES`` pages are partitioned and
+        checked before the rest are partitioned as they are consumed.
+        """
+        page_count = len(PdfReader(file_path).pages)
+        if not page_count:
+            return None
+        sample_pages = min(page_count, max(1, settings.EXTRACTION_SAMPLE_PAGES))
+        sample = [
+            ExtractedElement(text, page)
+            for text, page in _partition_pdf_pages(file_path, 1, sample_pages, "fast")
+        ]
+        pages = max((e.page_number or 1 for e in sample), default=1)
+        if not _is_usable_text([e.text for e in sample], pages):
+            return None
+        return chain(
+            sample, cls._iter_pdf_fast(file_path, sample_pages + 1, page_count)
+        )
+
+    @classmethod
+    def _iter_pdf_fast(
+        cls, file_path: str, first_page: int, last_page: int
+    ) -> Iterator[ExtractedElement]:
+        """Partition pages with the ``fast`` strategy a window at a time."""
+        for first in range(first_page, last_page + 1, _PDF_FAST_WINDOW_PAGES):
+            last = min(first + _PDF_FAST_WINDOW_PAGES - 1, last_page)
+            for text, page in _partition_pdf_pages(file_path, first, last, "fast"):
+                yield ExtractedElement(text, page)
+
+    @classmethod
+    def _iter_unstructured(cls, file_path: str) -> Iterator[ExtractedElement]:
+        """Yield elements from unstructured's default partitioners.
+
+        PDFs with at least ``PDF_PARALLEL_MIN_PAGES`` pages are split into
+        page ranges partitioned across ``PDF_EXTRACTION_WORKERS`` processes.
+        """
         ext = Path(file_path).suffix.lower()
-        
+
         try:
             if ext == '.pdf':
+                ranges = cls._page_ranges(file_path)
+                if ranges:
+                    yield from cls._iter_pdf_parallel(file_path, ranges)
+                    return
                 elements = partition_pdf(filename=file_path)
             elif ext in ['.doc', '.docx']:
                 elements = partition_docx(filename=file_path)
@@ -33,29 +285,115 @@ class DocumentProcessor:
                 elements = partition_text(filename=file_path)
             else:
                 elements = partition(filename=file_path)
-            
-            text = "\n\n".join([str(el) for el in elements])
-            return text
         except Exception as e:
             raise ValueError(f"Failed to extract text: {str(e)}") from e
 
+        for element in elements:
+            yield ExtractedElement(str(element), _page_number(element))
+
     @classmethod
-    def save_upload(cls, file: BinaryIO, filename: str) -> str:
-        """Save uploaded file to disk."""
+    def extract(cls, file_path: str) -> Extraction:
+        """Extract a document with the cheapest strategy that passes quality checks.
+
+        With ``EXTRACTION_FAST_PATH`` enabled, text files are read directly and
+        PDFs try pypdf's text layer, then unstructured's ``fast`` strategy,
+        before escalating to the default unstructured partitioners, which may
+        run layout detection or OCR.
+        """
+        ext = Path(file_path).suffix.lower()
+        fast_paths = {
+            '.txt': [("plain_text", cls._read_plain_text)],
+            '.pdf': [
+                ("pypdf", cls._read_pdf_text_layer),
+                ("unstructured_fast", cls._partition_pdf_fast),
+            ],
+        }
+
+        if settings.EXTRACTION_FAST_PATH:
+            for strategy, extractor in fast_paths.get(ext, []):
+                try:
+                    elements = extractor(file_path)
+                except Exception as e:
+                    logger.info(
+                        "Extraction strategy %s failed for %s: %s",
+                        strategy,
+                        file_path,
+                        e,
+                    )
+                    continue
+                if elements is not None:
+                    return Extraction(strategy, elements)
+                logger.info(
+                    "Extraction strategy %s rejected low-quality text for %s",
+                    strategy,
+                    file_path,
+                )
+
+        return Extraction("unstructured", cls._iter_unstructured(file_path))
+
+    @classmethod
+    def iter_elements(cls, file_path: str) -> Iterator[ExtractedElement]:
+        """Yield each document element with its page number in reading order."""
+        return cls.extract(file_path).elements
+
+    @classmethod
+    def extract_text(cls, file_path: str) -> str:
+        """Extract text from document."""
+        return "\n\n".join(element.text for element in cls.iter_elements(file_path))
+
+    @classmethod
+    def save_upload(
+        cls,
+        file: BinaryIO,
+        filename: str,
+        max_size: Optional[int] = None
+    ) -> SavedUpload:
+        """Stream an upload to disk in fixed-size chunks.
+
+        Bytes go to a temp file in the upload directory, hashed as they are
+        written, and are moved onto a name claimed for them once complete. Raises
+        UploadTooLargeError as soon as more than ``max_size`` bytes arrive.
+        """
+        max_size = settings.MAX_UPLOAD_SIZE if max_size is None else max_size
         upload_dir = Path(settings.UPLOAD_DIR)
         upload_dir.mkdir(parents=True, exist_ok=True)
-        
-        file_path = upload_dir / filename
-        
-        counter = 1
-        while file_path.exists():
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=upload_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = file.read(settings.UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_size:
+                        raise UploadTooLargeError(
+                            f"File too large. Maximum size: {max_size} bytes"
+                        )
+                    digest.update(chunk)
+                    f.write(chunk)
+
+            # Claim the name with an exclusive create, which fails instead of
+            # reusing it when a concurrent upload took it first
             name = Path(filename).stem
             ext = Path(filename).suffix
-            file_path = upload_dir / f"{name}_{counter}{ext}"
-            counter += 1
-        
-        with open(file_path, "wb") as f:
-            content = file.read()
-            f.write(content)
-        
-        return str(file_path)
+            file_path = upload_dir / filename
+            counter = 1
+            while True:
+                try:
+                    os.close(
+                        os.open(file_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+                    )
+                    break
+                except FileExistsError:
+                    file_path = upload_dir / f"{name}_{counter}{ext}"
+                    counter += 1
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return SavedUpload(path=str(file_path), size=size, sha256=digest.hexdigest())
@@ -0,0 +1,212 @@
+"""Bounded cache of query embeddings."""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+# Seconds between sweeps of expired rows from the disk tier
+_DISK_PURGE_INTERVAL = 300.0
+# Extra fraction of the disk bound evicted at once, so eviction runs rarely
+_DISK_EVICTION_SLACK = 0.1
+
+
+def _normalize_query(query: str) -> str:
+    """Normalize query text so trivially different spellings share an entry."""
+    return " ".join(query.lower().split())
+
+
+class QueryEmbeddingCache:
+    """LRU + TTL cache of query embeddings with an optional SQLite disk tier.
+
+    Entries are keyed on the embedding model name and the normalized query
+    text. The in-memory tier is bounded by ``max_size``; the disk tier, when
+    a directory is configured, survives restarts and is consulted on a
+    memory miss. The disk tier holds at most ``disk_max_rows`` entries,
+    evicting the oldest on insert, and expired rows are swept periodically.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl_seconds: float = 3600.0,
+        disk_dir: Optional[str] = None,
+        disk_max_rows: int = 100_000,
+    ):
+        """Initialize the cache."""
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.disk_max_rows = disk_max_rows
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self._disk: Optional[sqlite3.Connection] = None
+        self._disk_rows = 0
+        self._last_purge = 0.0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk = sqlite3.connect(
+                os.path.join(disk_dir, "query_embeddings.sqlite3"),
+                check_same_thread=False,
+            )
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings "
+                "(key TEXT PRIMARY KEY, created_at REAL NOT NULL, vector BLOB NOT NULL)"
+            )
+            self._disk.execute(
+                "CREATE INDEX IF NOT EXISTS ix_query_embeddings_created_at "
+                "ON query_embeddings (created_at)"
+            )
+            self._disk.commit()
+            self._purge_disk(time.time())
+
+    @staticmethod
+    def make_key(model_name: str, query: str) -> str:
+        """Build the cache key for a model/query pair."""
+        raw = f"{model_name}\x00{_normalize_query(query)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def _read_disk(self, key: str, now: float) -> Optional[Tuple[float, List[float]]]:
+        row = self._disk.execute(
+            "SELECT created_at, vector FROM query_embeddings WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        created_at, blob = row
+        if self._is_expired(created_at, now):
+            self._disk.execute("DELETE FROM query_embeddings WHERE key = ?", (key,))
+            self._disk.commit()
+            self._disk_rows -= 1
+            return None
+        return created_at, array("d", blob).tolist()
+
+    def _count_disk_rows(self) -> None:
+        self._disk_rows = self._disk.execute(
+            "SELECT COUNT(*) FROM query_embeddings"
+        ).fetchone()[0]
+
+    def _purge_disk(self, now: float) -> None:
+        """Delete expired rows and recount the disk tier."""
+        if self.ttl_seconds > 0:
+            self._disk.execute(
+                "DELETE FROM query_embeddings WHERE created_at < ?",
+                (now - self.ttl_seconds,),
+            )
+            self._disk.commit()
+        self._count_disk_rows()
+        self._last_purge = now
+
+    def _evict_disk(self) -> None:
+        """Delete the oldest rows once the disk tier exceeds ``disk_max_rows``."""
+        excess = self._disk_rows - self.disk_max_rows
+        if excess <= 0:
+            return
+        excess += int(self.disk_max_rows * _DISK_EVICTION_SLACK)
+        deleted = self._disk.execute(
+            "DELETE FROM query_embeddings WHERE key IN "
+            "(SELECT key FROM query_embeddings ORDER BY created_at LIMIT ?)",
+            (excess,),
+        ).rowcount
+        self._disk.commit()
+        self.disk_evictions += deleted
+        self._count_disk_rows()
+
+    def _write_disk(self, key: str, created_at: float, vector: List[float]) -> None:
+        replaced = self._disk.execute(
+            "SELECT 1 FROM query_embeddings WHERE key = ?", (key,)
+        ).fetchone()
+        self._disk.execute(
+            "INSERT OR REPLACE INTO query_embeddings (key, created_at, vector) "
+            "VALUES (?, ?, ?)",
+            (key, created_at, array("d", vector).tobytes()),
+        )
+        self._disk.commit()
+        if not replaced:
+            self._disk_rows += 1
+        if created_at - self._last_purge >= _DISK_PURGE_INTERVAL:
+            self._purge_disk(created_at)
+        if self.disk_max_rows > 0:
+            self._evict_disk()
+
+    def _store(self, key: str, created_at: float, vector: List[float]) -> None:
+        self._entries[key] = (created_at, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, model_name: str, query: str) -> Optional[List[float]]:
+        """Return a cached embedding or None."""
+        key = self.make_key(model_name, query)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._is_expired(entry[0], now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            if self._disk is not None:
+                entry = self._read_disk(key, now)
+                if entry is not None:
+                    self._store(key, *entry)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, model_name: str, query: str, vector: List[float]) -> None:
+        """Store an embedding."""
+        key = self.make_key(model_name, query)
+        now = time.time()
+        with self._lock:
+            self._store(key, now, list(vector))
+            if self._disk is not None:
+                self._write_disk(key, now, vector)
+
+    def get_or_compute(
+        self, model_name: str, query: str, compute: Callable[[str], List[float]]
+    ) -> List[float]:
+        """Return a cached embedding, computing and storing it on a miss."""
+        vector = self.get(model_name, query)
+        if vector is None:
+            vector = compute(query)
+            self.put(model_name, query, vector)
+        return vector
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._entries.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM query_embeddings")
+                self._disk.commit()
+                self._disk_rows = 0
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "disk_size": self._disk_rows,
+                "disk_evictions": self.disk_evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,198 @@
+"""Source excerpt selection over precomputed sentence and token spans.
+
+Chunks are analysed once at ingest: whitespace token offsets, a 64-bit hash
+of each lower-cased token, and the index of the first token of each
+sentence (a sentence ends at a token ending in ``.``, ``!`` or ``?``). At
+answer time excerpts are scored with NumPy over those arrays instead of
+re-splitting and re-tokenizing every chunk.
+"""
+import hashlib
+import re
+from typing import Dict, List, NamedTuple, Optional
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"\S+")
+_SIMPLE_QUERY_PATTERNS = [
+    re.compile(r'\b(who|what|name|when|where|which|how many)\b'),
+    re.compile(r'\b(is|are|was|were)\b.*\b(name|called|date|number)\b'),
+]
+_FRAGMENT_WINDOWS = (10, 15, 20)
+_MAX_EXCERPT_CHARS = 120
+_FALLBACK_EXCERPT_CHARS = 100
+
+# Columns added to each chunk row at ingest
+ANALYSIS_COLUMNS = ("token_offsets", "token_ids", "sentence_starts")
+
+
+def token_id(token: str) -> int:
+    """Stable signed 64-bit id of a lower-cased token."""
+    digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def analyze_text(text: str) -> Dict[str, List[int]]:
+    """Token offsets, token ids and sentence starts for a chunk of text.
+
+    ``token_offsets`` is flat ``[start0, end0, start1, end1, ...]``.
+    """
+    offsets: List[int] = []
+    ids: List[int] = []
+    sentence_starts: List[int] = [0]
+    for match in _TOKEN_PATTERN.finditer(text):
+        token = match.group()
+        offsets.extend(match.span())
+        ids.append(token_id(token.lower()))
+        if token[-1] in ".!?":
+            sentence_starts.append(len(ids))
+    if sentence_starts[-1] == len(ids) and len(sentence_starts) > 1:
+        sentence_starts.pop()
+    return {
+        'token_offsets': offsets,
+        'token_ids': ids,
+        'sentence_starts': sentence_starts,
+    }
+
+
+class QueryTerms(NamedTuple):
+    """Query words prepared once per question."""
+    ids: np.ndarray
+    is_simple: bool
+
+
+def prepare_query(query: str) -> QueryTerms:
+    """Hash the query's words (longer than two characters) and classify the query."""
+    words = {word.lower() for word in query.split() if len(word) > 2}
+    lowered = query.lower()
+    return QueryTerms(
+        ids=np.array(sorted(token_id(word) for word in words), dtype=np.int64),
+        is_simple=any(pattern.search(lowered) for pattern in _SIMPLE_QUERY_PATTERNS),
+    )
+
+
+class ChunkAnalysis:
+    """NumPy view of a chunk's precomputed analysis."""
+
+    def __init__(self, text: str, analysis: Optional[Dict] = None):
+        """Wrap stored analysis, computing it when the chunk predates it."""
+        if not analysis or analysis.get('token_ids') is None:
+            analysis = analyze_text(text)
+        self.text = text
+        self.offsets = np.asarray(analysis['token_offsets'], dtype=np.int64).reshape(
+            -1, 2
+        )
+        self.ids = np.asarray(analysis['token_ids'], dtype=np.int64)
+        self.sentence_starts = np.asarray(analysis['sentence_starts'], dtype=np.int64)
+
+    @property
+    def sentence_count(self) -> int:
+        """Number of sentences."""
+        return len(self.sentence_starts) if len(self.ids) else 0
+
+    def sentence_bounds(self, index: int) -> tuple:
+        """First and one-past-last token index of a sentence."""
+        start = int(self.sentence_starts[index])
+        end = (
+            int(self.sentence_starts[index + 1])
+            if index + 1 < len(self.sentence_starts)
+            else len(self.ids)
+        )
+        return start, end
+
+    def sentence(self, index: int) -> str:
+        """Text of a sentence, with its original inner whitespace."""
+        start, end = self.sentence_bounds(index)
+        return self.text[self.offsets[start, 0]:self.offsets[end - 1, 1]]
+
+    def sentences(self) -> List[str]:
+        """Text of every sentence."""
+        return [self.sentence(i) for i in range(self.sentence_count)]
+
+    def words(self, start: int, end: int) -> str:
+        """Tokens ``start..end`` joined by single spaces."""
+        return " ".join(self.text[s:e] for s, e in self.offsets[start:end])
+
+    def sentence_overlap(self, query_ids: np.ndarray) -> np.ndarray:
+        """Distinct query words in each sentence."""
+        matched = np.flatnonzero(np.isin(self.ids, query_ids))
+        if len(matched) == 0:
+            return np.zeros(self.sentence_count, dtype=np.int64)
+        sentence_of = np.searchsorted(self.sentence_starts, matched, side="right") - 1
+        pairs = np.unique(np.stack([sentence_of, self.ids[matched]]), axis=1)
+        return np.bincount(pairs[0], minlength=self.sentence_count)
+
+
+def _window_overlap(ids: np.ndarray, query_ids: np.ndarray, window: int) -> np.ndarray:
+    """Distinct query words in every ``window``-token span of ``ids``.
+
+    A matched token counts towards the windows starting after the previous
+    occurrence of the same word, which makes each window's count distinct
+    without building a set per window.
+    """
+    starts = len(ids) - window + 1
+    positions = np.flatnonzero(np.isin(ids, query_ids))
+    if len(positions) == 0:
+        return np.zeros(starts, dtype=np.int64)
+    matched_ids = ids[positions]
+    order = np.lexsort((positions, matched_ids))
+    previous = np.full(len(positions), -1, dtype=np.int64)
+    repeats = matched_ids[order][1:] == matched_ids[order][:-1]
+    previous[order[1:][repeats]] = positions[order][:-1][repeats]
+
+    first = np.maximum(previous + 1, positions - window + 1)
+    last = np.minimum(positions, starts - 1)
+    valid = first <= last
+    diff = np.zeros(starts + 1, dtype=np.int64)
+    np.add.at(diff, first[valid], 1)
+    np.add.at(diff, last[valid] + 1, -1)
+    return np.cumsum(diff)[:starts]
+
+
+def _truncate(sentence: str, limit: int, keep: Optional[int] = None) -> str:
+    """Cut ``sentence`` to ``keep`` characters and an ellipsis if over ``limit``."""
+    if len(sentence) <= limit:
+        return sentence
+    return sentence[:limit if keep is None else keep] + "..."
+
+
+def select_excerpt(
+    chunk: ChunkAnalysis,
+    query: QueryTerms,
+    sentence_scores: Optional[np.ndarray] = None
+) -> str:
+    """Pick the most relevant sentence of a chunk, or a fragment of it.
+
+    Sentences are ranked by distinct query words unless ``sentence_scores``
+    (for example cosine similarities to the query embedding) are given.
+    For simple factual questions, long sentences are narrowed to the 10, 15
+    or 20 word window containing the most query words.
+    """
+    if not chunk.sentence_count:
+        return ""
+
+    if sentence_scores is None:
+        overlap = chunk.sentence_overlap(query.ids)
+        if not overlap.any():
+            return _truncate(chunk.sentence(0), _FALLBACK_EXCERPT_CHARS)
+        best = int(np.argmax(overlap))
+    else:
+        best = int(np.argmax(sentence_scores))
+    best_sentence = chunk.sentence(best)
+
+    if query.is_simple and len(best_sentence) > _MAX_EXCERPT_CHARS:
+        start, end = chunk.sentence_bounds(best)
+        ids = chunk.ids[start:end]
+        best_score, best_fragment = 0, None
+        for window in _FRAGMENT_WINDOWS:
+            if len(ids) < window:
+                continue
+            scores = _window_overlap(ids, query.ids, window)
+            position = int(np.argmax(scores))
+            if scores[position] > best_score:
+                best_score = int(scores[position])
+                best_fragment = (start + position, start + position + window)
+        if best_fragment is not None:
+            fragment = chunk.words(*best_fragment)
+            if fragment != best_sentence:
+                return "..." + fragment + "..."
+
+    return _truncate(best_sentence, _MAX_EXCERPT_CHARS, keep=_MAX_EXCERPT_CHARS - 3)
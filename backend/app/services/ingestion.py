@@ -0,0 +1,128 @@
+"""Document ingestion pipeline run by the ingestion workers."""
+import hashlib
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, Optional, TypeVar
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+from app.core.metrics import observe_ingestion
+from app.models.document import Document, DocumentStatus
+from app.services.document_processor import DocumentProcessor
+from app.services.vector_store import VectorStoreService
+
+T = TypeVar("T")
+
+
+def _timed(items: Iterable[T], timings: Dict[str, float], stage: str) -> Iterator[T]:
+    """Yield from ``items``, adding the time spent producing them to ``timings``."""
+    iterator = iter(items)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            timings[stage] += time.perf_counter() - started
+        yield item
+
+
+def ingest_document(
+    db: Session,
+    document: Document,
+    file_path: str,
+    vector_store: VectorStoreService,
+    on_stage: Optional[Callable[[str], None]] = None,
+    incremental: bool = False,
+    resume_from: int = 0,
+    on_checkpoint: Optional[Callable[[int], None]] = None,
+    before_write: Optional[Callable[[], None]] = None
+) -> None:
+    """Extract, split, embed and write a document, updating its status.
+
+    Elements stream from the extractor through the chunker into batched
+    embedding and writes. With ``incremental=True`` only chunks that changed
+    since the last ingest are embedded and written; otherwise ``resume_from``
+    skips chunks a previous attempt already checkpointed.
+
+    The extraction strategy used and seconds spent per stage are recorded
+    on the document. ``before_write`` is called before every write to the
+    vector store and before the document is marked completed; it raises to
+    abort the ingest (for example when the job's lock was lost).
+    """
+    on_stage = on_stage or (lambda stage: None)
+
+    document.status = DocumentStatus.PROCESSING
+    document.error_message = None
+    db.commit()
+
+    on_stage("extract")
+    timings = {'extract': 0.0}
+    started = time.perf_counter()
+    extraction = DocumentProcessor.extract(file_path)
+    timings['extract'] = time.perf_counter() - started
+
+    result = vector_store.add_document(
+        document_id=document.id,
+        text=_timed(extraction.elements, timings, 'extract'),
+        metadata={
+            'filename': document.filename,
+            'file_type': document.file_type
+        },
+        on_stage=on_stage,
+        incremental=incremental,
+        resume_from=resume_from,
+        on_checkpoint=on_checkpoint,
+        before_write=before_write
+    )
+
+    total = time.perf_counter() - started
+    timings['embed'] = result['embed_seconds']
+    timings['write'] = result['write_seconds']
+    timings['split'] = max(
+        0.0, total - timings['extract'] - timings['embed'] - timings['write']
+    )
+    if before_write is not None:
+        before_write()
+    document.extraction_strategy = extraction.strategy
+    document.stage_timings = {
+        stage: round(seconds, 3) for stage, seconds in timings.items()
+    }
+    document.status = DocumentStatus.COMPLETED
+    document.processed_at = datetime.utcnow()
+    db.commit()
+    observe_ingestion(extraction.strategy, timings, result['added'])
+
+
+def ingest_fingerprint(content_hash: str) -> str:
+    """Hash of the content plus every setting that affects its vectors."""
+    raw = "|".join([
+        content_hash,
+        DocumentProcessor.config_signature(),
+        VectorStoreService.config_signature(),
+    ])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def find_reusable_vectors(db: Session, fingerprint: str) -> Optional[int]:
+    """Vector id of a completed document with the same fingerprint, if any."""
+    existing = db.query(Document).filter(
+        Document.ingest_fingerprint == fingerprint,
+        Document.status == DocumentStatus.COMPLETED
+    ).order_by(Document.id).first()
+    return existing.vector_id if existing else None
+
+
+def count_vector_references(
+    db: Session, vector_id: int, exclude_document_id: Optional[int] = None
+) -> int:
+    """Number of documents whose vectors are stored under ``vector_id``."""
+    query = db.query(func.count(Document.id)).filter(
+        or_(
+            Document.vectors_document_id == vector_id,
+            (Document.id == vector_id) & Document.vectors_document_id.is_(None)
+        )
+    )
+    if exclude_document_id is not None:
+        query = query.filter(Document.id != exclude_document_id)
+    return query.scalar()
@@ -0,0 +1,275 @@
+"""Durable ingestion job queue backed by the application database."""
+import logging
+import random
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.document import Document, DocumentStatus
+from app.models.ingestion_job import IngestionJob, IngestionJobStatus
+
+logger = logging.getLogger(__name__)
+
+
+_STAGE_PROGRESS = {
+    "extract": 0,
+    "split": 40,
+    "embed": 50,
+    "write": 90,
+}
+
+
+class JobLockLost(Exception):
+    """The worker running a job no longer holds its lock."""
+
+
+class IngestionQueue:
+    """Enqueue, claim and settle document ingestion jobs.
+
+    Jobs are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED`` so any
+    number of worker processes can poll the same table. Jobs whose worker
+    died mid-run are reclaimed once their lock is older than
+    ``INGESTION_JOB_TIMEOUT`` seconds, or failed if that was their last
+    attempt. Updates to a running job only apply while the worker still
+    holds its lock; otherwise they raise :class:`JobLockLost`.
+    """
+
+    @classmethod
+    def enqueue(
+        cls, db: Session, document_id: int, file_path: str, incremental: bool = False
+    ) -> IngestionJob:
+        """Queue a document for ingestion."""
+        job = IngestionJob(
+            document_id=document_id,
+            file_path=file_path,
+            incremental=incremental,
+            status=IngestionJobStatus.QUEUED,
+            max_attempts=settings.INGESTION_MAX_ATTEMPTS,
+            next_run_at=datetime.utcnow(),
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+
+    @classmethod
+    def claim(cls, db: Session, worker_id: str) -> Optional[IngestionJob]:
+        """Lock and return the next runnable job, or None."""
+        while True:
+            now = datetime.utcnow()
+            stale_before = now - timedelta(seconds=settings.INGESTION_JOB_TIMEOUT)
+            job = db.execute(
+                select(IngestionJob)
+                .where(
+                    or_(
+                        and_(
+                            IngestionJob.status == IngestionJobStatus.QUEUED,
+                            IngestionJob.next_run_at <= now,
+                        ),
+                        and_(
+                            IngestionJob.status == IngestionJobStatus.RUNNING,
+                            IngestionJob.locked_at < stale_before,
+                        ),
+                    )
+                )
+                .order_by(IngestionJob.next_run_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            ).scalar_one_or_none()
+            if job is None:
+                db.rollback()
+                return None
+            if (
+                job.status == IngestionJobStatus.RUNNING
+                and job.attempts >= job.max_attempts
+            ):
+                # Its last attempt crashed or hung its worker; don't run it again
+                cls._abandon(db, job)
+                continue
+            break
+
+        job.status = IngestionJobStatus.RUNNING
+        job.locked_by = worker_id
+        job.locked_at = now
+        job.attempts += 1
+        job.stage = None
+        job.progress = 0
+        db.commit()
+        db.refresh(job)
+        return job
+
+    @classmethod
+    def _abandon(cls, db: Session, job: IngestionJob) -> None:
+        """Fail a stale job that has no attempts left, along with its document."""
+        job.status = IngestionJobStatus.FAILED
+        job.last_error = (
+            f"Worker {job.locked_by} stopped responding on the last of "
+            f"{job.max_attempts} attempts"
+        )
+        job.locked_by = None
+        job.locked_at = None
+        document = db.get(Document, job.document_id)
+        if document is not None:
+            document.status = DocumentStatus.FAILED
+            document.error_message = job.last_error
+        db.commit()
+        logger.warning("Ingestion job %s failed: %s", job.id, job.last_error)
+
+    @classmethod
+    def _update_locked(cls, db: Session, job_id: int, worker_id: str, **values) -> None:
+        """Update a running job if ``worker_id`` still holds its lock.
+
+        Raises :class:`JobLockLost` otherwise.
+        """
+        result = db.execute(
+            update(IngestionJob)
+            .where(
+                IngestionJob.id == job_id,
+                IngestionJob.status == IngestionJobStatus.RUNNING,
+                IngestionJob.locked_by == worker_id,
+            )
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            db.rollback()
+            raise JobLockLost(
+                f"Ingestion job {job_id} is no longer locked by {worker_id}"
+            )
+        db.commit()
+
+    @classmethod
+    def heartbeat(cls, db: Session, job_id: int, worker_id: str) -> None:
+        """Refresh a running job's lock so it is not reclaimed as stale."""
+        cls._update_locked(db, job_id, worker_id, locked_at=datetime.utcnow())
+
+    @classmethod
+    def report_stage(cls, db: Session, job_id: int, worker_id: str, stage: str) -> None:
+        """Record that a job has entered an ingestion stage."""
+        values = {'stage': stage, 'locked_at': datetime.utcnow()}
+        if stage in _STAGE_PROGRESS:
+            values['progress'] = _STAGE_PROGRESS[stage]
+        cls._update_locked(db, job_id, worker_id, **values)
+
+    @classmethod
+    def checkpoint(
+        cls, db: Session, job_id: int, worker_id: str, chunks_written: int
+    ) -> None:
+        """Record how many chunks are durably written so a retry can resume."""
+        cls._update_locked(
+            db,
+            job_id,
+            worker_id,
+            checkpoint=chunks_written,
+            locked_at=datetime.utcnow(),
+        )
+
+    @classmethod
+    def complete(cls, db: Session, job_id: int, worker_id: str) -> None:
+        """Mark a job as succeeded."""
+        cls._update_locked(
+            db, job_id, worker_id,
+            status=IngestionJobStatus.SUCCEEDED,
+            progress=100,
+            locked_by=None,
+            locked_at=None,
+            last_error=None,
+        )
+
+    @classmethod
+    def fail(cls, db: Session, job: IngestionJob, worker_id: str, error: str) -> bool:
+        """Record a failed attempt; returns True if the job will be retried."""
+        values = {'last_error': error, 'locked_by': None, 'locked_at': None}
+        will_retry = job.attempts < job.max_attempts
+        if will_retry:
+            delay = settings.INGESTION_RETRY_BACKOFF * (2 ** (job.attempts - 1))
+            delay *= random.uniform(0.5, 1.5)
+            values['status'] = IngestionJobStatus.QUEUED
+            values['next_run_at'] = datetime.utcnow() + timedelta(seconds=delay)
+        else:
+            values['status'] = IngestionJobStatus.FAILED
+        cls._update_locked(db, job.id, worker_id, **values)
+        return will_retry
+
+    @classmethod
+    def latest_for_document(
+        cls, db: Session, document_id: int
+    ) -> Optional[IngestionJob]:
+        """Most recent job for a document."""
+        return db.execute(
+            select(IngestionJob)
+            .where(IngestionJob.document_id == document_id)
+            .order_by(IngestionJob.id.desc())
+            .limit(1)
+        ).scalar_one_or_none()
+
+    @classmethod
+    def delete_for_document(cls, db: Session, document_id: int) -> None:
+        """Remove every job belonging to a document."""
+        db.query(IngestionJob).filter(IngestionJob.document_id == document_id).delete()
+
+    @classmethod
+    def depth(cls, db: Session) -> int:
+        """Number of jobs waiting to run."""
+        return db.execute(
+            select(func.count())
+            .select_from(IngestionJob)
+            .where(IngestionJob.status == IngestionJobStatus.QUEUED)
+        ).scalar_one()
+
+
+class JobHeartbeat:
+    """Keep a running job's lock fresh from a background thread.
+
+    Long stages (extracting or embedding a large PDF) report no progress
+    for a while; without a heartbeat another worker would reclaim the job
+    as stale while it is still running. :attr:`lost` is set once the lock
+    turns out to belong to someone else.
+    """
+
+    def __init__(
+        self,
+        job_id: int,
+        worker_id: str,
+        interval: Optional[float] = None,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        """Prepare a heartbeat; nothing runs until :meth:`start`."""
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.interval = interval or settings.INGESTION_JOB_TIMEOUT / 3
+        self._session_factory = session_factory
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _beat(self) -> None:
+        while not self._stop.wait(self.interval):
+            db = self._session_factory()
+            try:
+                IngestionQueue.heartbeat(db, self.job_id, self.worker_id)
+            except JobLockLost:
+                logger.warning("Lost the lock on ingestion job %s", self.job_id)
+                self.lost.set()
+                return
+            except Exception:
+                logger.exception("Heartbeat for ingestion job %s failed", self.job_id)
+            finally:
+                db.close()
+
+    def start(self) -> "JobHeartbeat":
+        """Start refreshing the lock."""
+        self._thread = threading.Thread(
+            target=self._beat, name=f"heartbeat-job-{self.job_id}", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop refreshing the lock."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,179 @@
+"""Persisted BM25 full-text index of chunk text."""
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_TOKEN_PATTERN = re.compile(r"\w+(?:[-./:#]\w+)*")
+_WORD_PATTERN = re.compile(r"\w+")
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS chunks ("
+    "id INTEGER PRIMARY KEY, "
+    "chunk_id TEXT NOT NULL UNIQUE, "
+    "document_id INTEGER NOT NULL, "
+    "chunk_index INTEGER, "
+    "text TEXT NOT NULL, "
+    "metadata TEXT)",
+    "CREATE INDEX IF NOT EXISTS ix_chunks_document "
+    "ON chunks (document_id, chunk_index)",
+    # document_id is indexed as a token so searches filter by document inside MATCH
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5("
+    "text, document_id, content='chunks', content_rowid='id', tokenize='unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN "
+    "INSERT INTO chunks_fts (rowid, text, document_id) "
+    "VALUES (new.id, new.text, new.document_id); END",
+    "CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN "
+    "INSERT INTO chunks_fts (chunks_fts, rowid, text, document_id) "
+    "VALUES ('delete', old.id, old.text, old.document_id); END",
+]
+
+# Indexes built before document_id was an FTS column are rebuilt from the chunks table
+_LEGACY_SCHEMA = [
+    "DROP TRIGGER IF EXISTS chunks_ai",
+    "DROP TRIGGER IF EXISTS chunks_ad",
+    "DROP TABLE IF EXISTS chunks_fts",
+]
+
+
+def match_expression(query: str) -> Optional[str]:
+    """Build an FTS5 query matching any term of a free-text query.
+
+    Identifier-like terms such as ``INV-2024-042`` become phrases, so their
+    parts must appear together. Returns None when the query has no terms.
+    """
+    phrases = []
+    for token in _TOKEN_PATTERN.findall(query):
+        words = _WORD_PATTERN.findall(token)
+        phrases.append('"' + " ".join(words) + '"')
+    return " OR ".join(dict.fromkeys(phrases)) or None
+
+
+class LexicalIndex:
+    """SQLite FTS5 index of chunk text ranked with BM25.
+
+    Rows are keyed by document id, so one index serves both vector store
+    layouts. The database lives next to the vectors and uses WAL mode, so
+    the API and ingestion worker processes can share it. Writes go through
+    one connection behind a lock; searches use a read-only connection per
+    thread and never wait for each other or for a writer.
+    """
+
+    def __init__(self, path: str):
+        """Open (and create if needed) the index at ``path``."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._readers = threading.local()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = [
+            row[1] for row in self._conn.execute("PRAGMA table_info(chunks_fts)")
+        ]
+        legacy = bool(columns) and "document_id" not in columns
+        if legacy:
+            for statement in _LEGACY_SCHEMA:
+                self._conn.execute(statement)
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        if legacy:
+            self._conn.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('rebuild')")
+        self._conn.commit()
+
+    def _reader(self) -> sqlite3.Connection:
+        """This thread's read-only connection, opened on first use."""
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=30)
+            self._readers.conn = conn
+        return conn
+
+    def add(
+        self, document_id: int, rows: Iterable[Tuple[str, Optional[int], str, str]]
+    ) -> None:
+        """Index ``(chunk_id, chunk_index, text, metadata)`` rows for a document."""
+        rows = list(rows)
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM chunks WHERE chunk_id = ?", [(row[0],) for row in rows]
+            )
+            self._conn.executemany(
+                "INSERT INTO chunks "
+                "(chunk_id, document_id, chunk_index, text, metadata) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (chunk_id, document_id, index, text, metadata)
+                    for chunk_id, index, text, metadata in rows
+                ],
+            )
+            self._conn.commit()
+
+    def delete_document(self, document_id: int, from_chunk_index: int = 0) -> None:
+        """Remove a document's rows, optionally only those at or past a chunk index."""
+        with self._lock:
+            if from_chunk_index:
+                self._conn.execute(
+                    "DELETE FROM chunks WHERE document_id = ? AND chunk_index >= ?",
+                    (document_id, from_chunk_index),
+                )
+            else:
+                self._conn.execute(
+                    "DELETE FROM chunks WHERE document_id = ?", (document_id,)
+                )
+            self._conn.commit()
+
+    def delete_chunks(self, chunk_ids: Iterable[str]) -> None:
+        """Remove rows by chunk id."""
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM chunks WHERE chunk_id = ?",
+                [(chunk_id,) for chunk_id in chunk_ids],
+            )
+            self._conn.commit()
+
+    def set_chunk_indexes(self, rows: Iterable[Tuple[str, int]]) -> None:
+        """Update the chunk index of ``(chunk_id, chunk_index)`` rows."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE chunks SET chunk_index = ? WHERE chunk_id = ?",
+                [(index, chunk_id) for chunk_id, index in rows],
+            )
+            self._conn.commit()
+
+    def search(self, document_ids: List[int], query: str, limit: int) -> List[Dict]:
+        """Best BM25 matches for ``query`` within the given documents."""
+        expression = match_expression(query)
+        if expression is None or not document_ids:
+            return []
+        documents = " OR ".join(
+            str(int(doc_id)) for doc_id in dict.fromkeys(document_ids)
+        )
+        # The document_id column gets zero weight so only text matches rank
+        rows = self._reader().execute(
+            "SELECT c.chunk_id, c.document_id, c.chunk_index, c.text, c.metadata, "
+            "bm25(chunks_fts, 1.0, 0.0) AS score "
+            "FROM chunks_fts JOIN chunks c ON c.id = chunks_fts.rowid "
+            "WHERE chunks_fts MATCH ? ORDER BY score LIMIT ?",
+            [f"document_id : ({documents}) AND text : ({expression})", limit],
+        ).fetchall()
+        return [
+            {
+                'content': text,
+                'metadata': metadata or '',
+                'distance': None,
+                'document_id': doc_id,
+                'chunk_id': chunk_id,
+                'chunk_index': chunk_index,
+                'bm25': score,
+            }
+            for chunk_id, doc_id, chunk_index, text, metadata, score in rows
+        ]
+
+    def count(self, document_id: Optional[int] = None) -> int:
+        """Number of indexed chunks, overall or for one document."""
+        if document_id is None:
+            return self._reader().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        return self._reader().execute(
+            "SELECT COUNT(*) FROM chunks WHERE document_id = ?", (document_id,)
+        ).fetchone()[0]
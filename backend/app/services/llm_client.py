@@ -0,0 +1,255 @@
+"""LLM client with request coalescing, retries and a deterministic fake backend."""
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List
+import groq
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from tenacity import (
+    AsyncRetrying,
+    Retrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+from app.core.metrics import query_timer
+
+_RETRYABLE_STATUS_CODES = {408, 409, 425, 429}
+_QUESTION_PATTERN = re.compile(r"^Question: (.*)$", re.MULTILINE)
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether an LLM error is worth retrying: connection, timeout, 429 or 5xx."""
+    if isinstance(
+        error, (groq.APIConnectionError, ConnectionError, asyncio.TimeoutError)
+    ):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return status_code in _RETRYABLE_STATUS_CODES or (status_code or 0) >= 500
+
+
+class SingleFlight:
+    """Coalesce identical concurrent calls into one.
+
+    While a call for a key is in flight, other callers with the same key
+    wait for its result (or exception) instead of starting their own.
+    """
+
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.coalesced = 0
+
+    def do(self, key: str, call: Callable[[], Any]) -> Any:
+        """Run ``call`` unless an identical call is in flight; share its outcome."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = call()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def ado(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Async :meth:`do`; a cancelled waiter leaves the shared call running."""
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+
+class LLMClient:
+    """Chat model wrapper used by the RAG service.
+
+    Exposes the LangChain ``invoke``/``ainvoke``/``stream``/``astream``
+    calls on a string prompt. Transient failures are retried with jittered
+    exponential backoff; identical prompts in flight at the same time share
+    one backend call. Streams are not coalesced and are only retried until
+    their first chunk arrives.
+    """
+
+    def __init__(
+        self,
+        backend: BaseChatModel,
+        max_attempts: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 8.0,
+        coalesce: bool = True,
+    ):
+        """Wrap ``backend``."""
+        self.backend = backend
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.coalesce = coalesce
+        self._single_flight = SingleFlight()
+        self.calls = 0
+        self.retries = 0
+
+    def _retry_policy(self) -> dict:
+        return {
+            "stop": stop_after_attempt(max(self.max_attempts, 1)),
+            "wait": wait_random_exponential(
+                multiplier=self.backoff, max=self.max_backoff
+            ),
+            "retry": retry_if_exception(is_transient),
+            "before_sleep": self._count_retry,
+            "reraise": True,
+        }
+
+    def _count_retry(self, _retry_state) -> None:
+        self.retries += 1
+
+    @staticmethod
+    def _key(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    def _invoke(self, prompt: str) -> BaseMessage:
+        self.calls += 1
+        for attempt in Retrying(**self._retry_policy()):
+            with attempt:
+                return self.backend.invoke(prompt)
+
+    async def _ainvoke(self, prompt: str) -> BaseMessage:
+        self.calls += 1
+        async for attempt in AsyncRetrying(**self._retry_policy()):
+            with attempt:
+                return await self.backend.ainvoke(prompt)
+
+    @query_timer("llm")
+    def invoke(self, prompt: str) -> BaseMessage:
+        """Generate a reply to ``prompt``."""
+        if not self.coalesce:
+            return self._invoke(prompt)
+        return self._single_flight.do(self._key(prompt), lambda: self._invoke(prompt))
+
+    async def ainvoke(self, prompt: str) -> BaseMessage:
+        """Async counterpart of :meth:`invoke`."""
+        with query_timer("llm"):
+            if not self.coalesce:
+                return await self._ainvoke(prompt)
+            return await self._single_flight.ado(
+                self._key(prompt), lambda: self._ainvoke(prompt)
+            )
+
+    def stream(self, prompt: str) -> Iterator[BaseMessage]:
+        """Stream reply chunks for ``prompt``; the llm stage covers the whole stream."""
+        self.calls += 1
+        with query_timer("llm"):
+            for attempt in Retrying(**self._retry_policy()):
+                with attempt:
+                    chunks = iter(self.backend.stream(prompt))
+                    first = next(chunks, None)
+            if first is not None:
+                yield first
+                yield from chunks
+
+    async def astream(self, prompt: str) -> AsyncIterator[BaseMessage]:
+        """Async counterpart of :meth:`stream`."""
+        self.calls += 1
+        with query_timer("llm"):
+            async for attempt in AsyncRetrying(**self._retry_policy()):
+                with attempt:
+                    chunks = aiter(self.backend.astream(prompt))
+                    first = await anext(chunks, None)
+            if first is not None:
+                yield first
+                async for chunk in chunks:
+                    yield chunk
+
+    def stats(self) -> dict:
+        """Backend calls, retries and coalesced requests."""
+        return {
+            "backend": self.backend._llm_type,
+            "calls": self.calls,
+            "retries": self.retries,
+            "coalesced": self._single_flight.coalesced,
+        }
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic offline chat model for load tests and CI.
+
+    Replies depend only on the prompt, after ``latency`` seconds; streams
+    emit one word every ``token_latency`` seconds.
+    """
+
+    latency: float = 0.0
+    token_latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    @staticmethod
+    def reply(prompt: str) -> str:
+        """The answer given to ``prompt``."""
+        match = _QUESTION_PATTERN.search(prompt)
+        question = match.group(1) if match else prompt[:80]
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        return f"Fake answer {digest} to: {question}"
+
+    @staticmethod
+    def _prompt(messages: List[BaseMessage]) -> str:
+        return "\n".join(str(message.content) for message in messages)
+
+    def _generate(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs
+    ) -> ChatResult:
+        time.sleep(self.latency)
+        message = AIMessage(content=self.reply(self._prompt(messages)))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        message = AIMessage(content=self.reply(self._prompt(messages)))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for i, word in enumerate(self.reply(self._prompt(messages)).split(" ")):
+            if i:
+                time.sleep(self.token_latency)
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(content=word if not i else " " + word)
+            )
+
+    async def _astream(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for i, word in enumerate(self.reply(self._prompt(messages)).split(" ")):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(content=word if not i else " " + word)
+            )
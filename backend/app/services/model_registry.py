@@ -0,0 +1,240 @@
+"""Process-wide registry of warm, shared model clients."""
+import os
+import threading
+from typing import List, Optional
+import lancedb
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_groq import ChatGroq
+from app.core.config import settings
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.embedding_cache import QueryEmbeddingCache
+from app.services.lexical_index import LexicalIndex
+from app.services.llm_client import FakeChatModel, LLMClient
+from app.services.table_cache import TableHandleCache
+
+
+class ModelRegistry:
+    """Thread-safe holder for the embedding model, LanceDB connection and LLM client.
+
+    Each resource is built at most once per process and shared by every
+    request, background task and service instance.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._lock = threading.RLock()
+        self._embeddings: Optional[HuggingFaceEmbeddings] = None
+        self._db = None
+        self._llm: Optional[LLMClient] = None
+        self._query_embedding_cache: Optional[QueryEmbeddingCache] = None
+        self._answer_cache: Optional[SemanticAnswerCache] = None
+        self._table_cache: Optional[TableHandleCache] = None
+        self._lexical_index: Optional[LexicalIndex] = None
+        self._embedding_pool = None
+        self._prompt_tokenizer = None
+        self._ready = threading.Event()
+
+    @property
+    def embeddings(self) -> HuggingFaceEmbeddings:
+        """Shared sentence-transformers embedding model."""
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    self._embeddings = HuggingFaceEmbeddings(
+                        model_name=settings.EMBEDDING_MODEL_NAME,
+                        encode_kwargs={"batch_size": settings.EMBEDDING_BATCH_SIZE},
+                    )
+        return self._embeddings
+
+    @property
+    def embedding_pool(self):
+        """Long-lived sentence-transformers multi-process encode pool.
+
+        Started on first use with ``EMBEDDING_PROCESSES`` CPU processes, so
+        the model is loaded into each process once rather than per document.
+        """
+        if self._embedding_pool is None:
+            with self._lock:
+                if self._embedding_pool is None:
+                    self._embedding_pool = (
+                        self.embeddings.client.start_multi_process_pool(
+                            target_devices=["cpu"] * settings.EMBEDDING_PROCESSES
+                        )
+                    )
+        return self._embedding_pool
+
+    def embed_documents(
+        self, texts: List[str], use_pool: bool = False
+    ) -> List[List[float]]:
+        """Embed texts in-process, or across the encode pool with ``use_pool``."""
+        if not use_pool or settings.EMBEDDING_PROCESSES < 2:
+            return self.embeddings.embed_documents(texts)
+
+        # Mirror HuggingFaceEmbeddings.embed_documents so both paths agree.
+        texts = [text.replace("\n", " ") for text in texts]
+        embeddings = self.embeddings.client.encode_multi_process(
+            texts,
+            self.embedding_pool,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            normalize_embeddings=self.embeddings.encode_kwargs.get(
+                "normalize_embeddings", False
+            ),
+        )
+        return embeddings.tolist()
+
+    def shutdown(self) -> None:
+        """Stop the encode pool if one was started."""
+        with self._lock:
+            if self._embedding_pool is not None:
+                self.embeddings.client.stop_multi_process_pool(self._embedding_pool)
+                self._embedding_pool = None
+
+    @property
+    def db(self):
+        """Shared LanceDB connection."""
+        if self._db is None:
+            with self._lock:
+                if self._db is None:
+                    os.makedirs(settings.CHROMA_PERSIST_DIRECTORY, exist_ok=True)
+                    self._db = lancedb.connect(settings.CHROMA_PERSIST_DIRECTORY)
+        return self._db
+
+    @property
+    def llm(self) -> LLMClient:
+        """Shared LLM client over Groq, or the offline fake for ``LLM_BACKEND=fake``."""
+        if self._llm is None:
+            with self._lock:
+                if self._llm is None:
+                    if settings.LLM_BACKEND == "fake":
+                        backend = FakeChatModel(
+                            latency=settings.LLM_FAKE_LATENCY,
+                            token_latency=settings.LLM_FAKE_TOKEN_LATENCY,
+                        )
+                    else:
+                        backend = ChatGroq(
+                            groq_api_key=settings.GROQ_API_KEY,
+                            model_name=settings.MODEL_NAME,
+                            temperature=settings.TEMPERATURE,
+                            max_tokens=settings.MAX_TOKENS,
+                            # Retries are handled by LLMClient
+                            max_retries=0,
+                        )
+                    self._llm = LLMClient(
+                        backend,
+                        max_attempts=settings.LLM_MAX_ATTEMPTS,
+                        backoff=settings.LLM_RETRY_BACKOFF,
+                        max_backoff=settings.LLM_RETRY_MAX_WAIT,
+                        coalesce=settings.LLM_COALESCE_REQUESTS,
+                    )
+        return self._llm
+
+    @property
+    def prompt_tokenizer(self):
+        """Tokenizer used to count prompt tokens.
+
+        ``PROMPT_TOKENIZER`` names a Hugging Face tokenizer matching the LLM;
+        when unset, the embedding model's own tokenizer is used.
+        """
+        if self._prompt_tokenizer is None:
+            with self._lock:
+                if self._prompt_tokenizer is None:
+                    if settings.PROMPT_TOKENIZER:
+                        # Installed with sentence-transformers; only needed here.
+                        from transformers import AutoTokenizer
+
+                        self._prompt_tokenizer = AutoTokenizer.from_pretrained(
+                            settings.PROMPT_TOKENIZER
+                        )
+                    else:
+                        self._prompt_tokenizer = self.embeddings.client.tokenizer
+        return self._prompt_tokenizer
+
+    def count_tokens(self, text: str) -> int:
+        """Number of prompt tokens in ``text``."""
+        return len(
+            self.prompt_tokenizer.encode(text, add_special_tokens=False, verbose=False)
+        )
+
+    @property
+    def query_embedding_cache(self) -> QueryEmbeddingCache:
+        """Shared cache of query embeddings."""
+        if self._query_embedding_cache is None:
+            with self._lock:
+                if self._query_embedding_cache is None:
+                    self._query_embedding_cache = QueryEmbeddingCache(
+                        max_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+                        ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL,
+                        disk_dir=settings.QUERY_EMBEDDING_CACHE_DIR or None,
+                        disk_max_rows=settings.QUERY_EMBEDDING_CACHE_DISK_MAX_ROWS,
+                    )
+        return self._query_embedding_cache
+
+    @property
+    def answer_cache(self) -> SemanticAnswerCache:
+        """Shared semantic cache of generated answers."""
+        if self._answer_cache is None:
+            with self._lock:
+                if self._answer_cache is None:
+                    self._answer_cache = SemanticAnswerCache(
+                        similarity_threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+                        max_entries_per_document=settings.ANSWER_CACHE_MAX_ENTRIES,
+                        ttl_seconds=settings.ANSWER_CACHE_TTL,
+                    )
+        return self._answer_cache
+
+    @property
+    def table_cache(self) -> TableHandleCache:
+        """Shared cache of opened LanceDB table handles."""
+        if self._table_cache is None:
+            with self._lock:
+                if self._table_cache is None:
+                    self._table_cache = TableHandleCache(
+                        max_size=settings.VECTOR_TABLE_CACHE_SIZE,
+                        ttl_seconds=settings.VECTOR_TABLE_CACHE_TTL,
+                    )
+        return self._table_cache
+
+    @property
+    def lexical_index(self) -> LexicalIndex:
+        """Shared BM25 full-text index of chunk text."""
+        if self._lexical_index is None:
+            with self._lock:
+                if self._lexical_index is None:
+                    self._lexical_index = LexicalIndex(
+                        settings.LEXICAL_INDEX_PATH
+                        or os.path.join(
+                            settings.CHROMA_PERSIST_DIRECTORY, "lexical_index.sqlite3"
+                        )
+                    )
+        return self._lexical_index
+
+    @property
+    def is_ready(self) -> bool:
+        """Whether warm-up has finished."""
+        return self._ready.is_set()
+
+    def warm_up(self) -> None:
+        """Load every resource and run a dummy encode so the first request is fast."""
+        with self._lock:
+            _ = self.db
+            _ = self.llm
+            _ = self.prompt_tokenizer
+            self.embeddings.embed_query("warm-up")
+        self._ready.set()
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until warm-up has finished or the timeout elapses."""
+        return self._ready.wait(timeout)
+
+    def status(self) -> dict:
+        """Describe which resources are loaded."""
+        return {
+            "ready": self.is_ready,
+            "embeddings_loaded": self._embeddings is not None,
+            "vector_db_connected": self._db is not None,
+            "llm_initialized": self._llm is not None,
+            "embedding_pool_started": self._embedding_pool is not None,
+        }
+
+
+model_registry = ModelRegistry()
@@ -1,104 +1,85 @@
-from typing import Dict, List
-import re
-from langchain_groq import ChatGroq
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
+import asyncio
+import logging
+import numpy as np
+from app.core.concurrency import run_blocking
 from app.core.config import settings
+from app.core.metrics import query_timer
+from app.services.context_builder import pack_context
+from app.services.excerpts import ChunkAnalysis, prepare_query, select_excerpt
+from app.services.model_registry import ModelRegistry, model_registry
 from app.services.vector_store import VectorStoreService
 
+logger = logging.getLogger(__name__)
+
+_NO_CONTEXT_ANSWER = (
+    "I couldn't find relevant information in the document to answer your question."
+)
+
 
 class RAGService:
     """Service for Retrieval Augmented Generation."""
 
-    def __init__(self):
-        """Initialize RAG service."""
-        self.vector_store_service = VectorStoreService()
-        self.llm = ChatGroq(
-            groq_api_key=settings.GROQ_API_KEY,
-            model_name=settings.MODEL_NAME,
-            temperature=settings.TEMPERATURE,
-            max_tokens=settings.MAX_TOKENS,
-        )
-    
-    def _extract_relevant_sentences(self, text: str, query: str, max_sentences: int = 1) -> str:
-        """Extract the most relevant fragment from text based on query."""
-        # Split into sentences
-        sentences = re.split(r'(?<=[.!?])\s+', text.strip())
-        
-        if not sentences:
-            return text[:100] + "..." if len(text) > 100 else text
-        
-        # Check if this is a simple entity query (name, date, number, etc.)
-        simple_query_patterns = [
-            r'\b(who|what|name|when|where|which|how many)\b',
-            r'\b(is|are|was|were)\b.*\b(name|called|date|number)\b'
-        ]
-        is_simple_query = any(re.search(pattern, query.lower()) for pattern in simple_query_patterns)
-        
-        # Score sentences by keyword overlap
-        query_words = set(word.lower() for word in query.split() if len(word) > 2)
-        scored_sentences = []
-        
-        for sentence in sentences:
-            sentence_words = set(word.lower() for word in sentence.split())
-            overlap = len(query_words & sentence_words)
-            if overlap > 0:
-                scored_sentences.append((overlap, sentence))
-        
-        # Sort by relevance
-        scored_sentences.sort(reverse=True, key=lambda x: x[0])
-        
-        if not scored_sentences:
-            return sentences[0][:100] + "..." if len(sentences[0]) > 100 else sentences[0]
-        
-        # Get the most relevant sentence
-        best_sentence = scored_sentences[0][1]
-        
-        # For simple queries, try to extract just the relevant fragment
-        if is_simple_query and len(best_sentence) > 120:
-            # Find the fragment containing the most query words
-            words = best_sentence.split()
-            best_fragment = best_sentence
-            best_score = 0
-            
-            # Use sliding window to find best fragment
-            for window_size in [10, 15, 20]:
-                for i in range(len(words) - window_size + 1):
-                    fragment = ' '.join(words[i:i + window_size])
-                    fragment_words = set(word.lower() for word in fragment.split())
-                    score = len(query_words & fragment_words)
-                    if score > best_score:
-                        best_score = score
-                        best_fragment = fragment
-            
-            # Add ellipsis if truncated
-            if best_fragment != best_sentence:
-                return "..." + best_fragment + "..."
-        
-        # Truncate long sentences
-        if len(best_sentence) > 120:
-            return best_sentence[:117] + "..."
-        
-        return best_sentence
-
-    def answer_question(self, document_id: int, question: str) -> Dict:
-        """Answer question based on document content."""
-        relevant_chunks = self.vector_store_service.search(
-            document_id=document_id,
-            query=question,
-            n_results=4
+    def __init__(
+        self,
+        registry: Optional[ModelRegistry] = None,
+        vector_store_service: Optional[VectorStoreService] = None,
+    ):
+        """Initialize RAG service from the shared model registry."""
+        registry = registry or model_registry
+        self.vector_store_service = vector_store_service or VectorStoreService(registry)
+        self.llm = registry.llm
+        self.count_tokens = registry.count_tokens
+        self.answer_cache = registry.answer_cache
+
+    def _sentence_similarities(
+        self, analyses: List[ChunkAnalysis], query_embedding: List[float]
+    ) -> List[np.ndarray]:
+        """Cosine similarity of each chunk's sentences to the query, in one batch."""
+        sentences = [analysis.sentences() for analysis in analyses]
+        flat = [sentence for group in sentences for sentence in group]
+        if not flat:
+            return [np.zeros(0) for _ in analyses]
+
+        vectors = np.asarray(
+            self.vector_store_service.embeddings.embed_documents(flat), dtype=np.float32
         )
-        
-        if not relevant_chunks:
-            return {
-                'answer': "I couldn't find relevant information in the document to answer your question.",
-                'sources': []
-            }
-        
-        context = "\n\n".join([chunk['content'] for chunk in relevant_chunks])
-        
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query) or 1.0)
+        scores = (vectors @ query) / np.where(norms == 0, 1.0, norms)
+        return np.split(scores, np.cumsum([len(group) for group in sentences])[:-1])
+
+    @query_timer("prompt")
+    def _build_prompt(
+        self,
+        question: str,
+        relevant_chunks: List[Dict],
+        labels: Optional[Dict[int, str]] = None
+    ) -> Tuple[str, int]:
+        """Build the LLM prompt from retrieved chunks; returns it with its token count.
+
+        Neighbouring and duplicate chunks are merged and the context is capped
+        at ``CONTEXT_TOKEN_BUDGET`` tokens. When ``labels`` maps document ids
+        to names, each excerpt is prefixed with its source document so the
+        answer can attribute it.
+        """
+        context = pack_context(
+            relevant_chunks,
+            self.count_tokens,
+            settings.CONTEXT_TOKEN_BUDGET,
+            labels=labels,
+        )
+        if labels:
+            heading = (
+                "Context from the documents (each excerpt is labelled with its source)"
+            )
+        else:
+            heading = "Context from the document"
+
         prompt = f"""You are a helpful assistant answering questions based solely on the provided document context.
 
-Context from the document:
-{context}
+{heading}:
+{context.text}
 
 Question: {question}
 
@@ -109,31 +90,454 @@ Instructions:
 - Do not make up information
 
 Answer:"""
+        prompt_tokens = self.count_tokens(prompt)
+        logger.info(
+            "Prompt: %d tokens (context %d, %d spans from %d chunks, "
+            "%d merged, %d dropped)",
+            prompt_tokens,
+            context.tokens,
+            context.spans,
+            len(relevant_chunks),
+            context.merged_chunks,
+            context.dropped_chunks,
+        )
+        return prompt, prompt_tokens
 
-        try:
-            response = self.llm.invoke(prompt)
-            answer = response.content
-        except Exception as e:
-            raise ValueError(f"Failed to generate answer: {str(e)}") from e
-        
-        # Extract relevant excerpts from chunks as sources
+    def _extract_sources(
+        self,
+        relevant_chunks: List[Dict],
+        question: str,
+        query_embedding: Optional[List[float]] = None
+    ) -> List[str]:
+        """Extract relevant excerpts from chunks as sources."""
+        return [
+            excerpt for excerpt, _ in
+            self._extract_attributed_sources(relevant_chunks, question, query_embedding)
+        ]
+
+    @query_timer("excerpt")
+    def _extract_attributed_sources(
+        self,
+        relevant_chunks: List[Dict],
+        question: str,
+        query_embedding: Optional[List[float]] = None
+    ) -> List[Tuple[str, Optional[int]]]:
+        """Extract relevant excerpts paired with the id of the document they came from.
+
+        Sentences are scored from the token and sentence spans stored at
+        ingest. With ``EXCERPT_SCORING=semantic`` and a query embedding, the
+        best sentence is chosen by cosine similarity instead of word overlap.
+        """
         sources = []
         seen_excerpts = set()  # Avoid duplicate sources
-        
-        for chunk in relevant_chunks[:3]:  # Show up to 3 sources
-            relevant_excerpt = self._extract_relevant_sentences(
-                chunk['content'], 
-                question,
-                max_sentences=1
-            )
+        terms = prepare_query(question)
+        analyses = [
+            ChunkAnalysis(chunk['content'], chunk.get('analysis'))
+            for chunk in relevant_chunks[:3]  # Show up to 3 sources
+        ]
+        if settings.EXCERPT_SCORING == "semantic" and query_embedding is not None:
+            sentence_scores = self._sentence_similarities(analyses, query_embedding)
+        else:
+            sentence_scores = [None] * len(analyses)
+
+        for chunk, analysis, scores in zip(relevant_chunks, analyses, sentence_scores):
+            relevant_excerpt = select_excerpt(analysis, terms, scores)
             # Only add if not too similar to existing sources
             if relevant_excerpt and relevant_excerpt not in seen_excerpts:
-                sources.append(relevant_excerpt)
+                sources.append((relevant_excerpt, chunk.get('document_id')))
                 seen_excerpts.add(relevant_excerpt)
                 if len(sources) >= 2:  # Limit to 2 unique sources
                     break
-        
+
+        return sources
+
+    def _retrieve(
+        self,
+        document_id: int,
+        question: str,
+        cache_version: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None
+    ) -> Dict:
+        """Embed the question and either hit the answer cache or fetch chunks.
+
+        Identifier lookups answered by the lexical index skip embedding, and
+        with it the answer cache. A precomputed ``query_embedding`` is used
+        as is.
+        """
+        vector_store = self.vector_store_service
+        if vector_store.lexical_only(question):
+            chunks = vector_store.lexical_search(
+                [document_id], question, settings.RETRIEVAL_TOP_K
+            )
+            if chunks:
+                return {'query_embedding': None, 'cached': None, 'chunks': chunks}
+
+        if query_embedding is None:
+            query_embedding = vector_store.embed_query(question)
+
+        if settings.ANSWER_CACHE_ENABLED:
+            cached = self.answer_cache.lookup(
+                document_id, query_embedding, cache_version
+            )
+            if cached is not None:
+                return {
+                    'query_embedding': query_embedding,
+                    'cached': cached,
+                    'chunks': [],
+                }
+
+        relevant_chunks = vector_store.search(
+            document_id=document_id,
+            query=question,
+            n_results=settings.RETRIEVAL_TOP_K,
+            query_embedding=query_embedding
+        )
+        return {
+            'query_embedding': query_embedding,
+            'cached': None,
+            'chunks': relevant_chunks,
+        }
+
+    def _remember(
+        self,
+        document_id: int,
+        question: str,
+        query_embedding: Optional[List[float]],
+        result: Dict,
+        cache_version: Optional[str] = None
+    ) -> None:
+        """Store a freshly generated answer in the answer cache."""
+        if settings.ANSWER_CACHE_ENABLED and query_embedding is not None:
+            self.answer_cache.store(
+                document_id, question, query_embedding, result, cache_version
+            )
+
+    @staticmethod
+    def _no_context_result(**extra) -> Dict:
+        """The result when retrieval found nothing to answer from."""
+        return {
+            'answer': _NO_CONTEXT_ANSWER,
+            'sources': [],
+            'cached': False,
+            'prompt_tokens': 0,
+            **extra
+        }
+
+    def _immediate_result(self, retrieval: Dict) -> Optional[Dict]:
+        """The result for an answer cache hit or a chunkless retrieval, else None."""
+        if retrieval['cached'] is not None:
+            return {**retrieval['cached'], 'cached': True, 'prompt_tokens': 0}
+        if not retrieval['chunks']:
+            return self._no_context_result()
+        return None
+
+    @staticmethod
+    def _result_events(result: Dict) -> Iterator[Dict]:
+        """Stream events for an answer that is already complete."""
+        sources_event = {
+            'event': 'sources',
+            'sources': result['sources'],
+            'cached': result['cached'],
+        }
+        if 'source_document_ids' in result:
+            sources_event['source_document_ids'] = result['source_document_ids']
+        yield sources_event
+        yield {'event': 'token', 'content': result['answer']}
+        yield {
+            'event': 'done',
+            'answer': result['answer'],
+            'sources': result['sources'],
+            'cached': result['cached'],
+            'prompt_tokens': result['prompt_tokens']
+        }
+
+    async def _acomplete(self, prompt: str) -> str:
+        """Generate the full answer to ``prompt``."""
+        try:
+            response = await self.llm.ainvoke(prompt)
+        except Exception as e:
+            raise ValueError(f"Failed to generate answer: {str(e)}") from e
+        return response.content
+
+    async def _astream_tokens(self, prompt: str) -> AsyncIterator[str]:
+        """Yield the non-empty chunks of the answer to ``prompt`` as they arrive."""
+        try:
+            async for chunk in self.llm.astream(prompt):
+                if chunk.content:
+                    yield chunk.content
+        except Exception as e:
+            raise ValueError(f"Failed to generate answer: {str(e)}") from e
+
+    async def aanswer_question(
+        self, document_id: int, question: str, cache_version: Optional[str] = None
+    ) -> Dict:
+        """Answer a question without blocking the event loop.
+
+        Embedding and LanceDB search run on the bounded blocking pool and the
+        LLM call uses the client's native async API.
+        """
+        retrieval = await run_blocking(
+            self._retrieve, document_id, question, cache_version
+        )
+        return await self._agenerate(document_id, question, retrieval, cache_version)
+
+    async def _agenerate(
+        self,
+        document_id: int,
+        question: str,
+        retrieval: Dict,
+        cache_version: Optional[str] = None,
+    ) -> Dict:
+        """Answer a finished retrieval: cached result, no-context reply or LLM call."""
+        result = self._immediate_result(retrieval)
+        if result is not None:
+            return result
+
+        relevant_chunks = retrieval['chunks']
+        prompt, prompt_tokens = await run_blocking(
+            self._build_prompt, question, relevant_chunks
+        )
+        answer = await self._acomplete(prompt)
+        result = {
+            'answer': answer,
+            'sources': await run_blocking(
+                self._extract_sources,
+                relevant_chunks,
+                question,
+                retrieval['query_embedding'],
+            ),
+        }
+        self._remember(
+            document_id, question, retrieval['query_embedding'], result, cache_version
+        )
+
+        return {**result, 'cached': False, 'prompt_tokens': prompt_tokens}
+
+    def _embed_questions(
+        self, questions: List[str]
+    ) -> List[Union[List[float], Exception]]:
+        """Embed questions in one batch, or one at a time if the batch fails.
+
+        A question that cannot be embedded on its own gets its exception in
+        place of a vector, so only that question fails.
+        """
+        vector_store = self.vector_store_service
+        try:
+            return vector_store.embed_queries(questions)
+        except Exception:
+            logger.warning(
+                "Batched query embedding failed; embedding questions one at a time",
+                exc_info=True,
+            )
+
+        vectors = []
+        for question in questions:
+            try:
+                vectors.append(vector_store.embed_query(question))
+            except Exception as e:
+                vectors.append(e)
+        return vectors
+
+    async def aanswer_batch(
+        self,
+        document_id: int,
+        questions: List[str],
+        cache_version: Optional[str] = None,
+    ) -> AsyncIterator[Dict]:
+        """Answer several questions about one document, yielding results as they finish.
+
+        Questions are embedded in one batched encode and retrieved together
+        on the blocking pool; at most ``BATCH_LLM_CONCURRENCY`` LLM calls run
+        at once. Each result carries the ``index`` of its question, and a
+        question whose embedding, retrieval or generation fails yields an ``error``
+        instead of failing the batch; cancellation still stops the batch.
+        """
+        vector_store = self.vector_store_service
+        embedded = [
+            i
+            for i, question in enumerate(questions)
+            if not vector_store.lexical_only(question)
+        ]
+        vectors = await run_blocking(
+            self._embed_questions, [questions[i] for i in embedded]
+        )
+        query_embeddings = dict(zip(embedded, vectors))
+
+        async def retrieve(index: int, question: str) -> Dict:
+            query_embedding = query_embeddings.get(index)
+            if isinstance(query_embedding, Exception):
+                raise query_embedding
+            return await run_blocking(
+                self._retrieve, document_id, question, cache_version, query_embedding
+            )
+
+        retrievals = await asyncio.gather(*[
+            retrieve(i, question) for i, question in enumerate(questions)
+        ], return_exceptions=True)
+
+        semaphore = asyncio.Semaphore(settings.BATCH_LLM_CONCURRENCY)
+
+        async def answer(index: int, question: str, retrieval: Dict) -> Dict:
+            try:
+                if isinstance(retrieval, BaseException):
+                    raise retrieval
+                async with semaphore:
+                    result = await self._agenerate(
+                        document_id, question, retrieval, cache_version
+                    )
+            except Exception as e:
+                if not isinstance(e, ValueError):
+                    logger.exception(
+                        "Batch question %d about document %s failed", index, document_id
+                    )
+                return {'index': index, 'question': question, 'error': str(e)}
+            return {'index': index, 'question': question, **result}
+
+        tasks = [
+            asyncio.ensure_future(answer(i, question, retrieval))
+            for i, (question, retrieval) in enumerate(zip(questions, retrievals))
+        ]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def astream_answer(
+        self, document_id: int, question: str, cache_version: Optional[str] = None
+    ) -> AsyncIterator[Dict]:
+        """Answer a question as a stream of events.
+
+        Yields a ``sources`` event as soon as retrieval finishes, then one
+        ``token`` event per LLM chunk, and finally a ``done`` event carrying
+        the full answer.
+        """
+        retrieval = await run_blocking(
+            self._retrieve, document_id, question, cache_version
+        )
+        result = self._immediate_result(retrieval)
+        if result is not None:
+            for event in self._result_events(result):
+                yield event
+            return
+
+        relevant_chunks = retrieval['chunks']
+        sources = await run_blocking(
+            self._extract_sources,
+            relevant_chunks,
+            question,
+            retrieval['query_embedding'],
+        )
+        yield {'event': 'sources', 'sources': sources, 'cached': False}
+
+        prompt, prompt_tokens = await run_blocking(
+            self._build_prompt, question, relevant_chunks
+        )
+        parts = []
+        async for content in self._astream_tokens(prompt):
+            parts.append(content)
+            yield {'event': 'token', 'content': content}
+
+        result = {'answer': "".join(parts), 'sources': sources}
+        self._remember(
+            document_id, question, retrieval['query_embedding'], result, cache_version
+        )
+        yield {
+            'event': 'done',
+            **result,
+            'cached': False,
+            'prompt_tokens': prompt_tokens,
+        }
+
+    async def _aretrieve_across(self, document_ids: List[int], question: str) -> Dict:
+        """Retrieve the global top-k chunks across several documents.
+
+        Uses the same hybrid search as single-document questions. The query
+        embedding is returned for excerpt scoring; it is None for identifier
+        lookups, which skip embedding.
+        """
+        vector_store = self.vector_store_service
+        query_embedding = None
+        if not vector_store.lexical_only(question):
+            query_embedding = await run_blocking(vector_store.embed_query, question)
+        chunks = await run_blocking(
+            vector_store.search_many,
+            document_ids,
+            question,
+            settings.RETRIEVAL_TOP_K,
+            query_embedding,
+        )
+        return {'query_embedding': query_embedding, 'chunks': chunks}
+
+    async def aanswer_across(self, documents: Dict[int, str], question: str) -> Dict:
+        """Answer a question from several documents at once.
+
+        ``documents`` maps each document id to the label used for attribution
+        in the prompt. Retrieval fans out concurrently and is merged into one
+        global top-k before a single LLM call.
+        """
+        retrieval = await self._aretrieve_across(list(documents), question)
+        relevant_chunks = retrieval['chunks']
+        if not relevant_chunks:
+            return self._no_context_result(source_document_ids=[])
+
+        prompt, prompt_tokens = await run_blocking(
+            self._build_prompt, question, relevant_chunks, documents
+        )
+        answer = await self._acomplete(prompt)
+        attributed = await run_blocking(
+            self._extract_attributed_sources,
+            relevant_chunks,
+            question,
+            retrieval['query_embedding'],
+        )
         return {
             'answer': answer,
-            'sources': sources
+            'sources': [excerpt for excerpt, _ in attributed],
+            'source_document_ids': [doc_id for _, doc_id in attributed],
+            'cached': False,
+            'prompt_tokens': prompt_tokens
+        }
+
+    async def astream_answer_across(
+        self, documents: Dict[int, str], question: str
+    ) -> AsyncIterator[Dict]:
+        """Streaming counterpart of :meth:`aanswer_across`."""
+        retrieval = await self._aretrieve_across(list(documents), question)
+        relevant_chunks = retrieval['chunks']
+        if not relevant_chunks:
+            result = self._no_context_result(source_document_ids=[])
+            for event in self._result_events(result):
+                yield event
+            return
+
+        attributed = await run_blocking(
+            self._extract_attributed_sources,
+            relevant_chunks,
+            question,
+            retrieval['query_embedding'],
+        )
+        sources = [excerpt for excerpt, _ in attributed]
+        yield {
+            'event': 'sources',
+            'sources': sources,
+            'source_document_ids': [doc_id for _, doc_id in attributed],
+            'cached': False
+        }
+
+        prompt, prompt_tokens = await run_blocking(
+            self._build_prompt, question, relevant_chunks, documents
+        )
+        parts = []
+        async for content in self._astream_tokens(prompt):
+            parts.append(content)
+            yield {'event': 'token', 'content': content}
+
+        yield {
+            'event': 'done',
+            'answer': "".join(parts),
+            'sources': sources,
+            'cached': False,
+            'prompt_tokens': prompt_tokens
         }
@@ -0,0 +1,200 @@
+"""Monthly request counting and per-client token buckets for the rate limiter."""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.request_count import RequestCount
+
+logger = logging.getLogger(__name__)
+
+# Idle clients beyond this many are forgotten, oldest first
+_MAX_TRACKED_CLIENTS = 10000
+
+
+def _month_bounds(now: float) -> Tuple[str, float]:
+    """The ``YYYY-MM`` month containing ``now`` and the timestamp it ends at."""
+    current = datetime.fromtimestamp(now, tz=timezone.utc)
+    start = current.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if start.month == 12:
+        following = start.replace(year=start.year + 1, month=1)
+    else:
+        following = start.replace(month=start.month + 1)
+    return current.strftime("%Y-%m"), following.timestamp()
+
+
+class RequestCounter:
+    """Monthly request count shared by every API process.
+
+    Requests are counted in memory under a lock and added to the
+    ``request_counts`` table at most every ``flush_interval`` seconds, so
+    the request path never touches the database. :meth:`count` is the
+    shared total as of the last flush plus this process's unflushed
+    requests; other processes' requests appear once they flush.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = 1.0,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        """Initialize with nothing counted."""
+        self.flush_interval = flush_interval
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._month, self._month_ends = _month_bounds(time.time())
+        self._pending: Dict[str, int] = {}
+        self._flushing = 0
+        self._shared = 0
+        self._last_flush = 0.0
+        self._flush_scheduled = False
+
+    def _roll_month(self, now: float) -> None:
+        if now >= self._month_ends:
+            self._month, self._month_ends = _month_bounds(now)
+            self._shared = 0
+            self._flushing = 0
+
+    def increment(self) -> int:
+        """Count a request and return this month's total including it."""
+        now = time.time()
+        with self._lock:
+            self._roll_month(now)
+            pending = self._pending.get(self._month, 0) + 1
+            self._pending[self._month] = pending
+            return self._shared + self._flushing + pending
+
+    def count(self) -> int:
+        """This month's total as seen by this process."""
+        with self._lock:
+            self._roll_month(time.time())
+            return self._shared + self._flushing + self._pending.get(self._month, 0)
+
+    @property
+    def month(self) -> str:
+        """The month being counted, as ``YYYY-MM``."""
+        return self._month
+
+    @property
+    def month_ends(self) -> float:
+        """Timestamp at which the current month's count resets."""
+        return self._month_ends
+
+    def claim_flush(self) -> bool:
+        """Whether a flush is due; the caller that gets True must run :meth:`flush`."""
+        if (
+            self._flush_scheduled
+            or time.monotonic() - self._last_flush < self.flush_interval
+        ):
+            return False
+        with self._lock:
+            if self._flush_scheduled:
+                return False
+            self._flush_scheduled = True
+            return True
+
+    def flush(self) -> None:
+        """Add unflushed requests to the shared store and read back this month's total.
+
+        Blocking; run it off the event loop. Requests that fail to flush are
+        kept and retried on the next flush.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                month = self._month
+                self._flushing = pending.get(month, 0)
+            try:
+                shared = self._store(pending, month)
+            except Exception:
+                logger.exception("Failed to flush request counts")
+                with self._lock:
+                    for key, value in pending.items():
+                        self._pending[key] = self._pending.get(key, 0) + value
+                    self._flushing = 0
+            else:
+                with self._lock:
+                    if month == self._month:
+                        self._shared = shared
+                    self._flushing = 0
+            finally:
+                self._last_flush = time.monotonic()
+                self._flush_scheduled = False
+
+    def _store(self, pending: Dict[str, int], month: str) -> int:
+        """Atomically add ``pending`` counts; returns the stored total for ``month``."""
+        db = self._session_factory()
+        try:
+            for key, value in pending.items():
+                if value:
+                    self._add(db, key, value)
+            db.commit()
+            return db.execute(
+                select(RequestCount.count).where(RequestCount.month == month)
+            ).scalar_one_or_none() or 0
+        finally:
+            db.close()
+
+    @staticmethod
+    def _add(db: Session, month: str, value: int) -> None:
+        """Add to a month's row, creating it if no process has yet."""
+        increment = (
+            update(RequestCount)
+            .where(RequestCount.month == month)
+            .values(count=RequestCount.count + value)
+        )
+        if db.execute(increment).rowcount:
+            return
+        try:
+            with db.begin_nested():
+                db.add(RequestCount(month=month, count=value))
+        except IntegrityError:
+            # Another process created the row first
+            db.execute(increment)
+
+
+class TokenBuckets:
+    """Per-client token buckets held in process memory.
+
+    Each client may make ``burst`` requests at once, refilled at ``rate``
+    requests per second. Limits apply per process, so with N workers a
+    client can reach N times the configured rate.
+    """
+
+    def __init__(
+        self, rate: float, burst: int, max_clients: int = _MAX_TRACKED_CLIENTS
+    ):
+        """Initialize with no clients tracked."""
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, client: str) -> float:
+        """Spend a token for ``client``; returns 0 or the seconds until one is free."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = [float(self.burst), now]
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / self.rate
+
+
+request_counter = RequestCounter(flush_interval=settings.RATE_LIMIT_FLUSH_INTERVAL)
@@ -0,0 +1,77 @@
+"""Bounded cache of opened LanceDB table handles."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+
+class TableHandleCache:
+    """LRU cache of open table handles keyed by table name.
+
+    Handles are reused for at most ``ttl_seconds`` so writes made by other
+    processes (such as ingestion workers) become visible without a restart;
+    writes made through this process invalidate the affected entry at once.
+    """
+
+    def __init__(self, max_size: int = 256, ttl_seconds: float = 5.0):
+        """Initialize the cache."""
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_open(
+        self, table_name: str, opener: Callable[[str], Any]
+    ) -> Optional[Any]:
+        """Return a cached handle, opening and caching it on a miss.
+
+        ``opener`` should return None for missing tables; None is never cached.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(table_name)
+            if entry is not None and (
+                self.ttl_seconds <= 0 or now - entry[0] <= self.ttl_seconds
+            ):
+                self._entries.move_to_end(table_name)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        table = opener(table_name)
+        if table is None:
+            return None
+
+        with self._lock:
+            self._entries[table_name] = (now, table)
+            self._entries.move_to_end(table_name)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return table
+
+    def invalidate(self, table_name: str) -> None:
+        """Forget the handle for a table."""
+        with self._lock:
+            self._entries.pop(table_name, None)
+
+    def clear(self) -> None:
+        """Forget every handle."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters and current size."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
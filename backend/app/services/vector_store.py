@@ -1,80 +1,994 @@
-import os
-from typing import List, Dict
-import lancedb
+import hashlib
+import heapq
+import itertools
+import logging
+import math
+import re
+import threading
+import time
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple, Union
+import pyarrow.compute as pc
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from app.core.concurrency import fan_out
 from app.core.config import settings
+from app.core.metrics import query_timer
+from app.services.excerpts import ANALYSIS_COLUMNS, analyze_text
+from app.services.model_registry import ModelRegistry, model_registry
+
+logger = logging.getLogger(__name__)
+
+# Dense/lexical candidates fetched per requested result before fusion
+_HYBRID_CANDIDATE_FACTOR = 4
+# Queries of at most this many tokens containing a token like INV-2024-042 are
+# identifier lookups
+_IDENTIFIER_QUERY_MAX_TOKENS = 3
+_IDENTIFIER_TOKEN = re.compile(r"[\w][\w\-./:#]*")
+
+# Characters buffered by the streaming chunker, in multiples of CHUNK_SIZE
+_CHUNKER_BUFFER_CHUNKS = 8
+
+# Vector indexes are named after the row count they were trained on
+_VECTOR_INDEX_PREFIX = "vector_idx_rows_"
+
+_compaction_lock = threading.Lock()
+_deleted_since_compaction = 0
 
 
 class VectorStoreService:
     """Service for managing vector store operations."""
 
-    def __init__(self):
-        """Initialize vector store service."""
-        os.makedirs(settings.CHROMA_PERSIST_DIRECTORY, exist_ok=True)
-        self.db = lancedb.connect(settings.CHROMA_PERSIST_DIRECTORY)
+    def __init__(self, registry: Optional[ModelRegistry] = None):
+        """Initialize vector store service from the shared model registry."""
+        self._registry = registry or model_registry
+        self.db = self._registry.db
         self.client = self.db  # Alias for backwards compatibility
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
+        self.query_embedding_cache = self._registry.query_embedding_cache
+        self.answer_cache = self._registry.answer_cache
+        self.table_cache = self._registry.table_cache
+        self.lexical_index = (
+            self._registry.lexical_index if settings.LEXICAL_INDEX_ENABLED else None
         )
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
+            chunk_size=settings.CHUNK_SIZE,
+            chunk_overlap=settings.CHUNK_OVERLAP,
             length_function=len,
         )
 
+    @property
+    def embeddings(self):
+        """Shared embedding model, loaded on first use."""
+        return self._registry.embeddings
+
+    @classmethod
+    def config_signature(cls) -> str:
+        """Identify the chunking/embedding configuration vectors were built with."""
+        return (
+            f"{settings.EMBEDDING_MODEL_NAME}|{settings.CHUNK_SIZE}|"
+            f"{settings.CHUNK_OVERLAP}"
+        )
+
+    @property
+    def consolidated(self) -> bool:
+        """Whether all chunks live in one table filtered by ``document_id``."""
+        return settings.VECTOR_STORE_LAYOUT == "consolidated"
+
     def _get_table_name(self, document_id: int):
         """Get table name for a document."""
+        if self.consolidated:
+            return self.consolidated_table_name()
         return f"{settings.COLLECTION_NAME}_{document_id}"
 
-    def add_document(self, document_id: int, text: str, metadata: Dict) -> None:
-        """Add document to vector store."""
-        chunks = self.text_splitter.split_text(text)
-        
-        if not chunks:
-            raise ValueError("No text chunks generated from document")
-        
-        table_name = self._get_table_name(document_id)
-        embeddings_list = self.embeddings.embed_documents(chunks)
-        
-        data = []
-        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings_list)):
-            data.append({
-                "id": f"{document_id}_chunk_{i}",
+    @classmethod
+    def consolidated_table_name(cls) -> str:
+        """Name of the single chunk table used by the consolidated layout."""
+        return f"{settings.COLLECTION_NAME}_chunks"
+
+    def _document_filter(self, document_id: int) -> Optional[str]:
+        """Row filter selecting one document's chunks, if the layout needs one."""
+        return f"document_id = {int(document_id)}" if self.consolidated else None
+
+    def _open_table_uncached(self, table_name: str):
+        """Open a table, returning None if it does not exist."""
+        try:
+            return self.db.open_table(table_name)
+        except Exception:
+            return None
+
+    def _open_table(self, table_name: str):
+        """Open a table through the shared handle cache, or None if missing."""
+        return self.table_cache.get_or_open(table_name, self._open_table_uncached)
+
+    @query_timer("embed")
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query, reusing cached vectors for repeated questions."""
+        return self.query_embedding_cache.get_or_compute(
+            settings.EMBEDDING_MODEL_NAME, query, self.embeddings.embed_query
+        )
+
+    @query_timer("embed")
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed several queries with one batched encode, reusing cached vectors."""
+        cache = self.query_embedding_cache
+        model_name = settings.EMBEDDING_MODEL_NAME
+        vectors = [cache.get(model_name, query) for query in queries]
+        missing = list(
+            dict.fromkeys(q for q, vector in zip(queries, vectors) if vector is None)
+        )
+        if not missing:
+            return vectors
+
+        # HuggingFaceEmbeddings.embed_query is embed_documents on a single text
+        computed = dict(zip(missing, self.embeddings.embed_documents(missing)))
+        for query, vector in computed.items():
+            cache.put(model_name, query, vector)
+        return [
+            vector if vector is not None else computed[q]
+            for q, vector in zip(queries, vectors)
+        ]
+
+    def _read_columns(
+        self, table, columns: List[str], document_id: Optional[int] = None
+    ):
+        """Read selected columns as an Arrow table, skipping vectors when possible."""
+        where = self._document_filter(document_id) if document_id is not None else None
+        try:
+            return table.to_lance().to_table(columns=columns, filter=where)
+        except ImportError:
+            data = table.to_arrow()
+            if where is not None:
+                data = data.filter(pc.equal(data["document_id"], document_id))
+            return data.select(columns)
+
+    def _existing_chunks(self, document_id: int) -> Optional[Dict[str, int]]:
+        """Stored chunk index by chunk hash, or None if the document can't be diffed."""
+        table = self._open_table_uncached(self._get_table_name(document_id))
+        if table is None or "chunk_hash" not in table.schema.names:
+            return None
+        data = self._read_columns(table, ["chunk_hash", "chunk_index"], document_id)
+        chunks = dict(
+            zip(
+                data.column("chunk_hash").to_pylist(),
+                data.column("chunk_index").to_pylist(),
+            )
+        )
+        return chunks if chunks or not self.consolidated else None
+
+    @staticmethod
+    def _fit_schema(table, data: List[Dict]) -> List[Dict]:
+        """Drop row fields that a table created before they existed lacks."""
+        names = set(table.schema.names)
+        if all(key in names for key in data[0]):
+            return data
+        return [
+            {key: value for key, value in row.items() if key in names} for row in data
+        ]
+
+    def _append_rows(self, table_name: str, data: List[Dict]) -> None:
+        """Append rows, creating the table on first write."""
+        table = self._open_table_uncached(table_name)
+        if table is not None:
+            table.add(self._fit_schema(table, data))
+            return
+        try:
+            self.db.create_table(table_name, data=data)
+        except Exception:
+            # Another writer created it first
+            table = self.db.open_table(table_name)
+            table.add(self._fit_schema(table, data))
+
+    def _split_with_pages(
+        self, buffer: str, spans: List[Tuple[int, int, Optional[int]]]
+    ) -> List[Tuple[str, List[int], int]]:
+        """Split buffered text into ``(chunk, pages, offset)`` by element page spans."""
+        pieces = []
+        cursor = 0
+        for piece in self.text_splitter.split_text(buffer):
+            start = buffer.find(piece, cursor)
+            start = cursor if start < 0 else start
+            end = start + len(piece)
+            pages = sorted({
+                page for first, last, page in spans
+                if page is not None and first < end and last > start
+            })
+            pieces.append((piece, pages, start))
+            cursor = start + 1
+        return pieces
+
+    def iter_chunks(
+        self, elements: Iterable[Union[str, Tuple[str, Optional[int]]]]
+    ) -> Iterator[Tuple[str, List[int]]]:
+        """Split a stream of element texts into chunks without joining them all.
+
+        Elements are plain strings or ``(text, page_number)`` pairs; each
+        chunk is yielded with the sorted page numbers it spans. Elements are
+        buffered until the buffer holds several chunks of text; every chunk
+        but the last is emitted and the last is carried over, so chunks still
+        overlap across buffer boundaries while memory stays bounded by the
+        buffer rather than the document.
+        """
+        threshold = settings.CHUNK_SIZE * _CHUNKER_BUFFER_CHUNKS
+        buffer = ""
+        spans: List[Tuple[int, int, Optional[int]]] = []
+        for element in elements:
+            text, page = (element, None) if isinstance(element, str) else element
+            if not text:
+                continue
+            start = len(buffer) + 2 if buffer else 0
+            buffer = f"{buffer}\n\n{text}" if buffer else text
+            spans.append((start, len(buffer), page))
+            if len(buffer) < threshold:
+                continue
+            pieces = self._split_with_pages(buffer, spans)
+            for chunk, pages, _ in pieces[:-1]:
+                yield chunk, pages
+            if not pieces:
+                buffer, spans = "", []
+                continue
+            buffer, _, offset = pieces[-1]
+            spans = [
+                (max(first - offset, 0), last - offset, page)
+                for first, last, page in spans if last > offset
+            ]
+        if buffer:
+            for chunk, pages, _ in self._split_with_pages(buffer, spans):
+                yield chunk, pages
+
+    def _batch_new_chunks(
+        self,
+        chunks: Iterable[Tuple[str, List[int]]],
+        seen: Dict[str, int],
+        skip: Callable[[int, str], bool]
+    ) -> Iterator[List[Tuple[int, str, str, List[int]]]]:
+        """Number unique chunks and group those not skipped into write batches.
+
+        Yields lists of ``(chunk_index, chunk_hash, text, pages)``; every
+        unique hash is recorded in ``seen`` with its index, including skipped ones.
+        """
+        batch_size = max(1, settings.INGEST_WRITE_BATCH_SIZE)
+        batch = []
+        for chunk, pages in chunks:
+            chunk_hash = hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+            if chunk_hash in seen:
+                continue
+            ordinal = seen[chunk_hash] = len(seen)
+            if skip(ordinal, chunk_hash):
+                continue
+            batch.append((ordinal, chunk_hash, chunk, pages))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _write_batch(
+        self,
+        table,
+        table_name: str,
+        document_id: int,
+        batch: List[Tuple[int, str, str, List[int]]],
+        vectors: List[List[float]],
+        metadata: Dict,
+        replace: bool
+    ):
+        """Write one embedded batch of chunks; returns the table for the next batch."""
+        data = [
+            {
+                "id": f"{document_id}_chunk_{chunk_hash[:16]}",
+                "document_id": document_id,
+                "chunk_index": ordinal,
                 "text": chunk,
                 "vector": embedding,
-                "metadata": str(metadata)
-            })
-        
-        self.db.create_table(table_name, data=data, mode="overwrite")
+                "metadata": str(
+                    {**metadata, 'page_numbers': pages} if pages else metadata
+                ),
+                "chunk_hash": chunk_hash,
+                **analyze_text(chunk),
+            }
+            for (ordinal, chunk_hash, chunk, pages), embedding in zip(batch, vectors)
+        ]
+        if self.lexical_index is not None:
+            self.lexical_index.add(
+                document_id,
+                [
+                    (row["id"], row["chunk_index"], row["text"], row["metadata"])
+                    for row in data
+                ],
+            )
+        if table is not None:
+            table.add(self._fit_schema(table, data))
+            return table
+        if replace and not self.consolidated:
+            return self.db.create_table(table_name, data=data, mode="overwrite")
+        if replace:
+            self._delete_rows(document_id)
+            self._append_rows(table_name, data)
+            return self.db.open_table(table_name)
+        table = self.db.open_table(table_name)
+        table.add(self._fit_schema(table, data))
+        return table
+
+    def _renumber_chunks(
+        self, table, document_id: int, existing: Dict[str, int], order: Dict[str, int]
+    ) -> int:
+        """Move kept chunks to their index in the new order; returns how many moved.
+
+        Chunks after an edit all shift by the same amount, so rows are
+        updated with one statement per distinct shift rather than per row.
+        """
+        shifts: Dict[int, List[str]] = {}
+        for chunk_hash, index in existing.items():
+            new_index = order.get(chunk_hash)
+            if new_index is not None and new_index != index:
+                shifts.setdefault(new_index - (index or 0), []).append(chunk_hash)
+        for shift, hashes in shifts.items():
+            quoted = ", ".join(f"'{h}'" for h in sorted(hashes))
+            where = f"chunk_hash IN ({quoted})"
+            if self.consolidated:
+                where = f"{self._document_filter(document_id)} AND {where}"
+            table.update(
+                where=where,
+                values_sql={"chunk_index": f"coalesce(chunk_index, 0) + ({shift})"},
+            )
+        moved = [chunk_hash for hashes in shifts.values() for chunk_hash in hashes]
+        if moved and self.lexical_index is not None:
+            self.lexical_index.set_chunk_indexes(
+                (f"{document_id}_chunk_{chunk_hash[:16]}", order[chunk_hash])
+                for chunk_hash in moved
+            )
+        return len(moved)
+
+    def _resume_table(self, table_name: str, document_id: int, resume_from: int):
+        """Open a partially written table, dropping rows past the checkpoint."""
+        table = self._open_table_uncached(table_name)
+        if table is None:
+            return None
+        where = f"chunk_index >= {int(resume_from)}"
+        if self.consolidated:
+            where = f"{self._document_filter(document_id)} AND {where}"
+        table.delete(where)
+        if self.lexical_index is not None:
+            self.lexical_index.delete_document(
+                document_id, from_chunk_index=resume_from
+            )
+        return table
+
+    def add_document(
+        self,
+        document_id: int,
+        text: Union[str, Iterable[Union[str, Tuple[str, Optional[int]]]]],
+        metadata: Dict,
+        on_stage: Optional[Callable[[str], None]] = None,
+        incremental: bool = False,
+        resume_from: int = 0,
+        on_checkpoint: Optional[Callable[[int], None]] = None,
+        before_write: Optional[Callable[[], None]] = None
+    ) -> Dict[str, float]:
+        """Add document to vector store.
+
+        ``text`` is the document text or an iterable of element texts, each
+        optionally paired with its page number; a chunk's pages are stored as
+        ``page_numbers`` in its metadata. Chunks
+        are produced incrementally and embedded and written
+        ``INGEST_WRITE_BATCH_SIZE`` at a time, so memory is bounded by the
+        batch size rather than the document. Once a document has produced
+        ``EMBEDDING_POOL_MIN_CHUNKS`` chunks, the multi-process encode pool is
+        used when one is configured.
+
+        Chunks are keyed by the SHA-256 of their text, so identical chunks
+        are stored once. With ``incremental=True`` and an existing table, only
+        chunks whose hash is not already stored are embedded and appended,
+        kept chunks are renumbered to their position in the new text, and
+        rows for chunks no longer present are deleted.
+
+        Otherwise the table is rewritten, and ``on_checkpoint`` is called with
+        the number of chunks durably written after each batch. Passing that
+        number back as ``resume_from`` continues a crashed ingest without
+        re-embedding those chunks.
+
+        ``on_stage`` is called with ``"split"``, ``"embed"`` and ``"write"`` as
+        each ingestion stage starts, and ``before_write`` before every write;
+        either may raise to abort the ingest. Returns added/removed/unchanged counts,
+        throughput in chunks per second and seconds spent embedding and
+        writing.
+        """
+        on_stage = on_stage or (lambda stage: None)
+        on_checkpoint = on_checkpoint or (lambda written: None)
+        before_write = before_write or (lambda: None)
+        elements = [text] if isinstance(text, str) else text
 
-    def search(self, document_id: int, query: str, n_results: int = 4) -> List[Dict]:
-        """Search for relevant chunks in document."""
         table_name = self._get_table_name(document_id)
-        
+        existing = self._existing_chunks(document_id) if incremental else None
+        table = None
+        if existing is not None:
+            resume_from = 0
+        elif resume_from:
+            table = self._resume_table(table_name, document_id, resume_from)
+            if table is None:
+                resume_from = 0
+        if existing is None and not resume_from and self.lexical_index is not None:
+            self.lexical_index.delete_document(document_id)
+
+        chunks = self.iter_chunks(elements)
+        first = next(chunks, None)
+        if first is None:
+            raise ValueError("No text chunks generated from document")
+        on_stage("split")
+
+        seen: Dict[str, int] = {}
+
+        def skip(ordinal: int, chunk_hash: str) -> bool:
+            if existing is not None:
+                return chunk_hash in existing
+            return ordinal < resume_from
+
+        added = 0
+        timings = {'embed': 0.0, 'write': 0.0}
+        started = time.perf_counter()
+        for batch in self._batch_new_chunks(
+            itertools.chain([first], chunks), seen, skip
+        ):
+            if not added:
+                on_stage("embed")
+            batch_started = time.perf_counter()
+            vectors = self._registry.embed_documents(
+                [chunk for _, _, chunk, _ in batch],
+                use_pool=batch[-1][0] + 1 >= settings.EMBEDDING_POOL_MIN_CHUNKS
+            )
+            embedded = time.perf_counter()
+            before_write()
+            table = self._write_batch(
+                table,
+                table_name,
+                document_id,
+                batch,
+                vectors,
+                metadata,
+                replace=existing is None,
+            )
+            timings['embed'] += embedded - batch_started
+            timings['write'] += time.perf_counter() - embedded
+            added += len(batch)
+            if existing is None:
+                on_checkpoint(batch[-1][0] + 1)
+
+        elapsed = time.perf_counter() - started
+        chunks_per_second = added / elapsed if added and elapsed > 0 else 0.0
+        if added:
+            logger.info(
+                "Embedded and wrote %d chunks for document %s in %.2fs "
+                "(%.1f chunks/sec)",
+                added,
+                document_id,
+                elapsed,
+                chunks_per_second,
+            )
+
+        on_stage("write")
+        before_write()
+        finalize_started = time.perf_counter()
+        to_remove = existing.keys() - seen.keys() if existing is not None else set()
+        if existing:
+            table = table or self.db.open_table(table_name)
+            self._renumber_chunks(table, document_id, existing, seen)
+        if to_remove:
+            table = table or self.db.open_table(table_name)
+            hashes = ", ".join(f"'{h}'" for h in sorted(to_remove))
+            where = f"chunk_hash IN ({hashes})"
+            if self.consolidated:
+                where = f"{self._document_filter(document_id)} AND {where}"
+            table.delete(where)
+            self._note_deletes(table, len(to_remove))
+            if self.lexical_index is not None:
+                self.lexical_index.delete_chunks(
+                    f"{document_id}_chunk_{h[:16]}" for h in to_remove
+                )
+        self._maybe_build_index(table_name)
+        if self.consolidated:
+            table = table or self._open_table_uncached(table_name)
+            if table is not None:
+                self._index_documents(table)
+        self.table_cache.invalidate(table_name)
+        self.answer_cache.invalidate(document_id)
+        timings['write'] += time.perf_counter() - finalize_started
+
+        return {
+            'added': added,
+            'removed': len(to_remove),
+            'unchanged': len(seen) - added,
+            'chunks_per_second': chunks_per_second,
+            'embed_seconds': timings['embed'],
+            'write_seconds': timings['write']
+        }
+
+    def is_identifier_query(self, query: str) -> bool:
+        """Whether a query looks like an identifier lookup rather than a question."""
+        tokens = [token.strip("?!.,;:'\"") for token in query.split()]
+        tokens = [token for token in tokens if token]
+        return 0 < len(tokens) <= _IDENTIFIER_QUERY_MAX_TOKENS and any(
+            _IDENTIFIER_TOKEN.fullmatch(token) and any(ch.isdigit() for ch in token)
+            for token in tokens
+        )
+
+    def lexical_only(self, query: str) -> bool:
+        """Whether to answer a query from the lexical index without embedding it."""
+        return (
+            self.lexical_index is not None
+            and settings.LEXICAL_ONLY_IDENTIFIER_QUERIES
+            and self.is_identifier_query(query)
+        )
+
+    @query_timer("lexical_search")
+    def lexical_search(
+        self, document_ids: List[int], query: str, n_results: int
+    ) -> List[Dict]:
+        """BM25 matches for a query, or an empty list if the lexical index is off."""
+        if self.lexical_index is None:
+            return []
+        return self.lexical_index.search(document_ids, query, n_results)
+
+    @staticmethod
+    def candidate_count(n_results: int) -> int:
+        """Results fetched from each retriever before fusing down to ``n_results``."""
+        return n_results * _HYBRID_CANDIDATE_FACTOR
+
+    @staticmethod
+    def fuse(result_lists: List[List[Dict]], n_results: int) -> List[Dict]:
+        """Combine ranked result lists with reciprocal rank fusion.
+
+        A chunk, identified by its row id, scores ``1 / (HYBRID_RRF_K + rank)``
+        in each list it appears in; when lists disagree on its fields, the
+        first list wins.
+        """
+        scores: Dict[object, float] = {}
+        chunks: Dict[object, Dict] = {}
+        for results in result_lists:
+            for rank, chunk in enumerate(results, start=1):
+                key = chunk.get('chunk_id') or (
+                    chunk.get('document_id'),
+                    chunk.get('content'),
+                )
+                scores[key] = scores.get(key, 0.0) + 1.0 / (
+                    settings.HYBRID_RRF_K + rank
+                )
+                chunks.setdefault(key, chunk)
+        ranked = sorted(scores, key=scores.get, reverse=True)[:n_results]
+        return [{**chunks[key], 'score': scores[key]} for key in ranked]
+
+    def _hybrid_search(
+        self,
+        document_ids: List[int],
+        query: str,
+        n_results: int,
+        query_embedding: Optional[List[float]],
+        dense_search: Callable[[List[float], int], List[Dict]]
+    ) -> List[Dict]:
+        """Fuse BM25 and dense results, skipping embedding for identifier lookups."""
+        lexical = self.lexical_search(
+            document_ids, query, self.candidate_count(n_results)
+        )
+        if lexical and self.lexical_only(query):
+            return lexical[:n_results]
+
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
+        if not lexical:
+            return dense_search(query_embedding, n_results)
+        return self.fuse(
+            [dense_search(query_embedding, self.candidate_count(n_results)), lexical],
+            n_results,
+        )
+
+    def search(
+        self,
+        document_id: int,
+        query: str,
+        n_results: int = 4,
+        query_embedding: Optional[List[float]] = None
+    ) -> List[Dict]:
+        """Search for relevant chunks in document.
+
+        Dense and BM25 results are combined with reciprocal rank fusion;
+        identifier-like queries with lexical matches skip embedding entirely.
+        """
+        return self._hybrid_search(
+            [document_id], query, n_results, query_embedding,
+            lambda embedding, k: self.vector_search(document_id, embedding, k)
+        )
+
+    def search_many(
+        self,
+        document_ids: List[int],
+        query: str,
+        n_results: int = 4,
+        query_embedding: Optional[List[float]] = None
+    ) -> List[Dict]:
+        """Search several documents and return the global top-k.
+
+        The consolidated layout answers with one filtered query; the
+        per-document layout searches the tables concurrently and merges the
+        results.
+        """
+        return self._hybrid_search(
+            document_ids, query, n_results, query_embedding,
+            lambda embedding, k: self._vector_search_many(document_ids, embedding, k)
+        )
+
+    @query_timer("vector_search")
+    def vector_search(
+        self, document_id: int, query_embedding: List[float], n_results: int
+    ) -> List[Dict]:
+        """Dense nearest-neighbour search within one document."""
+        table = self._open_table(self._get_table_name(document_id))
+        if table is None:
+            return []
+
+        results = (
+            self._vector_query(
+                table, query_embedding, self._document_filter(document_id)
+            )
+            .limit(n_results)
+            .to_list()
+        )
+
+        return self._to_chunks(results, document_id)
+
+    def _vector_search_many(
+        self, document_ids: List[int], query_embedding: List[float], n_results: int
+    ) -> List[Dict]:
+        """Dense search across documents, returning the global top-k by distance."""
+        if not self.consolidated:
+            per_document = fan_out(
+                lambda doc_id: self.vector_search(doc_id, query_embedding, n_results),
+                document_ids,
+            )
+            return self.merge_top_k(per_document, n_results)
+
+        table = self._open_table(self.consolidated_table_name())
+        if table is None:
+            return []
+        ids = ", ".join(str(int(doc_id)) for doc_id in document_ids)
+        with query_timer("vector_search"):
+            results = (
+                self._vector_query(table, query_embedding, f"document_id IN ({ids})")
+                .limit(n_results)
+                .to_list()
+            )
+        return self._to_chunks(results)
+
+    @staticmethod
+    def _vector_query(table, query_embedding: List[float], where: Optional[str] = None):
+        """Start a vector search with the configured ANN probe/refine settings.
+
+        Both settings are ignored by LanceDB on tables without an index.
+        ``where`` prefilters rows; when it leaves at most
+        ``VECTOR_SEARCH_FLAT_MAX_ROWS`` rows they are searched exactly, since
+        probing a few IVF partitions can miss most of a small document.
+        """
+        query_builder = table.search(query_embedding)
+        if where is not None:
+            query_builder = query_builder.where(where, prefilter=True)
+            if table.count_rows(where) <= settings.VECTOR_SEARCH_FLAT_MAX_ROWS:
+                return query_builder.bypass_vector_index()
+        if settings.VECTOR_SEARCH_NPROBES > 0:
+            query_builder = query_builder.nprobes(settings.VECTOR_SEARCH_NPROBES)
+        if settings.VECTOR_SEARCH_REFINE_FACTOR > 0:
+            query_builder = query_builder.refine_factor(
+                settings.VECTOR_SEARCH_REFINE_FACTOR
+            )
+        return query_builder
+
+    @staticmethod
+    def index_params(num_rows: int, dim: int) -> Dict[str, int]:
+        """IVF-PQ parameters for a table of ``num_rows`` vectors of size ``dim``."""
+        num_partitions = settings.VECTOR_INDEX_NUM_PARTITIONS or max(
+            1, min(int(math.sqrt(num_rows)), num_rows // 256)
+        )
+        num_sub_vectors = settings.VECTOR_INDEX_NUM_SUB_VECTORS
+        if not num_sub_vectors:
+            # Prefer ~8 dimensions per sub-vector; it must divide the dimension
+            num_sub_vectors = next(
+                (n for n in range(max(1, dim // 8), 0, -1) if dim % n == 0), 1
+            )
+        return {'num_partitions': num_partitions, 'num_sub_vectors': num_sub_vectors}
+
+    @staticmethod
+    def _index_name(table, column: str) -> Optional[str]:
+        """Name of the index on a table column, if it has one."""
         try:
-            table = self.db.open_table(table_name)
+            indices = table.list_indices()
+        except AttributeError:
+            indices = table.to_lance().list_indices()
+        for index in indices:
+            if isinstance(index, dict):
+                name, columns = index.get('name'), index.get('fields')
+            else:
+                name, columns = getattr(index, 'name', None), getattr(
+                    index, 'columns', []
+                )
+            if column in (columns or []):
+                return name or f"{column}_idx"
+        return None
+
+    @staticmethod
+    def _trained_rows(index_name: str) -> Optional[int]:
+        """Rows an index was trained on, or None for indexes built before recording."""
+        suffix = index_name[len(_VECTOR_INDEX_PREFIX):]
+        return (
+            int(suffix)
+            if index_name.startswith(_VECTOR_INDEX_PREFIX) and suffix.isdigit()
+            else None
+        )
+
+    def build_index(self, table_name: str, force: bool = False) -> bool:
+        """Build an IVF-PQ index on a table that has reached the row threshold.
+
+        Returns True if an index was (re)built. ``force`` rebuilds existing
+        indexes and ignores the threshold, but never indexes fewer than 256
+        rows since PQ training needs at least that many.
+        """
+        table = self._open_table_uncached(table_name)
+        if table is None:
+            return False
+        num_rows = table.count_rows()
+        if num_rows < 256:
+            return False
+        existing = self._index_name(table, "vector")
+        if not force and (num_rows < settings.VECTOR_INDEX_MIN_ROWS or existing):
+            return False
+
+        dim = table.schema.field("vector").type.list_size
+        if existing:
+            table.drop_index(existing)
+        table.create_index(
+            metric="L2",
+            vector_column_name="vector",
+            replace=True,
+            name=f"{_VECTOR_INDEX_PREFIX}{num_rows}",
+            **self.index_params(num_rows, dim)
+        )
+        self.table_cache.invalidate(table_name)
+        logger.info("Built vector index on %s (%d rows)", table_name, num_rows)
+        return True
+
+    def _needs_rebuild(self, table, index_name: str) -> bool:
+        """Whether an index should be retrained rather than extended with new rows."""
+        num_rows = table.count_rows()
+        unindexed = table.index_stats(index_name).num_unindexed_rows
+        if unindexed > num_rows * settings.VECTOR_INDEX_REBUILD_UNINDEXED_RATIO:
+            return True
+        trained = self._trained_rows(index_name)
+        growth = settings.VECTOR_INDEX_REBUILD_GROWTH
+        return trained is None or (growth > 0 and num_rows >= trained * growth)
+
+    def _maybe_build_index(self, table_name: str) -> None:
+        """Keep a table's vector index current after a write.
+
+        The index is built once the table passes ``VECTOR_INDEX_MIN_ROWS``.
+        Later writes add their rows to it with ``optimize()``, and it is
+        retrained with partitions recomputed from the current row count once
+        more than ``VECTOR_INDEX_REBUILD_UNINDEXED_RATIO`` of the rows are
+        unindexed or the table has grown ``VECTOR_INDEX_REBUILD_GROWTH``
+        times since training.
+        """
+        if settings.VECTOR_INDEX_MIN_ROWS <= 0:
+            return
+        try:
+            table = self._open_table_uncached(table_name)
+            index_name = (
+                self._index_name(table, "vector") if table is not None else None
+            )
+            if index_name is None:
+                self.build_index(table_name)
+            elif self._needs_rebuild(table, index_name):
+                self.build_index(table_name, force=True)
+            elif table.index_stats(index_name).num_unindexed_rows:
+                table.optimize()
+                self.table_cache.invalidate(table_name)
         except Exception:
-            return []
-        
-        query_embedding = self.embeddings.embed_query(query)
-        
-        results = table.search(query_embedding).limit(n_results).to_list()
-        
+            logger.exception("Vector index maintenance failed for %s", table_name)
+
+    def _index_documents(self, table) -> None:
+        """Keep the BTREE index on the consolidated table's ``document_id`` current.
+
+        Per-document filters and row deletes use it instead of scanning the
+        column of every document's rows.
+        """
+        try:
+            index_name = self._index_name(table, "document_id")
+            if index_name is None:
+                table.create_scalar_index("document_id", index_type="BTREE")
+            elif table.index_stats(index_name).num_unindexed_rows:
+                table.optimize()
+        except Exception:
+            logger.exception("Document id index maintenance failed")
+
+    def _table_names(self, document_id: Optional[int] = None) -> List[str]:
+        """Tables holding one document's chunks, or every chunk table."""
+        if document_id is not None:
+            return [self._get_table_name(document_id)]
+        if self.consolidated:
+            return [self.consolidated_table_name()]
+        prefix = f"{settings.COLLECTION_NAME}_"
+        return [
+            name for name in self.db.table_names()
+            if name.startswith(prefix) and name[len(prefix):].isdigit()
+        ]
+
+    def rebuild_indexes(
+        self, document_id: Optional[int] = None, force: bool = True
+    ) -> Dict[str, bool]:
+        """Rebuild vector indexes for one document's table or for every table."""
+        return {
+            name: self.build_index(name, force=force)
+            for name in self._table_names(document_id)
+        }
+
+    def rebuild_lexical_index(
+        self, document_id: Optional[int] = None
+    ) -> Dict[str, int]:
+        """Re-index stored chunk text into the lexical index.
+
+        Backfills documents ingested before the lexical index existed.
+        Returns the number of chunks indexed per table.
+        """
+        if self.lexical_index is None:
+            return {}
+
+        indexed = {}
+        prefix = f"{settings.COLLECTION_NAME}_"
+        for table_name in self._table_names(document_id):
+            table = self._open_table_uncached(table_name)
+            if table is None:
+                continue
+            columns = [
+                name
+                for name in ("id", "document_id", "chunk_index", "text", "metadata")
+                if name in table.schema.names
+            ]
+            rows_by_document: Dict[int, List[tuple]] = {}
+            for row in self._read_columns(table, columns, document_id).to_pylist():
+                doc_id = row.get("document_id")
+                if doc_id is None:
+                    doc_id = int(table_name[len(prefix):])
+                rows_by_document.setdefault(doc_id, []).append(
+                    (
+                        row["id"],
+                        row.get("chunk_index"),
+                        row["text"],
+                        row.get("metadata", ""),
+                    )
+                )
+            for doc_id, rows in rows_by_document.items():
+                self.lexical_index.delete_document(doc_id)
+                self.lexical_index.add(doc_id, rows)
+            indexed[table_name] = sum(len(rows) for rows in rows_by_document.values())
+        return indexed
+
+    @staticmethod
+    def merge_top_k(result_lists: List[List[Dict]], n_results: int) -> List[Dict]:
+        """Merge per-document results into one list of the closest chunks."""
+        return heapq.nsmallest(
+            n_results,
+            (chunk for chunks in result_lists for chunk in chunks),
+            key=lambda chunk: chunk['distance']
+        )
+
+    @staticmethod
+    def _to_chunks(
+        results: List[Dict], document_id: Optional[int] = None
+    ) -> List[Dict]:
+        """Convert LanceDB rows into chunk dicts."""
         chunks = []
         for result in results:
             chunks.append({
                 'content': result.get('text', ''),
                 'metadata': result.get('metadata', {}),
-                'distance': result.get('_distance', 0)
+                'distance': result.get('_distance', 0),
+                'document_id': result.get('document_id', document_id),
+                'chunk_id': result.get('id'),
+                'chunk_index': result.get('chunk_index'),
+                'analysis': (
+                    {column: result[column] for column in ANALYSIS_COLUMNS}
+                    if result.get('token_ids') is not None else None
+                )
             })
-        
+
         return chunks
 
+    def _delete_rows(self, document_id: int) -> None:
+        """Row-delete a document's chunks from the consolidated table."""
+        table_name = self.consolidated_table_name()
+        table = self._open_table_uncached(table_name)
+        if table is None:
+            return
+        before = table.count_rows()
+        table.delete(self._document_filter(document_id))
+        self.table_cache.invalidate(table_name)
+        self._note_deletes(table, before - table.count_rows())
+
+    def _note_deletes(self, table, deleted: int) -> None:
+        """Compact a table once enough rows have been deleted from it."""
+        global _deleted_since_compaction
+        with _compaction_lock:
+            _deleted_since_compaction += deleted
+            if _deleted_since_compaction < settings.VECTOR_COMPACTION_THRESHOLD:
+                return
+            _deleted_since_compaction = 0
+        try:
+            table.compact_files()
+            table.cleanup_old_versions()
+            if self.consolidated:
+                table.create_scalar_index(
+                    "document_id", index_type="BTREE", replace=True
+                )
+        except Exception:
+            logger.exception("Vector table compaction failed")
+
     def delete_document(self, document_id: int) -> None:
         """Delete document from vector store."""
+        self.answer_cache.invalidate(document_id)
+        if self.lexical_index is not None:
+            self.lexical_index.delete_document(document_id)
         try:
-            table_name = self._get_table_name(document_id)
-            self.db.drop_table(table_name)
+            if self.consolidated:
+                self._delete_rows(document_id)
+            else:
+                table_name = self._get_table_name(document_id)
+                self.table_cache.invalidate(table_name)
+                self.db.drop_table(table_name)
         except Exception:
             pass
+
+    def migrate_to_consolidated(self, drop_source: bool = True) -> Dict[str, int]:
+        """Copy every per-document table into the consolidated chunk table.
+
+        Existing rows for a migrated document are replaced, so the migration
+        can be re-run safely. Source tables are dropped once copied unless
+        ``drop_source`` is False.
+        """
+        prefix = f"{settings.COLLECTION_NAME}_"
+        target = self.consolidated_table_name()
+        migrated = {'tables': 0, 'rows': 0}
+        for table_name in list(self.db.table_names()):
+            suffix = table_name[len(prefix):]
+            if not table_name.startswith(prefix) or not suffix.isdigit():
+                continue
+            document_id = int(suffix)
+            rows = self.db.open_table(table_name).to_arrow().to_pylist()
+            data = []
+            for i, row in enumerate(rows):
+                text = row.get('text', '')
+                data.append(
+                    {
+                        "id": row.get('id') or f"{document_id}_chunk_{i}",
+                        "document_id": document_id,
+                        "chunk_index": row.get('chunk_index', i),
+                        "text": text,
+                        "vector": row['vector'],
+                        "metadata": row.get('metadata', ''),
+                        "chunk_hash": row.get('chunk_hash')
+                        or hashlib.sha256(text.encode("utf-8")).hexdigest(),
+                        **analyze_text(text),
+                    }
+                )
+
+            table = self._open_table_uncached(target)
+            if table is not None:
+                table.delete(f"document_id = {document_id}")
+            if data:
+                self._append_rows(target, data)
+            if drop_source:
+                self.table_cache.invalidate(table_name)
+                self.db.drop_table(table_name)
+            migrated['tables'] += 1
+            migrated['rows'] += len(data)
+
+        self.table_cache.invalidate(target)
+        table = self._open_table_uncached(target)
+        if table is not None:
+            try:
+                table.compact_files()
+            except Exception:
+                logger.exception("Vector table compaction failed")
+            self._index_documents(table)
+        return migrated
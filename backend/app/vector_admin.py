@@ -0,0 +1,76 @@
+"""Vector store maintenance commands.
+
+Run with ``python -m app.vector_admin <command>``.
+"""
+import argparse
+import json
+from app.services.model_registry import model_registry
+from app.services.vector_store import VectorStoreService
+
+
+def migrate(args: argparse.Namespace) -> None:
+    """Move per-document tables into the consolidated chunk table."""
+    vector_store = VectorStoreService(model_registry)
+    result = vector_store.migrate_to_consolidated(drop_source=not args.keep_source)
+    print(json.dumps(result))
+
+
+def reindex(args: argparse.Namespace) -> None:
+    """Rebuild ANN indexes."""
+    vector_store = VectorStoreService(model_registry)
+    result = vector_store.rebuild_indexes(
+        document_id=args.document_id, force=not args.if_needed
+    )
+    print(json.dumps(result))
+
+
+def lexical(args: argparse.Namespace) -> None:
+    """Rebuild the BM25 lexical index from stored chunks."""
+    vector_store = VectorStoreService(model_registry)
+    result = vector_store.rebuild_lexical_index(document_id=args.document_id)
+    print(json.dumps(result))
+
+
+def main() -> None:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="DocuChat vector store maintenance.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = commands.add_parser(
+        "migrate", help="Copy per-document tables into the consolidated chunk table"
+    )
+    migrate_parser.add_argument(
+        "--keep-source", action="store_true", help="Keep the per-document tables"
+    )
+    migrate_parser.set_defaults(func=migrate)
+
+    reindex_parser = commands.add_parser(
+        "reindex", help="Rebuild IVF-PQ vector indexes"
+    )
+    reindex_parser.add_argument(
+        "--document-id",
+        type=int,
+        default=None,
+        help="Only rebuild this document's table",
+    )
+    reindex_parser.add_argument(
+        "--if-needed",
+        action="store_true",
+        help="Only index tables past VECTOR_INDEX_MIN_ROWS that have no index yet",
+    )
+    reindex_parser.set_defaults(func=reindex)
+
+    lexical_parser = commands.add_parser(
+        "lexical", help="Rebuild the lexical (BM25) index from stored chunks"
+    )
+    lexical_parser.add_argument(
+        "--document-id", type=int, default=None, help="Only re-index this document"
+    )
+    lexical_parser.set_defaults(func=lexical)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Ingestion worker entry point.
+
+Run with ``python -m app.worker --processes 4``. Each process warms its own
+model registry and polls the ingestion job table for work.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from typing import List
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.migrations import upgrade_database
+from app.core.profiling import profile_thread
+from app.models.document import Document, DocumentStatus
+from app.models.ingestion_job import IngestionJob
+from app.services.ingestion import ingest_document
+from app.services.ingestion_queue import IngestionQueue, JobHeartbeat, JobLockLost
+from app.services.model_registry import model_registry
+from app.services.vector_store import VectorStoreService
+
+logger = logging.getLogger(__name__)
+
+
+def run_job(job: IngestionJob, vector_store: VectorStoreService) -> None:
+    """Run a claimed job to completion, recording retries and failures.
+
+    A heartbeat thread keeps the job's lock fresh while it runs, and the
+    lock is checked before every write. If another worker has reclaimed the
+    job, this one stops without touching the job or its document.
+    """
+    # Captured before any commit reloads the job
+    job_id, worker_id = job.id, job.locked_by
+    db = SessionLocal()
+    heartbeat = JobHeartbeat(job_id, worker_id).start()
+    try:
+        job = db.merge(job)
+        document = db.query(Document).filter(Document.id == job.document_id).first()
+        if not document:
+            IngestionQueue.complete(db, job_id, worker_id)
+            return
+
+        try:
+            with profile_thread(f"ingest-{document.id}"):
+                ingest_document(
+                    db,
+                    document,
+                    job.file_path,
+                    vector_store,
+                    on_stage=lambda stage: IngestionQueue.report_stage(
+                        db, job_id, worker_id, stage
+                    ),
+                    incremental=job.incremental,
+                    resume_from=job.checkpoint,
+                    on_checkpoint=lambda written: IngestionQueue.checkpoint(
+                        db, job_id, worker_id, written
+                    ),
+                    before_write=lambda: IngestionQueue.heartbeat(
+                        db, job_id, worker_id
+                    ),
+                )
+            IngestionQueue.complete(db, job_id, worker_id)
+        except JobLockLost:
+            db.rollback()
+            logger.warning(
+                "Ingestion job %s was reclaimed by another worker; stopping", job_id
+            )
+        except Exception as e:
+            db.rollback()
+            logger.exception("Ingestion job %s failed", job_id)
+            try:
+                will_retry = IngestionQueue.fail(db, job, worker_id, str(e))
+            except JobLockLost:
+                logger.warning(
+                    "Ingestion job %s was reclaimed by another worker; stopping", job_id
+                )
+                return
+            document.error_message = str(e)
+            if not will_retry:
+                document.status = DocumentStatus.FAILED
+            db.commit()
+    finally:
+        heartbeat.stop()
+        db.close()
+
+
+def worker_loop(worker_id: str, poll_interval: float, stop=None) -> None:
+    """Claim and run jobs until ``stop`` is set."""
+    model_registry.warm_up()
+    vector_store = VectorStoreService(model_registry)
+
+    try:
+        while stop is None or not stop.is_set():
+            db = SessionLocal()
+            try:
+                job = IngestionQueue.claim(db, worker_id)
+                if job is not None:
+                    db.expunge(job)
+            finally:
+                db.close()
+
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+
+            run_job(job, vector_store)
+    finally:
+        model_registry.shutdown()
+
+
+def _worker_process_main(worker_id: str, poll_interval: float, stop) -> None:
+    """Process entry point; the parent handles Ctrl+C and signals ``stop``."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker_loop(worker_id, poll_interval, stop)
+
+
+def start_workers(processes: int, poll_interval: float) -> tuple:
+    """Spawn ``processes`` worker processes; returns them with their stop event."""
+    ctx = multiprocessing.get_context("spawn")
+    stop = ctx.Event()
+    workers: List[multiprocessing.Process] = []
+    for i in range(processes):
+        worker_id = f"{socket.gethostname()}-{os.getpid()}-{i}"
+        process = ctx.Process(
+            target=_worker_process_main,
+            args=(worker_id, poll_interval, stop),
+            name=f"ingestion-worker-{i}",
+            # Daemonic processes cannot start the encode or PDF extraction pools
+            daemon=settings.EMBEDDING_PROCESSES < 2
+            and settings.PDF_EXTRACTION_WORKERS < 2,
+        )
+        process.start()
+        workers.append(process)
+    return workers, stop
+
+
+def stop_workers(
+    workers: List[multiprocessing.Process], stop, timeout: float = 30.0
+) -> None:
+    """Ask workers to finish their current job and exit."""
+    stop.set()
+    for process in workers:
+        process.join(timeout)
+        if process.is_alive():
+            process.terminate()
+
+
+def main() -> None:
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description="Run DocuChat ingestion workers.")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=settings.INGESTION_WORKER_PROCESSES,
+        help="Number of worker processes",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=settings.INGESTION_POLL_INTERVAL,
+        help="Seconds to wait when the queue is empty",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    upgrade_database()
+
+    workers, stop = start_workers(args.processes, args.poll_interval)
+    logger.info("Started %d ingestion worker(s)", len(workers))
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        logger.info("Stopping ingestion workers")
+        stop_workers(workers, stop)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Per-answer cost of source excerpt selection: regex re-parsing vs precomputed spans.
+
+Run from ``backend/``::
+
+    python -m benchmarks.excerpts --chunks 3 --chunk-words 200 --answers 2000
+
+Each answer picks excerpts from ``--chunks`` synthetic chunks. The legacy
+mode re-splits and re-tokenizes every chunk with regexes and Python sets;
+the precomputed mode scores the token and sentence spans stored at ingest;
+the on-the-fly mode computes those spans per answer, as happens for chunks
+ingested before they were stored.
+"""
+import argparse
+import re
+import statistics
+import time
+import numpy as np
+from app.services.excerpts import ChunkAnalysis, analyze_text, prepare_query, select_excerpt
+
+_VOCABULARY = [
+    "invoice", "contract", "payment", "amount", "date", "party", "agreement", "term",
+    "the", "of", "and", "to", "in", "for", "with", "on", "by", "is", "was", "name",
+    "customer", "supplier", "delivery", "total", "due", "signed", "clause", "notice",
+]
+_QUESTIONS = [
+    "What is the name of the customer on the invoice?",
+    "When was the agreement signed by the supplier?",
+    "How many days is the payment term?",
+    "Summarize the delivery clause and notice period",
+]
+
+
+def _legacy_excerpt(text: str, query: str) -> str:
+    """The pre-span implementation, kept here as the baseline."""
+    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+    is_simple_query = any(
+        re.search(pattern, query.lower())
+        for pattern in [
+            r'\b(who|what|name|when|where|which|how many)\b',
+            r'\b(is|are|was|were)\b.*\b(name|called|date|number)\b',
+        ]
+    )
+    query_words = set(word.lower() for word in query.split() if len(word) > 2)
+    scored_sentences = []
+    for sentence in sentences:
+        overlap = len(query_words & set(word.lower() for word in sentence.split()))
+        if overlap > 0:
+            scored_sentences.append((overlap, sentence))
+    scored_sentences.sort(reverse=True, key=lambda x: x[0])
+    if not scored_sentences:
+        return sentences[0][:100] + "..." if len(sentences[0]) > 100 else sentences[0]
+
+    best_sentence = scored_sentences[0][1]
+    if is_simple_query and len(best_sentence) > 120:
+        words = best_sentence.split()
+        best_fragment, best_score = best_sentence, 0
+        for window_size in [10, 15, 20]:
+            for i in range(len(words) - window_size + 1):
+                fragment = ' '.join(words[i:i + window_size])
+                score = len(query_words & set(word.lower() for word in fragment.split()))
+                if score > best_score:
+                    best_score, best_fragment = score, fragment
+        if best_fragment != best_sentence:
+            return "..." + best_fragment + "..."
+    if len(best_sentence) > 120:
+        return best_sentence[:117] + "..."
+    return best_sentence
+
+
+def _synthetic_chunk(words: int, rng: np.random.Generator) -> str:
+    tokens = []
+    for word in rng.choice(_VOCABULARY, size=words):
+        tokens.append(str(word))
+        # Long, run-on sentences are what make the fragment window expensive
+        if rng.random() < 0.02:
+            tokens[-1] += "."
+    return " ".join(tokens) + "."
+
+
+def _timed(select, answers):
+    latencies = []
+    for chunks, question in answers:
+        start = time.perf_counter()
+        select(chunks, question)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    ordered = sorted(latencies)
+    return statistics.mean(ordered), ordered[int(len(ordered) * 0.95) - 1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=3)
+    parser.add_argument("--chunk-words", type=int, default=200)
+    parser.add_argument("--answers", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    answers = []
+    for i in range(args.answers):
+        texts = [_synthetic_chunk(args.chunk_words, rng) for _ in range(args.chunks)]
+        chunks = [{'content': text, 'analysis': analyze_text(text)} for text in texts]
+        answers.append((chunks, _QUESTIONS[i % len(_QUESTIONS)]))
+
+    mismatches = sum(
+        _legacy_excerpt(chunk['content'], question)
+        != select_excerpt(ChunkAnalysis(chunk['content'], chunk['analysis']), prepare_query(question))
+        for chunks, question in answers
+        for chunk in chunks
+    )
+
+    modes = {
+        "legacy regex": lambda chunks, question: [
+            _legacy_excerpt(chunk['content'], question) for chunk in chunks
+        ],
+        "precomputed spans": lambda chunks, question: [
+            select_excerpt(ChunkAnalysis(chunk['content'], chunk['analysis']), terms)
+            for terms in [prepare_query(question)]
+            for chunk in chunks
+        ],
+        "on-the-fly spans": lambda chunks, question: [
+            select_excerpt(ChunkAnalysis(chunk['content']), terms)
+            for terms in [prepare_query(question)]
+            for chunk in chunks
+        ],
+    }
+
+    print(f"chunks/answer={args.chunks} words/chunk={args.chunk_words} answers={args.answers}")
+    print(f"excerpts differing from legacy: {mismatches}")
+    print(f"{'mode':<22}{'mean us':>10}{'p95 us':>10}")
+    for label, select in modes.items():
+        mean, p95 = _timed(select, answers)
+        print(f"{label:<22}{mean:>10.1f}{p95:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Per-request overhead of the rate-limit middleware against the old JSON file counter.
+
+Run from ``backend/``::
+
+    python -m benchmarks.rate_limit --requests 20000
+
+Each mode wraps a no-op ASGI app and is driven directly, without a server,
+so the numbers are the middleware's own cost. The counter flushes to a
+temporary SQLite database as it would to the application database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base
+from app.middleware.rate_limit import MonthlyRequestLimiter
+from app.services.request_counter import RequestCounter, TokenBuckets
+
+
+async def _noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def _legacy_counter_app(counter_file: str):
+    """The previous middleware's synchronous read-modify-write of a JSON file."""
+    async def app(scope, receive, send):
+        try:
+            with open(counter_file, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {"month": time.strftime("%Y-%m"), "count": 0}
+        data["count"] += 1
+        with open(counter_file, 'w') as f:
+            json.dump(data, f)
+        await _noop_app(scope, receive, send)
+    return app
+
+
+async def _drive(app, requests: int, clients: int):
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    latencies = []
+    for i in range(requests):
+        scope = {
+            "type": "http",
+            "path": "/api/v1/chat/ask",
+            "headers": [(b"x-forwarded-for", f"10.0.{i % clients // 256}.{i % 256}".encode())],
+            "client": ("127.0.0.1", 0),
+        }
+        start = time.perf_counter()
+        await app(scope, receive, send)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    # Let scheduled flushes finish
+    await asyncio.sleep(0.1)
+    ordered = sorted(latencies)
+    return statistics.mean(ordered), ordered[int(len(ordered) * 0.99) - 1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=1000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="docuchat-bench-")
+    engine = create_engine(f"sqlite:///{os.path.join(workdir, 'counts.db')}")
+    Base.metadata.create_all(bind=engine)
+    counter = RequestCounter(flush_interval=1.0, session_factory=sessionmaker(bind=engine))
+
+    limiter = MonthlyRequestLimiter(_noop_app, max_requests=10**9, counter=counter)
+    limiter.buckets = None
+    with_buckets = MonthlyRequestLimiter(_noop_app, max_requests=10**9, counter=counter)
+    with_buckets.buckets = TokenBuckets(rate=10**6, burst=10**6)
+
+    modes = {
+        "no middleware": _noop_app,
+        "legacy json file": _legacy_counter_app(os.path.join(workdir, "request_counter.json")),
+        "in-memory counter": limiter,
+        "counter + buckets": with_buckets,
+    }
+    print(f"requests={args.requests} clients={args.clients}")
+    print(f"{'mode':<22}{'mean us':>10}{'p99 us':>10}")
+    for label, app in modes.items():
+        mean, p99 = asyncio.run(_drive(app, args.requests, args.clients))
+        print(f"{label:<22}{mean:>10.1f}{p99:>10.1f}")
+    counter.flush()
+    print(f"counted {counter.count()} (expected {2 * args.requests})")
+
+
+if __name__ == "__main__":
+    main()
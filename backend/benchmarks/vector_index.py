@@ -0,0 +1,92 @@
+"""Recall vs latency of IVF-PQ search against brute force on synthetic vectors.
+
+Run from ``backend/``::
+
+    python -m benchmarks.vector_index --rows 50000 --dim 384 --queries 200
+
+Vectors are drawn from a Gaussian mixture so the data has cluster structure
+similar to sentence embeddings. Recall@k is measured against exact results
+from the same table before the index is built.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+import lancedb
+import numpy as np
+from app.services.vector_store import VectorStoreService
+
+
+def _synthetic_vectors(rows: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=rows)
+    vectors = centers[labels] + 0.3 * rng.normal(size=(rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _timed_search(table, queries: np.ndarray, k: int, nprobes=None, refine_factor=None):
+    latencies, results = [], []
+    for query in queries:
+        builder = table.search(query).limit(k)
+        if nprobes:
+            builder = builder.nprobes(nprobes)
+        if refine_factor:
+            builder = builder.refine_factor(refine_factor)
+        start = time.perf_counter()
+        rows = builder.to_list()
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append({row["id"] for row in rows})
+    return latencies, results
+
+
+def _summary(latencies):
+    ordered = sorted(latencies)
+    return statistics.mean(ordered), ordered[int(len(ordered) * 0.95) - 1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--clusters", type=int, default=64)
+    parser.add_argument("--nprobes", type=int, nargs="+", default=[5, 10, 20, 50])
+    parser.add_argument("--refine-factor", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = _synthetic_vectors(args.rows, args.dim, args.clusters, rng)
+    queries = _synthetic_vectors(args.queries, args.dim, args.clusters, rng)
+
+    db = lancedb.connect(tempfile.mkdtemp(prefix="docuchat-bench-"))
+    table = db.create_table(
+        "bench",
+        data=[{"id": i, "vector": vector} for i, vector in enumerate(vectors)],
+    )
+
+    exact_latencies, exact = _timed_search(table, queries, args.k)
+    mean, p95 = _summary(exact_latencies)
+    print(f"rows={args.rows} dim={args.dim} k={args.k} queries={args.queries}")
+    print(f"{'mode':<24}{'recall@k':>10}{'mean ms':>10}{'p95 ms':>10}")
+    print(f"{'brute force':<24}{1.0:>10.3f}{mean:>10.2f}{p95:>10.2f}")
+
+    params = VectorStoreService.index_params(args.rows, args.dim)
+    start = time.perf_counter()
+    table.create_index(metric="L2", vector_column_name="vector", **params)
+    build_seconds = time.perf_counter() - start
+    print(f"IVF-PQ {params} built in {build_seconds:.1f}s")
+
+    for nprobes in args.nprobes:
+        latencies, approx = _timed_search(table, queries, args.k, nprobes, args.refine_factor)
+        recall = statistics.mean(
+            len(found & truth) / len(truth) for found, truth in zip(approx, exact)
+        )
+        mean, p95 = _summary(latencies)
+        label = f"ivf_pq nprobes={nprobes}"
+        print(f"{label:<24}{recall:>10.3f}{mean:>10.2f}{p95:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
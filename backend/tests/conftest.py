@@ -0,0 +1,30 @@
+"""Shared test setup: settings the app requires, pointed at throwaway locations."""
+import os
+import tempfile
+
+_scratch = tempfile.mkdtemp(prefix="docuchat-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_scratch}/app.db")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+os.environ.setdefault("CHROMA_PERSIST_DIRECTORY", os.path.join(_scratch, "vectors"))
+
+# Imported after the defaults above, which app settings read at import time.
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models import chat, collection, document, ingestion_job, request_count  # noqa: F401
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Session on a fresh SQLite database with every table created."""
+    engine = create_engine(f"sqlite:///{tmp_path}/test.db")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
@@ -0,0 +1,65 @@
+"""Tests for the semantic answer cache."""
+from typing import List
+
+import lancedb
+import pytest
+
+from app.core.config import settings
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.lexical_index import LexicalIndex
+from app.services.model_registry import ModelRegistry
+from app.services.vector_store import VectorStoreService
+
+_RESULT = {'answer': "Cats sleep a lot.", 'sources': []}
+
+
+def test_similar_question_hits_and_dissimilar_question_misses():
+    cache = SemanticAnswerCache(similarity_threshold=0.95)
+    cache.store(1, "How long do cats sleep?", [1.0, 0.0], _RESULT)
+
+    assert cache.lookup(1, [0.99, 0.05]) == _RESULT
+    assert cache.lookup(1, [0.8, 0.6]) is None
+    assert cache.lookup(2, [1.0, 0.0]) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_entries_cached_under_another_version_are_dropped():
+    cache = SemanticAnswerCache()
+    cache.store(1, "How long do cats sleep?", [1.0, 0.0], _RESULT, version="v1")
+
+    assert cache.lookup(1, [1.0, 0.0], version="v1") == _RESULT
+    assert cache.lookup(1, [1.0, 0.0], version="v2") is None
+    assert cache.lookup(1, [1.0, 0.0], version="v1") is None
+
+
+class _Embeddings:
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [float(len(text)), 1.0]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_INDEX_MIN_ROWS", 10_000)
+    registry = ModelRegistry()
+    registry._db = lancedb.connect(str(tmp_path / "vectors"))
+    registry._embeddings = _Embeddings()
+    registry._lexical_index = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+    return VectorStoreService(registry)
+
+
+@pytest.mark.parametrize("change", ["reingest", "delete"])
+def test_reingest_and_delete_invalidate_cached_answers(store, change):
+    store.add_document(1, "Cats sleep most of the day.", {"document_id": 1})
+    store.answer_cache.store(1, "How long do cats sleep?", [1.0, 0.0], _RESULT)
+    store.answer_cache.store(2, "How long do cats sleep?", [1.0, 0.0], _RESULT)
+
+    if change == "reingest":
+        store.add_document(1, "Cats sleep about sixteen hours.", {"document_id": 1})
+    else:
+        store.delete_document(1)
+
+    assert store.answer_cache.lookup(1, [1.0, 0.0]) is None
+    assert store.answer_cache.lookup(2, [1.0, 0.0]) == _RESULT
@@ -0,0 +1,46 @@
+"""Tests for prompt context packing."""
+from app.services.context_builder import pack_context
+
+
+def _count_words(text: str) -> int:
+    return len(text.split())
+
+
+def _chunk(chunk_id: str, index: int, content: str, document_id: int = 1):
+    return {'chunk_id': chunk_id, 'document_id': document_id, 'chunk_index': index, 'content': content}
+
+
+def test_distinct_chunks_sharing_an_index_are_both_kept():
+    chunks = [
+        _chunk("1_chunk_a", 3, "The invoice total is 420 euros."),
+        _chunk("1_chunk_b", 3, "Payment is due within thirty days."),
+    ]
+
+    packed = pack_context(chunks, _count_words, 0)
+
+    assert "420 euros" in packed.text
+    assert "thirty days" in packed.text
+    assert packed.dropped_chunks == 0
+
+
+def test_repeated_chunk_is_used_once():
+    chunk = _chunk("1_chunk_a", 3, "The invoice total is 420 euros.")
+
+    packed = pack_context([chunk, dict(chunk)], _count_words, 0)
+
+    assert packed.text.count("420 euros") == 1
+    assert packed.spans == 1
+    assert packed.dropped_chunks == 0
+
+
+def test_only_consecutive_chunks_are_merged():
+    chunks = [
+        _chunk("1_chunk_a", 0, "Alpha section text."),
+        _chunk("1_chunk_b", 1, "Beta section text."),
+        _chunk("1_chunk_c", 3, "Delta section text."),
+    ]
+
+    packed = pack_context(chunks, _count_words, 0)
+
+    assert packed.spans == 2
+    assert packed.merged_chunks == 1
@@ -0,0 +1,88 @@
+"""Tests for storing and extracting uploaded documents."""
+import io
+import os
+
+import pytest
+
+from app.core.config import settings
+from app.core.exceptions import UploadTooLargeError
+from app.services import document_processor
+from app.services.document_processor import DocumentProcessor
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_uploads_with_the_same_name_get_distinct_files(upload_dir):
+    first = DocumentProcessor.save_upload(io.BytesIO(b"first"), "report.txt")
+    second = DocumentProcessor.save_upload(io.BytesIO(b"second"), "report.txt")
+
+    assert os.path.basename(first.path) == "report.txt"
+    assert os.path.basename(second.path) == "report_1.txt"
+    assert open(first.path, "rb").read() == b"first"
+    assert open(second.path, "rb").read() == b"second"
+    assert sorted(os.listdir(upload_dir)) == ["report.txt", "report_1.txt"]
+
+
+def test_oversized_upload_leaves_no_files(upload_dir):
+    with pytest.raises(UploadTooLargeError):
+        DocumentProcessor.save_upload(io.BytesIO(b"x" * 100), "big.txt", max_size=10)
+
+    assert os.listdir(upload_dir) == []
+
+
+@pytest.fixture
+def sample_size(monkeypatch):
+    monkeypatch.setattr(settings, "EXTRACTION_FAST_PATH", True)
+    monkeypatch.setattr(settings, "EXTRACTION_SAMPLE_CHARS", 100)
+    monkeypatch.setattr(settings, "EXTRACTION_SAMPLE_PAGES", 2)
+    monkeypatch.setattr(settings, "EXTRACTION_MIN_CHARS_PER_PAGE", 10)
+
+
+def test_text_quality_is_judged_on_the_leading_sample(tmp_path, sample_size):
+    paragraphs = [f"Paragraph {i} of a plain text document." for i in range(50)]
+    path = tmp_path / "notes.txt"
+    path.write_bytes("\r\n\r\n".join(paragraphs).encode("utf-8") + b"\n\nTrailing \xff byte")
+
+    extraction = DocumentProcessor.extract(str(path))
+
+    assert extraction.strategy == "plain_text"
+    texts = [element.text for element in extraction.elements]
+    assert texts[:50] == paragraphs
+    assert texts[50] == "Trailing \ufffd byte"
+
+
+def test_text_that_is_not_utf8_at_the_start_escalates(tmp_path, sample_size):
+    path = tmp_path / "latin1.txt"
+    path.write_bytes("Café menu\n\n".encode("latin-1") * 20)
+
+    assert DocumentProcessor.extract(str(path)).strategy == "unstructured"
+
+
+class _Page:
+    def __init__(self, number: int, extracted: list):
+        self.number = number
+        self.extracted = extracted
+
+    def extract_text(self) -> str:
+        self.extracted.append(self.number)
+        return f"Page {self.number} has a healthy amount of born-digital text."
+
+
+def test_pdf_text_layer_is_read_page_by_page(tmp_path, sample_size, monkeypatch):
+    extracted = []
+
+    class _Reader:
+        def __init__(self, path):
+            self.pages = [_Page(number, extracted) for number in range(1, 7)]
+
+    monkeypatch.setattr(document_processor, "PdfReader", _Reader)
+    extraction = DocumentProcessor.extract(str(tmp_path / "report.pdf"))
+
+    assert extraction.strategy == "pypdf"
+    assert extracted == [1, 2]
+    assert [element.page_number for element in extraction.elements] == [1, 2, 3, 4, 5, 6]
+    assert extracted == [1, 2, 3, 4, 5, 6]
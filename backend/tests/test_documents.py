@@ -0,0 +1,95 @@
+"""Tests for the document routes' deduplication and shared vectors."""
+import asyncio
+import io
+from typing import List
+
+import pytest
+from starlette.datastructures import UploadFile
+
+from app.api.routes import documents
+from app.core.config import settings
+from app.models.document import Document, DocumentStatus
+from app.services.ingestion import ingest_fingerprint
+from app.services.ingestion_queue import IngestionQueue
+
+
+class _RecordingVectorStore:
+    """Stands in for VectorStoreService, recording which vectors were deleted."""
+
+    def __init__(self):
+        self.deleted: List[int] = []
+
+    def delete_document(self, document_id: int) -> None:
+        self.deleted.append(document_id)
+
+
+@pytest.fixture
+def vector_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    return _RecordingVectorStore()
+
+
+def _document(db, content_hash: str, vectors_document_id=None) -> Document:
+    document = Document(
+        filename="report.txt",
+        file_path="missing.txt",
+        file_type="text/plain",
+        file_size=1,
+        content_hash=content_hash,
+        ingest_fingerprint=ingest_fingerprint(content_hash),
+        vectors_document_id=vectors_document_id,
+        status=DocumentStatus.COMPLETED,
+    )
+    db.add(document)
+    db.commit()
+    return document
+
+
+def _upload(db, content: bytes) -> Document:
+    upload = UploadFile(io.BytesIO(content), filename="report.txt")
+    return asyncio.run(documents.upload_document(file=upload, collection_id=None, db=db))
+
+
+def _delete(db, vector_store, document_id: int) -> None:
+    asyncio.run(documents.delete_document(document_id, db=db, vector_store=vector_store))
+
+
+def test_identical_upload_shares_the_indexed_vectors(db, vector_store):
+    original = _upload(db, b"quarterly report")
+    assert IngestionQueue.latest_for_document(db, original.id) is not None
+    original.status = DocumentStatus.COMPLETED
+    db.commit()
+
+    duplicate = _upload(db, b"quarterly report")
+    revised = _upload(db, b"quarterly report, revised")
+
+    assert duplicate.status == DocumentStatus.COMPLETED
+    assert duplicate.vector_id == original.id
+    assert IngestionQueue.latest_for_document(db, duplicate.id) is None
+    assert revised.vectors_document_id is None
+    assert IngestionQueue.latest_for_document(db, revised.id) is not None
+
+
+def test_shared_vectors_are_deleted_with_their_last_reference(db, vector_store):
+    owner = _document(db, "a" * 64)
+    duplicate = _document(db, "a" * 64, vectors_document_id=owner.id)
+
+    _delete(db, vector_store, owner.id)
+    assert vector_store.deleted == []
+
+    _delete(db, vector_store, duplicate.id)
+    assert vector_store.deleted == [owner.id]
+
+
+def test_reindex_deletes_vectors_it_no_longer_shares(db, vector_store):
+    owner = _document(db, "a" * 64)
+    duplicate = _document(db, "a" * 64, vectors_document_id=owner.id)
+    _delete(db, vector_store, owner.id)
+
+    revision = UploadFile(io.BytesIO(b"revised text"), filename="report.txt")
+    asyncio.run(
+        documents.reindex_document(duplicate.id, file=revision, db=db, vector_store=vector_store)
+    )
+
+    assert duplicate.vectors_document_id is None
+    assert vector_store.deleted == [owner.id]
@@ -0,0 +1,84 @@
+"""Tests for the query embedding cache."""
+import pytest
+
+from app.services import embedding_cache
+from app.services.embedding_cache import QueryEmbeddingCache
+
+_MODEL = "test-model"
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(embedding_cache.time, "time", clock.time)
+    return clock
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QueryEmbeddingCache(max_size=2)
+    cache.put(_MODEL, "first", [1.0])
+    cache.put(_MODEL, "second", [2.0])
+    assert cache.get(_MODEL, "first") == [1.0]
+
+    cache.put(_MODEL, "third", [3.0])
+
+    assert cache.get(_MODEL, "second") is None
+    assert cache.get(_MODEL, "first") == [1.0]
+    assert cache.get(_MODEL, "third") == [3.0]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_queries_are_normalized_and_keyed_by_model():
+    cache = QueryEmbeddingCache()
+    cache.put(_MODEL, "What  is LanceDB?", [1.0])
+
+    assert cache.get(_MODEL, " what is lancedb? ") == [1.0]
+    assert cache.get("other-model", "What is LanceDB?") is None
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = QueryEmbeddingCache(ttl_seconds=60)
+    cache.put(_MODEL, "question", [1.0])
+
+    clock.now += 59
+    assert cache.get(_MODEL, "question") == [1.0]
+    clock.now += 2
+    assert cache.get(_MODEL, "question") is None
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    QueryEmbeddingCache(disk_dir=str(tmp_path)).put(_MODEL, "question", [0.25, 0.5])
+
+    restarted = QueryEmbeddingCache(disk_dir=str(tmp_path))
+
+    assert restarted.get(_MODEL, "question") == [0.25, 0.5]
+    assert restarted.stats()["disk_hits"] == 1
+
+
+def test_expired_disk_rows_are_not_served(tmp_path, clock):
+    QueryEmbeddingCache(ttl_seconds=60, disk_dir=str(tmp_path)).put(_MODEL, "question", [1.0])
+    clock.now += 61
+
+    restarted = QueryEmbeddingCache(ttl_seconds=60, disk_dir=str(tmp_path))
+
+    assert restarted.get(_MODEL, "question") is None
+    assert restarted.stats()["disk_size"] == 0
+
+
+def test_disk_tier_evicts_the_oldest_rows_past_its_bound(tmp_path, clock):
+    cache = QueryEmbeddingCache(max_size=1, disk_dir=str(tmp_path), disk_max_rows=10)
+    for i in range(25):
+        clock.now += 1
+        cache.put(_MODEL, f"question {i}", [float(i)])
+
+    assert cache.stats()["disk_size"] <= 10
+    assert cache.get(_MODEL, "question 0") is None
+    assert cache.get(_MODEL, "question 23") == [23.0]
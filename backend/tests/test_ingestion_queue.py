@@ -0,0 +1,92 @@
+"""Tests for the durable ingestion job queue."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.models.document import Document, DocumentStatus
+from app.models.ingestion_job import IngestionJobStatus
+from app.services.ingestion_queue import IngestionQueue, JobLockLost
+
+
+@pytest.fixture
+def document(db, monkeypatch):
+    monkeypatch.setattr(settings, "INGESTION_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(settings, "INGESTION_RETRY_BACKOFF", 0.0)
+    document = Document(
+        filename="report.txt", file_path="report.txt", file_type="text/plain", file_size=1
+    )
+    db.add(document)
+    db.commit()
+    return document
+
+
+def _make_stale(db, job) -> None:
+    job.locked_at = datetime.utcnow() - timedelta(seconds=settings.INGESTION_JOB_TIMEOUT + 1)
+    db.commit()
+
+
+def test_a_claimed_job_is_not_handed_out_twice(db, document):
+    IngestionQueue.enqueue(db, document.id, document.file_path)
+
+    job = IngestionQueue.claim(db, "worker-a")
+
+    assert job.status == IngestionJobStatus.RUNNING
+    assert (job.locked_by, job.attempts) == ("worker-a", 1)
+    assert IngestionQueue.claim(db, "worker-b") is None
+
+
+def test_failed_attempt_is_retried_after_its_backoff(db, document, monkeypatch):
+    IngestionQueue.enqueue(db, document.id, document.file_path)
+    job = IngestionQueue.claim(db, "worker-a")
+    monkeypatch.setattr(settings, "INGESTION_RETRY_BACKOFF", 3600.0)
+
+    assert IngestionQueue.fail(db, job, "worker-a", "boom") is True
+    assert IngestionQueue.claim(db, "worker-b") is None
+
+    db.refresh(job)
+    job.next_run_at = datetime.utcnow()
+    db.commit()
+    retried = IngestionQueue.claim(db, "worker-b")
+    assert (retried.id, retried.attempts, retried.last_error) == (job.id, 2, "boom")
+
+
+def test_failure_on_the_last_attempt_is_final(db, document):
+    IngestionQueue.enqueue(db, document.id, document.file_path)
+    for attempt in (1, 2):
+        job = IngestionQueue.claim(db, "worker-a")
+        will_retry = IngestionQueue.fail(db, job, "worker-a", f"attempt {attempt} failed")
+
+    assert will_retry is False
+    db.refresh(job)
+    assert job.status == IngestionJobStatus.FAILED
+    assert IngestionQueue.claim(db, "worker-a") is None
+
+
+def test_stale_job_is_reclaimed_and_its_old_worker_locked_out(db, document):
+    IngestionQueue.enqueue(db, document.id, document.file_path)
+    job = IngestionQueue.claim(db, "worker-a")
+    _make_stale(db, job)
+
+    reclaimed = IngestionQueue.claim(db, "worker-b")
+
+    assert (reclaimed.id, reclaimed.locked_by, reclaimed.attempts) == (job.id, "worker-b", 2)
+    with pytest.raises(JobLockLost):
+        IngestionQueue.complete(db, job.id, "worker-a")
+    IngestionQueue.complete(db, job.id, "worker-b")
+
+
+def test_stale_job_without_attempts_left_fails_its_document(db, document):
+    IngestionQueue.enqueue(db, document.id, document.file_path)
+    job = IngestionQueue.claim(db, "worker-a")
+    IngestionQueue.fail(db, job, "worker-a", "boom")
+    job = IngestionQueue.claim(db, "worker-a")
+    _make_stale(db, job)
+
+    assert IngestionQueue.claim(db, "worker-b") is None
+
+    db.refresh(job)
+    db.refresh(document)
+    assert job.status == IngestionJobStatus.FAILED
+    assert document.status == DocumentStatus.FAILED
+    assert "stopped responding" in document.error_message
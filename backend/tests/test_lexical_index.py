@@ -0,0 +1,44 @@
+"""Tests for the BM25 lexical index."""
+import sqlite3
+
+from app.services.lexical_index import LexicalIndex
+
+
+def _rows(document_id: int, count: int):
+    return [
+        (f"{document_id}_chunk_{i}", i, f"invoice INV-2024-00{i} for document {document_id}", "")
+        for i in range(count)
+    ]
+
+
+def test_search_only_returns_requested_documents(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+    for document_id in (1, 2, 12):
+        index.add(document_id, _rows(document_id, 3))
+
+    results = index.search([2, 12], "INV-2024-001", 10)
+
+    assert sorted(result['chunk_id'] for result in results) == ["12_chunk_1", "2_chunk_1"]
+    assert index.search([3], "invoice", 10) == []
+
+
+def test_index_without_document_column_is_rebuilt(tmp_path):
+    path = str(tmp_path / "lexical.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE chunks (id INTEGER PRIMARY KEY, chunk_id TEXT NOT NULL UNIQUE, "
+            "document_id INTEGER NOT NULL, chunk_index INTEGER, text TEXT NOT NULL, metadata TEXT)"
+        )
+        conn.execute(
+            "CREATE VIRTUAL TABLE chunks_fts USING fts5("
+            "text, content='chunks', content_rowid='id', tokenize='unicode61')"
+        )
+        conn.executemany(
+            "INSERT INTO chunks (chunk_id, document_id, chunk_index, text, metadata) VALUES (?, ?, 0, ?, '')",
+            [("1_chunk_a", 1, "cats and dogs"), ("2_chunk_a", 2, "cats only")],
+        )
+        conn.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('rebuild')")
+
+    index = LexicalIndex(path)
+
+    assert [result['chunk_id'] for result in index.search([1], "cats", 10)] == ["1_chunk_a"]
@@ -0,0 +1,78 @@
+"""Tests for the LLM client's coalescing and retries."""
+import asyncio
+from typing import List
+
+import pytest
+
+from app.services.llm_client import FakeChatModel, LLMClient
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class _ScriptedModel(FakeChatModel):
+    """Fake backend that raises the scripted errors, in order, before replying."""
+
+    errors: List[Exception] = []
+    prompts: List[str] = []
+
+    def _next(self, messages) -> None:
+        self.prompts.append(self._prompt(messages))
+        if self.errors:
+            raise self.errors.pop(0)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self._next(messages)
+        return super()._generate(messages, stop, run_manager, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self._next(messages)
+        return await super()._agenerate(messages, stop, run_manager, **kwargs)
+
+
+def _client(*errors: Exception, latency: float = 0.0) -> LLMClient:
+    backend = _ScriptedModel(latency=latency, errors=list(errors), prompts=[])
+    return LLMClient(backend, max_attempts=3, backoff=0.0)
+
+
+def test_concurrent_identical_prompts_share_one_backend_call():
+    client = _client(latency=0.1)
+
+    async def ask_all():
+        return await asyncio.gather(*[client.ainvoke("Question: same?") for _ in range(5)])
+
+    replies = asyncio.run(ask_all())
+
+    assert len({reply.content for reply in replies}) == 1
+    assert len(client.backend.prompts) == 1
+    assert client.stats()["coalesced"] == 4
+
+
+@pytest.mark.parametrize("status_code", [429, 503])
+def test_transient_errors_are_retried(status_code):
+    client = _client(_StatusError(status_code), _StatusError(status_code))
+
+    reply = client.invoke("Question: retried?")
+
+    assert reply.content.startswith("Fake answer")
+    assert len(client.backend.prompts) == 3
+    assert client.stats()["retries"] == 2
+
+
+def test_client_errors_are_not_retried():
+    client = _client(_StatusError(400))
+
+    with pytest.raises(_StatusError):
+        client.invoke("Question: rejected?")
+    assert len(client.backend.prompts) == 1
+
+
+def test_retries_give_up_after_max_attempts():
+    client = _client(*[_StatusError(500)] * 3)
+
+    with pytest.raises(_StatusError):
+        asyncio.run(client.ainvoke("Question: down?"))
+    assert len(client.backend.prompts) == 3
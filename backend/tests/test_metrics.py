@@ -0,0 +1,42 @@
+"""Tests for the metrics endpoint and query stage timings."""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import metrics
+from app.core.config import settings
+from app.core.database import Base, engine
+from app.core.metrics import query_timer, request_stages
+
+
+@pytest.fixture
+def client():
+    # The scrape reads the ingestion queue depth from the app database
+    Base.metadata.create_all(engine)
+    app = FastAPI()
+    app.include_router(metrics.router)
+    return TestClient(app)
+
+
+def test_metrics_are_disabled_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+    assert client.get("/metrics").status_code == 404
+
+
+def test_metrics_require_the_bearer_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "s3cret")
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert "docuchat_query_stage_seconds" in response.text
+
+
+def test_request_stages_sum_each_stage():
+    with request_stages() as stages:
+        for stage in ("lexical_search", "vector_search", "vector_search"):
+            with query_timer(stage):
+                pass
+
+    assert set(stages) == {"lexical_search", "vector_search"}
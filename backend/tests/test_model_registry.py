@@ -0,0 +1,55 @@
+"""Tests for the process-wide model registry."""
+import threading
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services import model_registry as registry_module
+from app.services.model_registry import ModelRegistry
+from app.services.rag_service import RAGService
+from app.services.vector_store import VectorStoreService
+
+
+class _SlowEmbeddings:
+    """Counts constructions; slow enough for racing threads to overlap."""
+
+    built = 0
+
+    def __init__(self, **kwargs):
+        time.sleep(0.05)
+        type(self).built += 1
+
+    def embed_query(self, text: str):
+        return [0.0]
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    _SlowEmbeddings.built = 0
+    monkeypatch.setattr(registry_module, "HuggingFaceEmbeddings", _SlowEmbeddings)
+    monkeypatch.setattr(settings, "CHROMA_PERSIST_DIRECTORY", str(tmp_path / "vectors"))
+    monkeypatch.setattr(settings, "LLM_BACKEND", "fake")
+    return ModelRegistry()
+
+
+def test_concurrent_first_use_loads_the_model_once(registry):
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(registry.embeddings)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert _SlowEmbeddings.built == 1
+    assert all(embeddings is seen[0] for embeddings in seen)
+
+
+def test_services_built_per_request_share_the_registry_resources(registry):
+    first, second = RAGService(registry), RAGService(registry)
+
+    assert first.llm is second.llm
+    assert first.answer_cache is second.answer_cache
+    assert first.vector_store_service.db is second.vector_store_service.db
+    assert VectorStoreService(registry).embeddings is first.vector_store_service.embeddings
+    assert _SlowEmbeddings.built == 1
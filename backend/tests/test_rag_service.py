@@ -0,0 +1,78 @@
+"""Tests for RAGService batch and multi-document answering."""
+import asyncio
+from typing import List
+
+import lancedb
+import pytest
+
+from app.core.config import settings
+from app.services.lexical_index import LexicalIndex
+from app.services.model_registry import ModelRegistry
+from app.services.rag_service import RAGService
+from app.services.vector_store import VectorStoreService
+
+
+class _Embeddings:
+    """Embeds by text length, and refuses to embed text containing ``poison``."""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        if "poison" in text:
+            raise RuntimeError("cannot embed this text")
+        return [float(len(text)), 1.0, 0.5, 0.25]
+
+
+class _WordTokenizer:
+    def encode(self, text: str, **kwargs) -> List[str]:
+        return text.split()
+
+
+@pytest.fixture
+def rag(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BACKEND", "fake")
+    monkeypatch.setattr(settings, "VECTOR_INDEX_MIN_ROWS", 10_000)
+    registry = ModelRegistry()
+    registry._db = lancedb.connect(str(tmp_path / "vectors"))
+    registry._embeddings = _Embeddings()
+    registry._lexical_index = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+    registry._prompt_tokenizer = _WordTokenizer()
+    vector_store = VectorStoreService(registry)
+    vector_store.add_document(
+        1, "Cats sleep most of the day.\n\nDogs enjoy long walks.", {"document_id": 1}
+    )
+    return RAGService(registry, vector_store)
+
+
+async def _collect(rag: RAGService, questions: List[str]) -> List[dict]:
+    return [result async for result in rag.aanswer_batch(1, questions)]
+
+
+def test_question_that_cannot_be_embedded_fails_alone(rag):
+    questions = ["How long do cats sleep?", "poison question", "What do dogs enjoy?"]
+
+    results = sorted(asyncio.run(_collect(rag, questions)), key=lambda result: result['index'])
+
+    assert [result['index'] for result in results] == [0, 1, 2]
+    assert "cannot embed" in results[1]['error']
+    for result in (results[0], results[2]):
+        assert 'error' not in result
+        assert result['answer'].startswith("Fake answer")
+
+
+def test_multi_document_answers_score_excerpts_with_the_query_embedding(rag, monkeypatch):
+    monkeypatch.setattr(settings, "EXCERPT_SCORING", "semantic")
+    rag.vector_store_service.add_document(2, "Birds sing at dawn.", {"document_id": 2})
+    embeddings = []
+    score = rag._sentence_similarities
+
+    def spy(analyses, query_embedding):
+        embeddings.append(query_embedding)
+        return score(analyses, query_embedding)
+
+    monkeypatch.setattr(rag, "_sentence_similarities", spy)
+    result = asyncio.run(rag.aanswer_across({1: "cats.txt", 2: "birds.txt"}, "Who sings?"))
+
+    assert result['sources']
+    assert embeddings == [rag.vector_store_service.embed_query("Who sings?")]
@@ -0,0 +1,101 @@
+"""Tests for the request rate limiter."""
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.middleware.rate_limit import MonthlyRequestLimiter
+from app.services import request_counter
+from app.services.request_counter import RequestCounter, TokenBuckets
+
+
+def _scope(forwarded=(), peer="10.0.0.1"):
+    headers = [(b"x-forwarded-for", value.encode("latin-1")) for value in forwarded]
+    return {"type": "http", "headers": headers, "client": (peer, 51234)}
+
+
+@pytest.fixture
+def trusted_hops(monkeypatch):
+    def set_hops(hops):
+        monkeypatch.setattr(settings, "TRUSTED_PROXY_HOPS", hops)
+
+    return set_hops
+
+
+def test_spoofed_forwarded_hops_identify_the_same_client(trusted_hops):
+    trusted_hops(1)
+    clients = {
+        MonthlyRequestLimiter._client(_scope([f"{spoofed}, 203.0.113.7"]))
+        for spoofed in ("1.1.1.1", "2.2.2.2", "3.3.3.3, 4.4.4.4")
+    }
+    assert clients == {"203.0.113.7"}
+
+
+def test_client_is_counted_from_the_trusted_end(trusted_hops):
+    trusted_hops(2)
+    scope = _scope(["6.6.6.6, 203.0.113.7", "198.51.100.2"])
+    assert MonthlyRequestLimiter._client(scope) == "203.0.113.7"
+
+
+def test_falls_back_to_the_peer_address(trusted_hops):
+    trusted_hops(2)
+    assert MonthlyRequestLimiter._client(_scope(["203.0.113.7"])) == "10.0.0.1"
+    assert MonthlyRequestLimiter._client(_scope()) == "10.0.0.1"
+    trusted_hops(0)
+    assert MonthlyRequestLimiter._client(_scope(["203.0.113.7"])) == "10.0.0.1"
+
+
+@pytest.fixture
+def session_factory(db):
+    return sessionmaker(bind=db.get_bind())
+
+
+def test_counts_are_shared_through_the_database(session_factory):
+    first = RequestCounter(session_factory=session_factory)
+    second = RequestCounter(session_factory=session_factory)
+    for _ in range(3):
+        first.increment()
+    second.increment()
+
+    first.flush()
+    second.flush()
+
+    assert second.count() == 4
+    assert first.count() == 3
+    first.flush()
+    assert first.count() == 4
+
+
+def test_counts_that_fail_to_flush_are_kept_for_the_next_flush(session_factory):
+    attempts = []
+
+    def flaky_factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("database unavailable")
+        return session_factory()
+
+    counter = RequestCounter(session_factory=flaky_factory)
+    counter.increment()
+    counter.increment()
+
+    counter.flush()
+    assert counter.count() == 2
+    counter.increment()
+    counter.flush()
+
+    assert counter.count() == 3
+    assert RequestCounter(session_factory=session_factory)._store({}, counter.month) == 3
+
+
+def test_token_bucket_allows_a_burst_then_refills(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(request_counter.time, "monotonic", lambda: now[0])
+    buckets = TokenBuckets(rate=2.0, burst=3)
+
+    assert [buckets.take("a") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert buckets.take("a") == pytest.approx(0.5)
+    assert buckets.take("b") == 0.0
+
+    now[0] += 0.5
+    assert buckets.take("a") == 0.0
+    assert buckets.take("a") > 0
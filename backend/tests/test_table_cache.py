@@ -0,0 +1,86 @@
+"""Tests for the table handle cache."""
+from typing import List
+
+import lancedb
+import pytest
+
+from app.core.config import settings
+from app.services import table_cache
+from app.services.lexical_index import LexicalIndex
+from app.services.model_registry import ModelRegistry
+from app.services.table_cache import TableHandleCache
+from app.services.vector_store import VectorStoreService
+
+
+class _Opener:
+    def __init__(self):
+        self.opened: List[str] = []
+
+    def __call__(self, table_name: str):
+        self.opened.append(table_name)
+        return None if table_name == "missing" else object()
+
+
+def test_handles_are_reused_and_least_recently_used_evicted():
+    cache, opener = TableHandleCache(max_size=2), _Opener()
+    first = cache.get_or_open("a", opener)
+    cache.get_or_open("b", opener)
+    assert cache.get_or_open("a", opener) is first
+
+    cache.get_or_open("c", opener)
+    cache.get_or_open("b", opener)
+
+    assert opener.opened == ["a", "b", "c", "b"]
+    assert cache.stats()["evictions"] == 2
+
+
+def test_missing_tables_are_not_cached():
+    cache, opener = TableHandleCache(), _Opener()
+    assert cache.get_or_open("missing", opener) is None
+    assert cache.get_or_open("missing", opener) is None
+    assert opener.opened == ["missing", "missing"]
+
+
+def test_handles_are_reopened_after_the_ttl_or_invalidation(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(table_cache.time, "monotonic", lambda: now[0])
+    cache, opener = TableHandleCache(ttl_seconds=5.0), _Opener()
+    cache.get_or_open("a", opener)
+
+    now[0] += 6
+    cache.get_or_open("a", opener)
+    cache.invalidate("a")
+    cache.get_or_open("a", opener)
+
+    assert opener.opened == ["a", "a", "a"]
+
+
+class _Embeddings:
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [float(len(text)), 1.0]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_STORE_LAYOUT", "per_document")
+    monkeypatch.setattr(settings, "VECTOR_INDEX_MIN_ROWS", 10_000)
+    registry = ModelRegistry()
+    registry._db = lancedb.connect(str(tmp_path / "vectors"))
+    registry._embeddings = _Embeddings()
+    registry._lexical_index = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+    return VectorStoreService(registry)
+
+
+def test_writes_invalidate_the_cached_handle(store):
+    store.add_document(1, "Cats sleep most of the day.", {"document_id": 1})
+    table_name = store._get_table_name(1)
+    stale = store._open_table(table_name)
+
+    store.add_document(1, "Dogs enjoy long walks.", {"document_id": 1})
+    assert store._open_table(table_name) is not stale
+
+    store.delete_document(1)
+    assert store._open_table(table_name) is None
@@ -0,0 +1,86 @@
+"""Tests for the upload body size limit."""
+import asyncio
+
+from fastapi import FastAPI, File, UploadFile
+
+from app.middleware.upload_limit import UploadSizeLimiter
+
+_BOUNDARY = b"limit-test"
+
+
+def _app(max_size: int) -> UploadSizeLimiter:
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    return UploadSizeLimiter(app, max_size=max_size)
+
+
+def _call(app, body_chunks, headers=()):
+    """Send a multipart body in chunks; returns the status and the chunks consumed."""
+    consumed = []
+    chunks = list(body_chunks)
+    sent = []
+
+    async def receive():
+        if chunks:
+            chunk = chunks.pop(0)
+            consumed.append(chunk)
+            return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/upload",
+        "raw_path": b"/upload",
+        "query_string": b"",
+        "root_path": "",
+        "scheme": "http",
+        "server": ("test", 80),
+        "client": ("127.0.0.1", 1234),
+        "http_version": "1.1",
+        "headers": [(b"content-type", b"multipart/form-data; boundary=" + _BOUNDARY), *headers],
+    }
+    asyncio.run(app(scope, receive, send))
+    return sent[0]["status"], len(consumed)
+
+
+def _multipart(payload_chunks):
+    yield (
+        b"--" + _BOUNDARY + b"\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.txt\"\r\n"
+        b"Content-Type: text/plain\r\n\r\n"
+    )
+    yield from payload_chunks
+    yield b"\r\n--" + _BOUNDARY + b"--\r\n"
+
+
+def test_body_is_cut_off_once_the_limit_is_passed():
+    app = _app(max_size=100_000)
+
+    status, consumed = _call(app, _multipart([b"x" * 50_000] * 40))
+
+    assert status == 413
+    assert consumed < 10
+
+
+def test_declared_oversized_body_is_rejected_before_reading():
+    app = _app(max_size=100_000)
+
+    status, consumed = _call(app, _multipart([b"x" * 10]), headers=[(b"content-length", b"10000000")])
+
+    assert status == 413
+    assert consumed == 0
+
+
+def test_body_within_the_limit_is_accepted():
+    app = _app(max_size=100_000)
+
+    status, _ = _call(app, _multipart([b"x" * 50_000]))
+
+    assert status == 200
@@ -0,0 +1,169 @@
+"""Tests for VectorStoreService ingestion."""
+import hashlib
+import sqlite3
+from typing import List
+
+import lancedb
+import pytest
+
+from app.core.config import settings
+from app.services.lexical_index import LexicalIndex
+from app.services.model_registry import ModelRegistry
+from app.services.vector_store import VectorStoreService
+
+
+class _HashEmbeddings:
+    """Deterministic stand-in for the sentence-transformers model."""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [byte / 255.0 for byte in hashlib.sha256(text.encode("utf-8")).digest()[:8]]
+
+
+def _paragraphs(count: int, tag: str = "para") -> List[str]:
+    return [f"{tag} {i}: " + " ".join(f"{tag}{i}word{j}" for j in range(12)) for i in range(count)]
+
+
+@pytest.fixture(params=["per_document", "consolidated"])
+def store(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_STORE_LAYOUT", request.param)
+    monkeypatch.setattr(settings, "CHUNK_SIZE", 200)
+    monkeypatch.setattr(settings, "CHUNK_OVERLAP", 0)
+    monkeypatch.setattr(settings, "INGEST_WRITE_BATCH_SIZE", 3)
+    monkeypatch.setattr(settings, "VECTOR_INDEX_MIN_ROWS", 0)
+    registry = ModelRegistry()
+    registry._db = lancedb.connect(str(tmp_path / "vectors"))
+    registry._embeddings = _HashEmbeddings()
+    registry._lexical_index = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+    return VectorStoreService(registry)
+
+
+def _stored_chunks(store: VectorStoreService, document_id: int):
+    table = store.db.open_table(store._get_table_name(document_id))
+    data = store._read_columns(table, ["chunk_index", "text"], document_id)
+    return sorted(zip(data.column("chunk_index").to_pylist(), data.column("text").to_pylist()))
+
+
+def _lexical_indexes(store: VectorStoreService, document_id: int) -> List[int]:
+    path = store.lexical_index.path
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute(
+            "SELECT chunk_index FROM chunks WHERE document_id = ? ORDER BY chunk_index", (document_id,)
+        ).fetchall()
+    return [index for (index,) in rows]
+
+
+def test_incremental_reingest_renumbers_chunks_after_insert(store):
+    original = _paragraphs(8)
+    store.add_document(1, "\n\n".join(original), {"document_id": 1})
+    assert [text for _, text in _stored_chunks(store, 1)] == original
+
+    edited = original[:3] + _paragraphs(1, tag="inserted") + original[3:]
+    result = store.add_document(1, "\n\n".join(edited), {"document_id": 1}, incremental=True)
+
+    assert result["added"] == 1
+    assert result["unchanged"] == len(original)
+    chunks = _stored_chunks(store, 1)
+    assert [index for index, _ in chunks] == list(range(len(edited)))
+    assert [text for _, text in chunks] == edited
+    assert _lexical_indexes(store, 1) == list(range(len(edited)))
+
+
+def test_incremental_reingest_renumbers_chunks_after_removal(store):
+    original = _paragraphs(8)
+    store.add_document(1, "\n\n".join(original), {"document_id": 1})
+
+    edited = original[:2] + original[4:]
+    result = store.add_document(1, "\n\n".join(edited), {"document_id": 1}, incremental=True)
+
+    assert result["removed"] == 2
+    chunks = _stored_chunks(store, 1)
+    assert [index for index, _ in chunks] == list(range(len(edited)))
+    assert [text for _, text in chunks] == edited
+    assert _lexical_indexes(store, 1) == list(range(len(edited)))
+
+
+def test_fuse_merges_the_same_chunk_by_row_id():
+    dense = [
+        {'chunk_id': '1_chunk_a', 'document_id': 1, 'chunk_index': 0, 'content': 'alpha'},
+        {'chunk_id': '1_chunk_b', 'document_id': 1, 'chunk_index': 1, 'content': 'beta'},
+    ]
+    lexical = [
+        {'chunk_id': '1_chunk_b', 'document_id': 1, 'chunk_index': 5, 'content': 'beta'},
+        {'chunk_id': '1_chunk_c', 'document_id': 1, 'chunk_index': 1, 'content': 'gamma'},
+    ]
+
+    fused = VectorStoreService.fuse([dense, lexical], 3)
+
+    assert [chunk['chunk_id'] for chunk in fused] == ['1_chunk_b', '1_chunk_a', '1_chunk_c']
+    assert [chunk['content'] for chunk in fused] == ['beta', 'alpha', 'gamma']
+
+
+def _vector_index_stats(store: VectorStoreService, document_id: int):
+    table = store.db.open_table(store._get_table_name(document_id))
+    return table.index_stats(store._index_name(table, "vector"))
+
+
+def test_rows_written_after_the_index_build_are_indexed(store, monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_INDEX_MIN_ROWS", 300)
+    monkeypatch.setattr(settings, "INGEST_WRITE_BATCH_SIZE", 100)
+    store.add_document(1, "\n\n".join(_paragraphs(320)), {"document_id": 1})
+    assert _vector_index_stats(store, 1).num_indexed_rows == 320
+
+    store.add_document(1, "\n\n".join(_paragraphs(360)), {"document_id": 1}, incremental=True)
+
+    stats = _vector_index_stats(store, 1)
+    assert stats.num_unindexed_rows == 0
+    assert stats.num_indexed_rows == 360
+
+
+def test_index_is_retrained_once_the_table_has_grown(store, monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_INDEX_MIN_ROWS", 300)
+    monkeypatch.setattr(settings, "INGEST_WRITE_BATCH_SIZE", 100)
+    store.add_document(1, "\n\n".join(_paragraphs(300)), {"document_id": 1})
+
+    store.add_document(1, "\n\n".join(_paragraphs(600)), {"document_id": 1}, incremental=True)
+
+    table = store.db.open_table(store._get_table_name(1))
+    assert store._trained_rows(store._index_name(table, "vector")) == 600
+    assert _vector_index_stats(store, 1).num_unindexed_rows == 0
+
+
+@pytest.fixture
+def consolidated_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_STORE_LAYOUT", "consolidated")
+    monkeypatch.setattr(settings, "CHUNK_SIZE", 200)
+    monkeypatch.setattr(settings, "CHUNK_OVERLAP", 0)
+    monkeypatch.setattr(settings, "INGEST_WRITE_BATCH_SIZE", 100)
+    monkeypatch.setattr(settings, "VECTOR_INDEX_MIN_ROWS", 0)
+    registry = ModelRegistry()
+    registry._db = lancedb.connect(str(tmp_path / "vectors"))
+    registry._embeddings = _HashEmbeddings()
+    registry._lexical_index = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+    return VectorStoreService(registry)
+
+
+def test_consolidated_table_indexes_document_id(consolidated_store):
+    consolidated_store.add_document(1, "\n\n".join(_paragraphs(3)), {"document_id": 1})
+    consolidated_store.add_document(2, "\n\n".join(_paragraphs(3, tag="other")), {"document_id": 2})
+
+    table = consolidated_store.db.open_table(consolidated_store.consolidated_table_name())
+    index_name = consolidated_store._index_name(table, "document_id")
+    assert index_name is not None
+    assert table.index_stats(index_name).num_unindexed_rows == 0
+
+
+def test_small_document_returns_k_hits_from_an_indexed_table(consolidated_store, monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_INDEX_NUM_PARTITIONS", 32)
+    monkeypatch.setattr(settings, "VECTOR_SEARCH_NPROBES", 1)
+    consolidated_store.add_document(1, "\n\n".join(_paragraphs(600)), {"document_id": 1})
+    small = _paragraphs(4, tag="small")
+    consolidated_store.add_document(2, "\n\n".join(small), {"document_id": 2})
+    assert consolidated_store.build_index(consolidated_store.consolidated_table_name(), force=True)
+
+    query = consolidated_store.embeddings.embed_query("anything")
+    results = consolidated_store.vector_search(2, query, 4)
+
+    assert sorted(chunk['content'] for chunk in results) == sorted(small)
@@ -61,8 +61,9 @@ gcloud run deploy docuchat-backend `
     --concurrency 80 `
     --timeout 60s `
     --cpu 1 `
-    --memory 512Mi `
-    --set-env-vars "GROQ_API_KEY=$groqApiKey,DATABASE_URL=sqlite:///./app.db,BACKEND_CORS_ORIGINS=$corsOrigins,SECRET_KEY=$(New-Guid)"
+    --memory 2Gi `
+    --no-cpu-throttling `
+    --set-env-vars "GROQ_API_KEY=$groqApiKey,DATABASE_URL=sqlite:///./app.db,BACKEND_CORS_ORIGINS=$corsOrigins,SECRET_KEY=$(New-Guid),INGESTION_EMBEDDED_WORKERS=1"
 
 if ($LASTEXITCODE -eq 0) {
     Write-Host "`n========================================" -ForegroundColor Green
@@ -66,8 +66,9 @@ gcloud run deploy docuchat-backend \
     --concurrency 80 \
     --timeout 60s \
     --cpu 1 \
-    --memory 512Mi \
-    --set-env-vars "GROQ_API_KEY=$groqApiKey,DATABASE_URL=sqlite:///./app.db,BACKEND_CORS_ORIGINS=$corsOrigins,SECRET_KEY=$SECRET_KEY"
+    --memory 2Gi \
+    --no-cpu-throttling \
+    --set-env-vars "GROQ_API_KEY=$groqApiKey,DATABASE_URL=sqlite:///./app.db,BACKEND_CORS_ORIGINS=$corsOrigins,SECRET_KEY=$SECRET_KEY,INGESTION_EMBEDDED_WORKERS=1"
 
 if [ $? -eq 0 ]; then
     echo -e "\n\033[32m========================================\033[0m"